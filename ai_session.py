@@ -0,0 +1,185 @@
+import json
+import re
+import threading
+import time
+
+from ai_worker import run_in_background
+from game_engine import GameSession
+from metrics import metrics
+
+DEFAULT_LLM = "gpt-4o-mini"
+
+MOVE_PROMPT = """
+Here is the current Tic Tac Toe board (X, O, or _ for empty):
+{board}
+
+You are '{player}'. It's your turn.
+
+Important rules:
+1. This is a special Tic Tac Toe variant where each player can only have {pieces} pieces on the board at once.
+2. When a player places piece number {next_piece}, their oldest piece is removed.
+3. Get {win_length} of your pieces in a row (horizontally, vertically or diagonally) to win.
+4. You MUST choose an EMPTY space (marked with _).
+5. Do NOT choose spaces that already contain X or O.
+
+Your task:
+- Return the best move as JSON: {answer_format}
+- Only return the JSON. No extra explanation.
+- If you see a winning move, take it.
+- If you can't win immediately, block the opponent's winning move.
+- If neither is possible, prefer the center, then corners, then edges.
+- Always check that your chosen space is empty before returning.
+
+Remember: Only select positions marked with _ in the board representation.
+"""
+
+EXPECTED_OUTPUT = "The best move as JSON: {answer_example}"
+
+# The JSON examples go in as input values: CrewAI versions that interpolate
+# with str.format() raise KeyError on literal braces in the templates, while
+# newer ones would show doubled braces to the model as they are. Substituted
+# values are never re-parsed by either.
+ANSWER_EXAMPLE = '{ "row": 0, "col": 2 }'
+
+MOVE_PATTERN = re.compile(r'\{.*?\}', re.DOTALL)
+
+
+def prompt_inputs(game):
+    variant = game.variant
+    return {
+        "board": game.board_string(),
+        "player": game.player,
+        "pieces": variant.max_pieces,
+        "next_piece": variant.max_pieces + 1,
+        "win_length": variant.win_length,
+        "answer_format": f'{{ "row": <0-{variant.rows - 1}>, "col": <0-{variant.cols - 1}> }}',
+        "answer_example": ANSWER_EXAMPLE,
+    }
+
+
+def build_prompt(game):
+    prompt = MOVE_PROMPT
+    for key, value in prompt_inputs(game).items():
+        prompt = prompt.replace("{" + key + "}", str(value))
+    return prompt
+
+
+def parse_move(text):
+    match = MOVE_PATTERN.search(text)
+    if not match:
+        return None
+    move = json.loads(match.group())
+    return move["row"], move["col"]
+
+
+class AISession:
+    # The agent, task and crew are built once; each move only fills in {board}
+    # and the variant's rules through crew.kickoff(inputs=...).
+    def __init__(self, llm=DEFAULT_LLM, verbose=False):
+        self.llm = llm
+        self.verbose = verbose
+        self.crew = None
+        self.lock = threading.Lock()
+        self.moves = 0
+        self.overhead_time = 0.0
+        self.model_time = 0.0
+
+    def warm_up(self, ping=False):
+        if self.crew is None:
+            from crewai import Crew, Agent, Task
+
+            agent = Agent(
+                role="Tic Tac Toe Strategist",
+                goal="Win or block the opponent using optimal strategy",
+                backstory="You're a master of Tic Tac Toe trained to think logically about each move.",
+                verbose=self.verbose,
+                allow_delegation=False,
+                llm=self.llm,
+            )
+            task = Task(
+                description=MOVE_PROMPT,
+                expected_output=EXPECTED_OUTPUT,
+                agent=agent,
+            )
+            self.crew = Crew(agents=[agent], tasks=[task], verbose=self.verbose)
+        if ping:
+            self.kickoff(prompt_inputs(GameSession()))
+        return self
+
+    def kickoff(self, inputs):
+        with self.lock:
+            return str(self.crew.kickoff(inputs=inputs))
+
+    def get_move(self, game, cancelled=None):
+        # crew.kickoff() cannot be interrupted, so `cancelled` is ignored.
+        started = time.perf_counter()
+        # The prompt itself is interpolated inside kickoff(), so it is timed
+        # as part of ai.kickoff; this is only the session check and inputs.
+        with metrics.span("ai.inputs"):
+            self.warm_up()
+            inputs = prompt_inputs(game)
+        if self.verbose:
+            print("Current board state sent to AI:")
+            print(inputs["board"])
+
+        model_started = time.perf_counter()
+        with metrics.span("ai.kickoff"):
+            result = self.kickoff(inputs)
+        model_finished = time.perf_counter()
+        if self.verbose:
+            print("[AI OUTPUT]:", result)
+
+        with metrics.span("ai.parse"):
+            move = parse_move(result)
+        finished = time.perf_counter()
+        self.moves += 1
+        self.model_time += model_finished - model_started
+        self.overhead_time += (model_started - started) + (finished - model_finished)
+        return move
+
+    def stats(self):
+        moves = self.moves or 1
+        return {
+            "moves": self.moves,
+            "avg_overhead_ms": self.overhead_time / moves * 1000,
+            "avg_model_ms": self.model_time / moves * 1000,
+        }
+
+
+class AILoader:
+    # Imports and builds the CrewAI stack on a background thread so the menu
+    # can appear before the (slow) import finishes. session_factory swaps in
+    # another session type (e.g. llm_stream.StreamingSession).
+    LOADING, READY, UNAVAILABLE = "loading", "ready", "unavailable"
+
+    def __init__(self, llm=DEFAULT_LLM, verbose=False, on_done=None, session_factory=None):
+        self.llm = llm
+        self.verbose = verbose
+        self.on_done = on_done
+        self.session_factory = session_factory
+        self.status = self.LOADING
+        self.session = None
+        self.error = None
+        self.load_time = None
+        self.future = None
+
+    def start(self):
+        if self.future is None:
+            self.future = run_in_background(self.load)
+        return self
+
+    def load(self):
+        started = time.perf_counter()
+        try:
+            if self.session_factory:
+                self.session = self.session_factory().warm_up()
+            else:
+                self.session = AISession(self.llm, self.verbose).warm_up()
+            self.status = self.READY
+        except Exception as e:
+            print(f"AI initialization failed: {e}")
+            self.error = e
+            self.status = self.UNAVAILABLE
+        self.load_time = time.perf_counter() - started
+        if self.on_done:
+            self.on_done(self)
@@ -0,0 +1,214 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from metrics import metrics
+
+DEFAULT_DEADLINE = 10.0
+DEFAULT_MIN_DELAY = 0.5
+DEFAULT_RACE_TARGET = 2.0
+
+
+def run_in_background(fn, *args):
+    future = Future()
+
+    def worker():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    # Daemon threads so a slow LLM call never keeps the window from closing.
+    threading.Thread(target=worker, daemon=True).start()
+    return future
+
+
+class CancelEvent(threading.Event):
+    # An Event that also runs callbacks when set, so a provider blocked on I/O
+    # (a stalled HTTP response) can be woken instead of noticing the flag only
+    # when its next chunk arrives. A callback added after set() runs at once.
+    def __init__(self):
+        super().__init__()
+        self.callback_lock = threading.Lock()
+        self.callbacks = []
+
+    def on_set(self, fn):
+        with self.callback_lock:
+            if not self.is_set():
+                self.callbacks.append(fn)
+                return
+        fn()
+
+    def set(self):
+        with self.callback_lock:
+            super().set()
+            callbacks, self.callbacks = self.callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception as e:
+                print("Cancel callback failed:", e)
+
+
+class AITurn:
+    def __init__(self, move_fn, fallback_fn, game, deadline=DEFAULT_DEADLINE, min_delay=DEFAULT_MIN_DELAY, future=None):
+        self.fallback_fn = fallback_fn
+        self.game = game.copy()
+        self.deadline = deadline
+        self.min_delay = min_delay
+        self.started = time.monotonic()
+        # A speculative future (see Speculator) replaces the fresh request.
+        self.future = future or run_in_background(move_fn, self.game.copy())
+        # The fallback is a search too, so it runs on its own thread and is
+        # polled like the primary; poll() never blocks the UI.
+        self.fallback = None
+        self.fallback_started = None
+        self.move = None
+        self.used_fallback = False
+        self.answered_at = None
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def poll(self):
+        if self.move is not None:
+            return self.move
+
+        elapsed = self.elapsed()
+        if self.fallback is not None:
+            if not self.fallback.done():
+                return None
+            metrics.record("ai.fallback", elapsed - self.fallback_started)
+            move = self.fallback_result()
+        elif self.future.done():
+            if self.answered_at is None:
+                self.answered_at = elapsed
+                metrics.record("ai.worker", elapsed)
+            if elapsed < self.min_delay:
+                return None
+            metrics.record("ai.min_delay_wait", elapsed - self.answered_at)
+            move = self.result()
+            if not self.is_legal(move):
+                self.start_fallback(elapsed)
+                return None
+        elif elapsed >= self.deadline:
+            print(f"AI move timed out after {elapsed:.1f}s, using fallback")
+            self.future.cancel()
+            self.start_fallback(elapsed)
+            return None
+        else:
+            return None
+
+        self.move = move
+        metrics.record("ai.turn", self.elapsed())
+        return move
+
+    def start_fallback(self, elapsed):
+        self.used_fallback = True
+        self.fallback_started = elapsed
+        self.fallback = run_in_background(self.fallback_fn, self.game.copy())
+
+    def fallback_result(self):
+        try:
+            move = self.fallback.result()
+        except Exception as e:
+            print("Fallback move failed:", e)
+            move = None
+        if self.is_legal(move):
+            return move
+        # Last resort, so the turn always ends.
+        return self.game.empty_cells()[0]
+
+    def is_legal(self, move):
+        try:
+            row, col = move
+            return self.game.is_valid_move(row, col)
+        except (TypeError, ValueError):
+            return False
+
+    def result(self):
+        try:
+            return self.future.result()
+        except Exception as e:
+            print("AI move failed:", e)
+            return None
+
+
+class MoveRace:
+    # Hedged move requests: every provider starts at once on its own copy of
+    # the position, listed best first as (name, fn(game, cancelled)). The race
+    # ends when the best provider still in the running answers with a legal
+    # move, or at `target` seconds with the best legal answer so far (or the
+    # first one after that). Losers are cancelled: `cancelled` is set so
+    # providers that can stop early do (the streaming LLM shuts its socket,
+    # even mid-read), and whatever the rest return is ignored. A caller's own
+    # CancelEvent (Speculator) is shared with the providers, so it stops them
+    # too.
+    def __init__(self, providers, target=DEFAULT_RACE_TARGET):
+        self.providers = providers
+        self.target = target
+        self.lock = threading.Lock()
+        self.wins = {name: 0 for name, _ in providers}
+        self.races = 0
+        self.decided_by_target = 0
+        self.no_answer = 0
+        self.total_time = 0.0
+
+    def __call__(self, game, cancelled=None):
+        started = time.monotonic()
+        cancelled = cancelled or CancelEvent()
+        futures = [run_in_background(fn, game.copy(), cancelled) for _, fn in self.providers]
+        answers = [None] * len(futures)
+        pending = set(range(len(futures)))
+        winner = None
+        by_target = False
+        while True:
+            for index in [index for index in pending if futures[index].done()]:
+                pending.discard(index)
+                answers[index] = self.answer(futures[index], game)
+            best = next((index for index, move in enumerate(answers) if move is not None), None)
+            elapsed = time.monotonic() - started
+            if best is not None and not any(index < best for index in pending):
+                winner = best
+                break
+            if best is not None and elapsed >= self.target:
+                winner = best
+                by_target = True
+                break
+            if not pending:
+                break
+            timeout = self.target - elapsed if elapsed < self.target else None
+            wait([futures[index] for index in pending], timeout, FIRST_COMPLETED)
+        cancelled.set()
+
+        elapsed = time.monotonic() - started
+        metrics.record("ai.race", elapsed)
+        with self.lock:
+            self.races += 1
+            self.total_time += elapsed
+            if winner is None:
+                self.no_answer += 1
+                return None
+            self.wins[self.providers[winner][0]] += 1
+            self.decided_by_target += by_target
+        return answers[winner]
+
+    def answer(self, future, game):
+        try:
+            move = future.result()
+            row, col = move
+        except Exception:
+            return None
+        return move if game.is_valid_move(row, col) else None
+
+    def stats(self):
+        races = self.races or 1
+        return {
+            "races": self.races,
+            "wins": dict(self.wins),
+            "decided_by_target": self.decided_by_target,
+            "no_answer": self.no_answer,
+            "avg_ms": self.total_time / races * 1000,
+        }
@@ -0,0 +1,191 @@
+import numpy as np
+
+from bitboard import DEFAULT_VARIANT, X, O
+from game_engine import REPETITION_LIMIT
+
+# Board arrays hold EMPTY / PIECE_X / PIECE_O per cell. Age arrays hold each
+# piece's position in its owner's queue, 0 being the oldest, and NO_AGE on
+# empty cells. Side arrays hold X or O for the side to move.
+EMPTY, PIECE_X, PIECE_O = 0, 1, 2
+NO_AGE = -1
+NO_CELL = -1
+DEFAULT_MAX_MOVES = 200
+
+_line_matrices = {}
+_zobrist_tables = {}
+
+
+def line_matrix(variant=DEFAULT_VARIANT):
+    # (cells, lines) 0/1 matrix: a (N, cells) piece mask times this gives the
+    # number of pieces in every line of every board in one product.
+    matrix = _line_matrices.get(variant)
+    if matrix is None:
+        matrix = np.zeros((variant.cells, len(variant.lines)), dtype=np.float32)
+        for line_index, line in enumerate(variant.lines):
+            for row, col in line:
+                matrix[variant.cell_index(row, col), line_index] = 1
+        _line_matrices[variant] = matrix
+    return matrix
+
+
+def zobrist_table(variant=DEFAULT_VARIANT):
+    # (3, max_pieces + 1, cells) keys indexed by piece, age + 1 and cell, plus
+    # a side-to-move key. The EMPTY and NO_AGE rows are zero, so empty cells
+    # drop out of the XOR.
+    table = _zobrist_tables.get(variant)
+    if table is None:
+        rng = np.random.default_rng(0)
+        keys = rng.integers(0, np.iinfo(np.uint64).max, (3, variant.max_pieces + 1, variant.cells),
+                            dtype=np.uint64, endpoint=True)
+        keys[EMPTY] = 0
+        keys[:, 0] = 0
+        side_key = rng.integers(0, np.iinfo(np.uint64).max, dtype=np.uint64, endpoint=True)
+        table = _zobrist_tables[variant] = keys, side_key
+    return table
+
+
+def position_hashes(boards, ages, sides, variant=DEFAULT_VARIANT):
+    # One 64-bit Zobrist hash per board covering pieces, queue ages and the
+    # side to move, so equal hashes mean (up to collisions) equal positions.
+    keys, side_key = zobrist_table(variant)
+    flat_boards = boards.reshape(len(boards), -1)
+    flat_ages = ages.reshape(len(boards), -1).astype(np.intp) + 1
+    hashes = np.bitwise_xor.reduce(keys[flat_boards, flat_ages, np.arange(variant.cells)], axis=1)
+    return hashes ^ sides.astype(np.uint64) * side_key
+
+
+def new_batch(count, variant=DEFAULT_VARIANT):
+    boards = np.zeros((count, variant.rows, variant.cols), dtype=np.int8)
+    ages = np.full((count, variant.rows, variant.cols), NO_AGE, dtype=np.int8)
+    sides = np.zeros(count, dtype=np.int8)
+    return boards, ages, sides
+
+
+def from_states(states, variant=DEFAULT_VARIANT):
+    boards, ages, sides = new_batch(len(states), variant)
+    flat_boards = boards.reshape(len(states), -1)
+    flat_ages = ages.reshape(len(states), -1)
+    for index, state in enumerate(states):
+        for side, piece in ((X, PIECE_X), (O, PIECE_O)):
+            for age, cell in enumerate(variant.queue_cells(state, side)):
+                flat_boards[index, cell] = piece
+                flat_ages[index, cell] = age
+        sides[index] = variant.side_to_move(state)
+    return boards, ages, sides
+
+
+def to_states(boards, ages, sides, variant=DEFAULT_VARIANT):
+    flat_boards = boards.reshape(len(boards), -1)
+    flat_ages = ages.reshape(len(boards), -1)
+    states = []
+    for index in range(len(boards)):
+        queues = []
+        for piece in (PIECE_X, PIECE_O):
+            cells = np.flatnonzero(flat_boards[index] == piece)
+            queues.append(cells[np.argsort(flat_ages[index, cells])].tolist())
+        states.append(variant.pack(queues[0], queues[1], int(sides[index])))
+    return states
+
+
+def line_counts(boards, piece, variant=DEFAULT_VARIANT):
+    mask = (boards.reshape(len(boards), -1) == piece).astype(np.float32)
+    return mask @ line_matrix(variant)
+
+
+def winners(boards, variant=DEFAULT_VARIANT):
+    # EMPTY, PIECE_X or PIECE_O per board; PIECE_X | PIECE_O if both sides
+    # have a line, which cannot happen in a real game.
+    k = variant.win_length
+    x_won = (line_counts(boards, PIECE_X, variant) == k).any(axis=1)
+    o_won = (line_counts(boards, PIECE_O, variant) == k).any(axis=1)
+    return (x_won * PIECE_X | o_won * PIECE_O).astype(np.int8)
+
+
+def legal_moves(boards):
+    # A move must target a cell that is empty before the mover's oldest piece
+    # expires, so this is simply the empty cells.
+    return boards == EMPTY
+
+
+def expiring_cells(boards, ages, variant=DEFAULT_VARIANT):
+    # (N, 2) flat cell index of the piece X and O would lose on their next
+    # move, NO_CELL where the queue is not full yet.
+    flat_boards = boards.reshape(len(boards), -1)
+    flat_ages = ages.reshape(len(boards), -1)
+    result = np.full((len(boards), 2), NO_CELL, dtype=np.int32)
+    for side, piece in ((X, PIECE_X), (O, PIECE_O)):
+        mine = flat_boards == piece
+        full = mine.sum(axis=1) == variant.max_pieces
+        oldest = (mine & (flat_ages == 0)).argmax(axis=1)
+        result[full, side] = oldest[full]
+    return result
+
+
+def play(boards, ages, sides, cells, variant=DEFAULT_VARIANT):
+    # Plays one move on every board in place and returns which boards the
+    # move won. Cells are flat indices and must be legal.
+    count = len(boards)
+    rows = np.arange(count)
+    flat_boards = boards.reshape(count, -1)
+    flat_ages = ages.reshape(count, -1)
+    pieces = (sides + 1).astype(np.int8)
+
+    mine = flat_boards == pieces[:, None]
+    full = mine.sum(axis=1) == variant.max_pieces
+    expiring = mine & (flat_ages == 0) & full[:, None]
+    flat_boards[expiring] = EMPTY
+    flat_ages[expiring] = NO_AGE
+    aging = mine & ~expiring & full[:, None]
+    flat_ages[aging] -= 1
+
+    flat_boards[rows, cells] = pieces
+    flat_ages[rows, cells] = (mine & ~expiring).sum(axis=1)
+    sides ^= 1
+
+    k = variant.win_length
+    mover_mask = (flat_boards == pieces[:, None]).astype(np.float32)
+    return ((mover_mask @ line_matrix(variant)) == k).any(axis=1)
+
+
+def self_play(games, variant=DEFAULT_VARIANT, max_moves=DEFAULT_MAX_MOVES, seed=None, record=False):
+    # Uniformly random games played in lockstep. Returns the winning piece (or
+    # EMPTY for a draw) and move count per game, plus, when recording, a list
+    # of (game indices, boards, ages, sides, chosen cells) for every ply. A
+    # game whose position occurs for the REPETITION_LIMIT-th time is a draw,
+    # as is one that reaches max_moves.
+    rng = np.random.default_rng(seed)
+    boards, ages, sides = new_batch(games, variant)
+    results = np.zeros(games, dtype=np.int8)
+    moves = np.zeros(games, dtype=np.int32)
+    active = np.arange(games)
+    history = []
+    # Active games are all at the same ply, so a position can only repeat one
+    # from an earlier ply of the same parity (same side to move).
+    hashes = np.zeros((max_moves + 1, games), dtype=np.uint64)
+    hashes[0] = position_hashes(boards, ages, sides, variant)
+    for ply in range(1, max_moves + 1):
+        if not active.size:
+            break
+        batch_boards, batch_ages, batch_sides = boards[active], ages[active], sides[active]
+        legal = legal_moves(batch_boards).reshape(len(active), -1)
+        playable = legal.any(axis=1)
+        scores = rng.random(legal.shape)
+        scores[~legal] = -1
+        cells = scores.argmax(axis=1)
+        if not playable.all():
+            active, cells = active[playable], cells[playable]
+            batch_boards, batch_ages, batch_sides = boards[active], ages[active], sides[active]
+        if record:
+            history.append((active, batch_boards.copy(), batch_ages.copy(), batch_sides.copy(), cells))
+
+        movers = batch_sides + 1
+        won = play(batch_boards, batch_ages, batch_sides, cells, variant)
+        boards[active], ages[active], sides[active] = batch_boards, batch_ages, batch_sides
+        moves[active] += 1
+        results[active[won]] = movers[won]
+
+        current = position_hashes(batch_boards, batch_ages, batch_sides, variant)
+        hashes[ply, active] = current
+        repeats = (hashes[ply % 2:ply:2][:, active] == current).sum(axis=0) + 1
+        active = active[~won & (repeats < REPETITION_LIMIT)]
+    return results, moves, history
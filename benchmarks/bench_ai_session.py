@@ -0,0 +1,42 @@
+import time
+
+from crewai import Crew, Task
+
+from ai_session import ANSWER_EXAMPLE, AISession, EXPECTED_OUTPUT, build_prompt, prompt_inputs
+from game_engine import GameSession
+
+MOVES = 200
+
+
+def per_move_pipeline(session, game):
+    # What get_ai_move() did on every turn before the session was reused.
+    task = Task(
+        description=build_prompt(game),
+        expected_output=EXPECTED_OUTPUT.format(answer_example=ANSWER_EXAMPLE),
+        agent=session.crew.agents[0],
+    )
+    Crew(agents=[session.crew.agents[0]], tasks=[task], verbose=False)
+
+
+def reused_pipeline(session, game):
+    # What kickoff(inputs=...) does before it calls the model: fill the
+    # prepared task's placeholders from the inputs.
+    session.crew._interpolate_inputs(prompt_inputs(game))
+
+
+def bench(fn, session, game):
+    start = time.perf_counter()
+    for _ in range(MOVES):
+        fn(session, game)
+    return (time.perf_counter() - start) / MOVES * 1000
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    session = AISession().warm_up()
+    print(f"one-time warm up:   {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+    game = GameSession()
+    game.make_move(1, 1)
+    print(f"rebuilt per move:   {bench(per_move_pipeline, session, game):8.3f} ms/move")
+    print(f"reused session:     {bench(reused_pipeline, session, game):8.3f} ms/move")
@@ -0,0 +1,70 @@
+import random
+import sys
+import time
+
+import batch_eval
+from bitboard import parse_variant
+from game_engine import GameSession
+
+BOARDS = 20000
+GAMES = 5000
+
+
+def sample_games(variant, count, seed=1234):
+    rng = random.Random(seed)
+    games = []
+    while len(games) < count:
+        game = GameSession(variant=variant)
+        for _ in range(rng.randint(0, 30)):
+            game.make_move(*rng.choice(game.empty_cells()))
+            if game.game_over:
+                break
+        games.append(game)
+    return games
+
+
+def bench_evaluate(variant):
+    games = sample_games(variant, BOARDS)
+    started = time.perf_counter()
+    for game in games:
+        game.check_winner()
+        game.empty_cells()
+        game.oldest('X')
+        game.oldest('O')
+    per_board = time.perf_counter() - started
+
+    boards, ages, _ = batch_eval.from_states([game.state for game in games], variant)
+    started = time.perf_counter()
+    batch_eval.winners(boards, variant)
+    batch_eval.legal_moves(boards)
+    batch_eval.expiring_cells(boards, ages, variant)
+    batch = time.perf_counter() - started
+    return per_board, batch
+
+
+def bench_self_play(variant):
+    rng = random.Random(1234)
+    moves = 0
+    started = time.perf_counter()
+    for _ in range(GAMES):
+        game = GameSession(variant=variant)
+        while not game.game_over and moves < GAMES * batch_eval.DEFAULT_MAX_MOVES:
+            game.make_move(*rng.choice(game.empty_cells()))
+            moves += 1
+    per_board = moves / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    _, batch_moves, _ = batch_eval.self_play(GAMES, variant, seed=1234)
+    batch = batch_moves.sum() / (time.perf_counter() - started)
+    return per_board, batch
+
+
+if __name__ == "__main__":
+    variants = [parse_variant(text) for text in sys.argv[1:]] or [parse_variant("3x3"), parse_variant("7x7:4:5")]
+    for variant in variants:
+        per_board, batch = bench_evaluate(variant)
+        print(f"{variant.name:<16} evaluate {BOARDS} boards  per-board: {per_board * 1000:8.1f} ms  "
+              f"batch: {batch * 1000:8.1f} ms  speedup: {per_board / batch:6.1f}x")
+        per_board, batch = bench_self_play(variant)
+        print(f"{variant.name:<16} random self-play   per-board: {per_board:10.0f} moves/s  "
+              f"batch: {batch:10.0f} moves/s  speedup: {batch / per_board:6.1f}x")
@@ -0,0 +1,155 @@
+import random
+import time
+from collections import deque
+
+from bitboard import EMPTY_STATE, X, O, Variant, empty_mask, iter_cells, play, winning_cells
+
+GAMES = 2000
+MAX_MOVES = 60
+LARGE_VARIANTS = [Variant(7, 7, 4, 5), Variant(15, 15, 5, 5)]
+
+
+class ListBoard:
+    # The list-of-lists representation the GUIs used before the bitboard engine.
+    def __init__(self):
+        self.board = [[None] * 3 for _ in range(3)]
+        self.x_positions = deque()
+        self.o_positions = deque()
+        self.player = 'X'
+
+    def check_winner(self):
+        board = self.board
+        for row in range(3):
+            if board[row][0] == board[row][1] == board[row][2] and board[row][0]:
+                return board[row][0]
+        for col in range(3):
+            if board[0][col] == board[1][col] == board[2][col] and board[0][col]:
+                return board[0][col]
+        if board[0][0] == board[1][1] == board[2][2] and board[0][0]:
+            return board[0][0]
+        if board[0][2] == board[1][1] == board[2][0] and board[0][2]:
+            return board[0][2]
+        return None
+
+    def make_move(self, row, col):
+        positions = self.x_positions if self.player == 'X' else self.o_positions
+        if len(positions) >= 3:
+            old_row, old_col = positions.popleft()
+            self.board[old_row][old_col] = None
+        positions.append((row, col))
+        self.board[row][col] = self.player
+        result = self.check_winner()
+        self.player = 'O' if self.player == 'X' else 'X'
+        return result
+
+    def fallback_move(self):
+        board = self.board
+        for mark in ('O', 'X'):
+            for row in range(3):
+                for col in range(3):
+                    if board[row][col] is None:
+                        board[row][col] = mark
+                        won = self.check_winner() == mark
+                        board[row][col] = None
+                        if won:
+                            return row, col
+        return None
+
+
+def random_games(seed):
+    rng = random.Random(seed)
+    games = []
+    for _ in range(GAMES):
+        state = EMPTY_STATE
+        moves = []
+        for _ in range(MAX_MOVES):
+            cell = rng.choice(list(iter_cells(empty_mask(state))))
+            moves.append(cell)
+            state, won = play(state, cell)
+            if won:
+                break
+        games.append(moves)
+    return games
+
+
+def bench_list_moves(games):
+    count = 0
+    start = time.perf_counter()
+    for moves in games:
+        board = ListBoard()
+        for cell in moves:
+            board.make_move(*divmod(cell, 3))
+        count += len(moves)
+    return time.perf_counter() - start, count
+
+
+def bench_bitboard_moves(games):
+    count = 0
+    start = time.perf_counter()
+    for moves in games:
+        state = EMPTY_STATE
+        for cell in moves:
+            state, won = play(state, cell)
+        count += len(moves)
+    return time.perf_counter() - start, count
+
+
+def bench_list_fallback(games):
+    count = 0
+    start = time.perf_counter()
+    for moves in games:
+        board = ListBoard()
+        for cell in moves:
+            board.fallback_move()
+            board.make_move(*divmod(cell, 3))
+        count += len(moves)
+    return time.perf_counter() - start, count
+
+
+def bench_bitboard_fallback(games):
+    count = 0
+    start = time.perf_counter()
+    for moves in games:
+        state = EMPTY_STATE
+        for cell in moves:
+            winning_cells(state, O) or winning_cells(state, X)
+            state, won = play(state, cell)
+        count += len(moves)
+    return time.perf_counter() - start, count
+
+
+def bench_variant(variant, seed, games=200, max_moves=200):
+    # Random play on a larger board; play() only tests the windows through
+    # the placed cell, so the cost should stay flat as the board grows.
+    rng = random.Random(seed)
+    count = 0
+    elapsed = 0.0
+    for _ in range(games):
+        state = EMPTY_STATE
+        for _ in range(max_moves):
+            cell = rng.choice(list(iter_cells(variant.empty_mask(state))))
+            start = time.perf_counter()
+            state, won = variant.play(state, cell)
+            elapsed += time.perf_counter() - start
+            count += 1
+            if won:
+                break
+    return elapsed, count
+
+
+def report(name, baseline, candidate):
+    base_time, count = baseline
+    cand_time, _ = candidate
+    base_us = base_time / count * 1e6
+    cand_us = cand_time / count * 1e6
+    print(f"{name:<16} list: {base_us:7.3f} us/move  bitboard: {cand_us:7.3f} us/move  speedup: {base_us / cand_us:5.2f}x")
+
+
+if __name__ == "__main__":
+    games = random_games(seed=1234)
+    print(f"{GAMES} random games, {sum(len(g) for g in games)} moves")
+    report("make_move", bench_list_moves(games), bench_bitboard_moves(games))
+    report("fallback scan", bench_list_fallback(games), bench_bitboard_fallback(games))
+    for variant in LARGE_VARIANTS:
+        elapsed, count = bench_variant(variant, seed=1234)
+        print(f"{variant.name:<16} {len(variant.lines)} lines, play: {elapsed / count * 1e6:7.3f} us/move")
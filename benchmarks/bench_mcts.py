@@ -0,0 +1,44 @@
+import os
+import sys
+
+from bitboard import parse_variant
+from game_engine import GameSession
+from mcts import MCTSEngine
+
+BUDGET_MS = 1000
+SEARCHES = 3
+
+
+def worker_counts():
+    counts = [1]
+    while counts[-1] * 2 <= os.cpu_count():
+        counts.append(counts[-1] * 2)
+    if counts[-1] != os.cpu_count():
+        counts.append(os.cpu_count())
+    return counts
+
+
+def bench(variant, workers):
+    engine = MCTSEngine(variant, budget_ms=BUDGET_MS, workers=workers, seed=1)
+    game = GameSession(variant=variant)
+    game.make_move(variant.rows // 2, variant.cols // 2)
+    try:
+        # The first search also pays for starting the worker processes.
+        engine.search(game.state)
+        rates = []
+        for _ in range(SEARCHES):
+            engine.search(game.state)
+            rates.append(engine.last["playouts_per_s"])
+    finally:
+        engine.close()
+    return max(rates)
+
+
+if __name__ == "__main__":
+    variants = [parse_variant(text) for text in sys.argv[1:]] or [parse_variant("3x3"), parse_variant("7x7:4:5")]
+    for variant in variants:
+        single = None
+        for workers in worker_counts():
+            rate = bench(variant, workers)
+            single = single or rate
+            print(f"{variant.name:<16} {workers:3d} workers {rate:10.0f} playouts/s  scaling: {rate / single:5.2f}x")
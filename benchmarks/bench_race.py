@@ -0,0 +1,86 @@
+import argparse
+import random
+import threading
+import time
+
+from ai_worker import MoveRace
+from game_engine import GameSession
+from search import AlphaBetaEngine
+from strategies import fallback_move
+
+
+class SlowLLM:
+    # Stands in for the LLM: the rule-based move after a long-tailed
+    # (log-normal) delay. Sleeps in short steps so a cancelled request stops
+    # the way a closed stream does.
+    def __init__(self, median, sigma, seed):
+        self.median = median
+        self.sigma = sigma
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.cancelled = 0
+
+    def __call__(self, game, cancelled=None):
+        with self.lock:
+            latency = self.median * self.rng.lognormvariate(0, self.sigma)
+        deadline = time.perf_counter() + latency
+        while time.perf_counter() < deadline:
+            if cancelled is not None and cancelled.is_set():
+                with self.lock:
+                    self.cancelled += 1
+                return None
+            time.sleep(min(0.005, max(0.0, deadline - time.perf_counter())))
+        return fallback_move(game)
+
+
+def play(games, ai, seed):
+    # Both sides ask `ai` for their moves; returns the time per move.
+    rng = random.Random(seed)
+    times = []
+    for _ in range(games):
+        game = GameSession()
+        game.make_move(*rng.choice(game.empty_cells()))
+        for _ in range(20):
+            started = time.perf_counter()
+            move = ai(game.copy()) or fallback_move(game)
+            times.append(time.perf_counter() - started)
+            game.make_move(*move)
+            if game.game_over:
+                break
+    return times
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI move latency with and without racing a local engine.")
+    parser.add_argument("-n", "--games", type=int, default=4)
+    parser.add_argument("--median", type=float, default=0.05, help="median LLM seconds per move")
+    parser.add_argument("--sigma", type=float, default=1.0, help="log-normal spread of LLM latency")
+    parser.add_argument("--search-depth", type=int, default=4)
+    parser.add_argument("--target", type=float, default=0.1, help="race latency target in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    engine = AlphaBetaEngine(max_depth=args.search_depth)
+    search = lambda game, cancelled: engine.best_move(game)
+    runs = []
+    for label in ("llm only", "race"):
+        llm = SlowLLM(args.median, args.sigma, args.seed)
+        race = MoveRace([("llm", llm), ("search", search)], args.target) if label == "race" else None
+        times = play(args.games, race or llm, args.seed)
+        runs.append((label, times, llm, race))
+
+    for label, times, llm, race in runs:
+        times.sort()
+        print(f"{label:<9} {len(times):4d} moves  p50 {percentile(times, 0.5) * 1000:7.1f} ms"
+              f"  p90 {percentile(times, 0.9) * 1000:7.1f} ms  p99 {percentile(times, 0.99) * 1000:7.1f} ms"
+              f"  max {times[-1] * 1000:7.1f} ms")
+        if race:
+            print(f"{'':<9} {race.stats()}  llm cancelled {llm.cancelled}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import random
+import time
+
+from game_engine import GameSession
+from speculation import Speculator
+from strategies import fallback_move
+
+
+def slow_ai(latency):
+    # Stands in for the LLM: the rule-based move after a fixed delay.
+    def move(game, cancelled=None):
+        time.sleep(latency)
+        return fallback_move(game)
+    return move
+
+
+def play(games, ai, speculator, think, mistakes, seed):
+    # The human (X) plays the rule-based move, or a random one with
+    # probability `mistakes`, after `think` seconds. Returns the waits between
+    # each human move and the AI reply.
+    rng = random.Random(seed)
+    waits = []
+    for _ in range(games):
+        game = GameSession()
+        for _ in range(40):
+            if speculator:
+                speculator.start(game)
+            time.sleep(think)
+            move = rng.choice(game.empty_cells()) if rng.random() < mistakes else fallback_move(game)
+            game.make_move(*move)
+            if game.game_over:
+                break
+            started = time.perf_counter()
+            future = speculator.take(game) if speculator else None
+            reply = future.result() if future else ai(game.copy())
+            waits.append(time.perf_counter() - started)
+            game.make_move(*reply)
+            if game.game_over:
+                break
+        if speculator:
+            speculator.discard()
+    return waits
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI reply latency with and without speculation.")
+    parser.add_argument("-n", "--games", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="AI seconds per move")
+    parser.add_argument("--think", type=float, default=0.15, help="human seconds per move")
+    parser.add_argument("--mistakes", type=float, default=0.3, help="chance the human plays a random move")
+    parser.add_argument("-w", "--workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    ai = slow_ai(args.latency)
+    for label, speculator in (("no speculation", None), ("speculation", Speculator(ai, args.workers))):
+        waits = play(args.games, ai, speculator, args.think, args.mistakes, args.seed)
+        waits.sort()
+        print(f"{label:<15} {len(waits):4d} replies  p50 {waits[len(waits) // 2] * 1000:7.1f} ms"
+              f"  max {waits[-1] * 1000:7.1f} ms")
+        if speculator:
+            print(f"{'':<15} {speculator.stats()}")
+            speculator.close()
+
+
+if __name__ == "__main__":
+    main()
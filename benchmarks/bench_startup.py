@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import time
+
+ENTRY_POINTS = ["tic_tac_toe.py", "tic_tac_toe_ai.py"]
+RUNS = 3
+TIMEOUT = 60.0
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(script):
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYTHONUNBUFFERED="1")
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, script], cwd=ROOT, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    menu_ms = ai_ms = None
+    try:
+        for line in process.stdout:
+            elapsed = (time.perf_counter() - started) * 1000
+            if line.startswith("[startup] menu shown"):
+                menu_ms = elapsed
+                if script != "tic_tac_toe_ai.py":
+                    break
+            elif line.startswith("[startup] AI"):
+                ai_ms = elapsed
+                break
+            if elapsed > TIMEOUT * 1000:
+                break
+    finally:
+        process.kill()
+        process.wait()
+    return menu_ms, ai_ms
+
+
+def fmt(value):
+    return f"{value:8.0f} ms" if value is not None else "       n/a"
+
+
+if __name__ == "__main__":
+    for script in ENTRY_POINTS:
+        for run in range(RUNS):
+            menu_ms, ai_ms = measure(script)
+            print(f"{script:<20} run {run + 1}: menu visible {fmt(menu_ms)}   AI ready {fmt(ai_ms)}")
@@ -0,0 +1,78 @@
+import argparse
+import random
+import time
+
+from game_engine import GameSession
+from strategies import fallback_move
+from llm_stream import StreamingSession
+from llm_stub import StubLLM, StubStreamServer
+
+
+def positions(count, seed):
+    # Positions from random play, each with O to move like the AI in the GUI.
+    rng = random.Random(seed)
+    games = []
+    while len(games) < count:
+        game = GameSession()
+        for _ in range(rng.randrange(0, 12)):
+            row, col = rng.choice(game.empty_cells())
+            game.make_move(row, col)
+            if game.game_over:
+                break
+        if not game.game_over and game.player == 'O':
+            games.append(game)
+    return games
+
+
+def run(server, api, stop_early, constrained, games):
+    base_url = server.url if api == "ollama" else server.url + "/v1"
+    session = StreamingSession(base_url, api=api, stop_early=stop_early, constrained=constrained)
+    sent = server.sent
+    validation = 0.0
+    for game in games:
+        move = session.get_move(game)
+        # What AITurn does with the reply; an invalid one costs a fallback.
+        started = time.perf_counter()
+        if move is None or not game.is_valid_move(*move):
+            fallback_move(game)
+        validation += time.perf_counter() - started
+    stats = session.stats()
+    stats["validation_us"] = validation / len(games) * 1e6
+    stats["tokens_generated"] = (server.sent - sent) / len(games)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming LLM moves against the local stub server.")
+    parser.add_argument("-n", "--moves", type=int, default=30)
+    parser.add_argument("--token-delay", type=float, default=0.01, help="stub seconds per token")
+    parser.add_argument("--mistakes", type=float, default=0.2,
+                        help="share of stub answers that are illegal or carry no JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = StubStreamServer(token_delay=args.token_delay).start()
+    games = positions(args.moves, args.seed)
+    modes = (
+        ("full reply", False, False),
+        ("early stop", True, False),
+        ("constrained", True, True),
+    )
+    try:
+        print(f"{'api':<8} {'mode':<12} {'first token':>12} {'time to move':>13} {'request':>10} {'tokens':>7}"
+              f" {'invalid':>8} {'validate':>9}")
+        for api in ("ollama", "openai"):
+            for mode, stop_early, constrained in modes:
+                # A fresh stub per mode, so every mode sees the same replies
+                # and the same mistakes.
+                server.llm = StubLLM(mistake_rate=args.mistakes, seed=args.seed)
+                stats = run(server, api, stop_early, constrained, games)
+                print(f"{api:<8} {mode:<12} {stats['avg_first_token_ms']:10.1f}ms {stats['avg_time_to_move_ms']:11.1f}ms"
+                      f" {stats['avg_request_ms']:8.1f}ms {stats['tokens_generated']:7.1f}"
+                      f" {stats['invalid_replies']:4d}/{stats['moves']:<3d} {stats['validation_us']:7.1f}us")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from server import DEFAULT_HOST, encode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def player(host, port, rng, stats, target, done):
+    # Joins, plays random legal moves whenever it is our turn, and rejoins
+    # after every game until the target number of games is reached. The board
+    # is tracked from the server's diffs only.
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            writer.write(encode({"op": "join"}))
+            joined = json.loads(await reader.readline())
+            me = joined["player"]
+            rows, cols = joined["variant"]["rows"], joined["variant"]["cols"]
+            board = {}
+            turn = None
+            while True:
+                message = json.loads(await reader.readline())
+                kind = message["type"]
+                if kind == "start":
+                    turn = message["turn"]
+                elif kind == "diff":
+                    if message["removed"]:
+                        del board[tuple(message["removed"])]
+                    board[tuple(message["move"])] = message["player"]
+                    turn = message["turn"]
+                    if me == 'X':
+                        stats["moves"] += 1
+                    if message["result"]:
+                        break
+                elif kind == "end":
+                    break
+                elif kind == "error":
+                    raise RuntimeError(message["message"])
+                if turn == me:
+                    row, col = rng.choice([
+                        (r, c) for r in range(rows) for c in range(cols) if (r, c) not in board
+                    ])
+                    writer.write(encode({"op": "move", "row": row, "col": col}))
+                    await writer.drain()
+            if me == 'X':
+                stats["games"] += 1
+                if stats["games"] >= target:
+                    done.set()
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, sessions, games, seed):
+    stats = {"moves": 0, "games": 0}
+    done = asyncio.Event()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(player(host, port, random.Random(rng.getrandbits(32)), stats, games, done))
+        for _ in range(2 * sessions)
+    ]
+    waiter = asyncio.create_task(done.wait())
+    await asyncio.wait(tasks + [waiter], return_when=asyncio.FIRST_COMPLETED)
+    elapsed = time.perf_counter() - started
+    for task in tasks:
+        task.cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    waiter.cancel()
+    for result in results:
+        if isinstance(result, Exception) and not isinstance(result, asyncio.CancelledError):
+            raise result
+    return stats, elapsed
+
+
+def start_server(variant):
+    # The server runs in its own single-threaded process, so the numbers are
+    # what one core of server can sustain.
+    process = subprocess.Popen(
+        [sys.executable, "server.py", "--port", "0", "--variant", variant],
+        cwd=ROOT, stdout=subprocess.PIPE, text=True,
+    )
+    line = process.stdout.readline()
+    if not line.startswith("[server] listening on "):
+        process.kill()
+        raise RuntimeError(f"server failed to start: {line!r}")
+    host, port = line.rsplit(" ", 1)[1].strip().rsplit(":", 1)
+    return process, host, int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test for server.py over localhost.")
+    parser.add_argument("-s", "--sessions", type=int, default=1000, help="concurrent matches (two clients each)")
+    parser.add_argument("-g", "--games", type=int, default=10000, help="total games to play")
+    parser.add_argument("--variant", default="3x3", help="board as ROWSxCOLS[:K[:PIECES]]")
+    parser.add_argument("--connect", help="HOST:PORT of a running server instead of starting one")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    process = None
+    if args.connect:
+        host, port = args.connect.rsplit(":", 1)
+        port = int(port)
+    else:
+        process, host, port = start_server(args.variant)
+    try:
+        stats, elapsed = asyncio.run(run_load(host or DEFAULT_HOST, port, args.sessions, args.games, args.seed))
+    finally:
+        if process:
+            process.kill()
+            process.wait()
+
+    games = stats["games"]
+    moves = stats["moves"]
+    print(f"{args.sessions} concurrent sessions, {games} games, {moves} moves in {elapsed:.2f}s")
+    print(f"{games / elapsed:10.0f} games/s")
+    print(f"{moves / elapsed:10.0f} moves/s")
+
+
+if __name__ == "__main__":
+    main()
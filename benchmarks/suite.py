@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from ai_session import AISession, MOVE_PROMPT, build_prompt, parse_move
+from bitboard import EMPTY_STATE, cell_position, empty_mask, iter_cells, play
+from game_engine import GameSession
+from llm_stub import StubCrew, StubLLM
+from strategies import fallback_move
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.15
+REPEATS = 5
+
+
+def sample_positions(count, seed=1234):
+    rng = random.Random(seed)
+    positions = []
+    state = EMPTY_STATE
+    while len(positions) < count:
+        cell = rng.choice(list(iter_cells(empty_mask(state))))
+        next_state, won = play(state, cell)
+        if won:
+            state = EMPTY_STATE
+            continue
+        positions.append((state, cell))
+        state = next_state
+    return positions
+
+
+def bench_play(positions):
+    for state, cell in positions:
+        play(state, cell)
+    return len(positions)
+
+
+def bench_make_move(positions):
+    for state, cell in positions:
+        GameSession(state).make_move(*cell_position(cell))
+    return len(positions)
+
+
+def bench_winning_line(positions):
+    games = []
+    for state, cell in positions:
+        game = GameSession(state)
+        game.make_move(*cell_position(cell))
+        games.append(game)
+    started = time.perf_counter()
+    for game in games:
+        game.winning_line()
+        game.check_winner()
+    return len(games), time.perf_counter() - started
+
+
+def bench_fallback(positions):
+    for state, _ in positions:
+        fallback_move(GameSession(state))
+    return len(positions)
+
+
+def bench_prompt_build(positions):
+    for state, _ in positions:
+        build_prompt(GameSession(state))
+    return len(positions)
+
+
+def bench_parse(positions):
+    llm = StubLLM(preamble="Let me think about the board carefully.\n")
+    replies = [llm.complete(build_prompt(GameSession(state))) for state, _ in positions]
+    started = time.perf_counter()
+    for reply in replies:
+        parse_move(reply)
+    return len(replies), time.perf_counter() - started
+
+
+def make_ai_move_bench(latency):
+    def bench(positions):
+        session = AISession()
+        session.crew = StubCrew(StubLLM(latency=latency), MOVE_PROMPT)
+        for state, _ in positions:
+            session.get_move(GameSession(state))
+        return len(positions)
+    return bench
+
+
+def run_bench(fn, positions):
+    best = None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = fn(positions)
+        if isinstance(result, tuple):
+            ops, elapsed = result
+        else:
+            ops, elapsed = result, time.perf_counter() - started
+        per_op = elapsed / ops * 1e6
+        best = per_op if best is None else min(best, per_op)
+    return best
+
+
+def run_suite(positions, llm_latency):
+    benches = [
+        ("play", bench_play, positions),
+        ("make_move", bench_make_move, positions),
+        ("check_winner", bench_winning_line, positions),
+        ("fallback_move", bench_fallback, positions),
+        ("prompt_build", bench_prompt_build, positions),
+        ("parse_move", bench_parse, positions),
+        ("get_ai_move_orchestration", make_ai_move_bench(0.0), positions),
+    ]
+    if llm_latency:
+        benches.append(("get_ai_move_with_latency", make_ai_move_bench(llm_latency), positions[:20]))
+
+    results = {}
+    for name, fn, bench_positions in benches:
+        per_op = run_bench(fn, bench_positions)
+        results[name] = {"us_per_op": round(per_op, 3)}
+        print(f"{name:<28} {per_op:12.3f} us/op")
+    if llm_latency:
+        model_us = llm_latency * 1e6
+        overhead = results["get_ai_move_with_latency"]["us_per_op"] - model_us
+        print(f"{'  model latency':<28} {model_us:12.3f} us/op")
+        print(f"{'  overhead beyond model':<28} {overhead:12.3f} us/op")
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        change = result["us_per_op"] / previous["us_per_op"] - 1
+        flag = "REGRESSION" if change > threshold else ""
+        print(f"{name:<28} {previous['us_per_op']:10.3f} -> {result['us_per_op']:10.3f} us/op  {change * 100:+6.1f}%  {flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless engine and AI micro-benchmarks.")
+    parser.add_argument("--positions", type=int, default=5000, help="sampled positions per benchmark")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated model latency in seconds")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="relative slowdown flagged as a regression")
+    args = parser.parse_args(argv)
+
+    results = run_suite(sample_positions(args.positions), args.llm_latency)
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\ncompared with {args.baseline}:")
+        regressions = compare(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "positions": args.positions,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nsaved baseline to {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
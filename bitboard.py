@@ -0,0 +1,251 @@
+X, O = 0, 1
+SYMBOLS = ('X', 'O')
+EMPTY_STATE = 0
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def iter_cells(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _invert(permutation):
+    inverse = [0] * len(permutation)
+    for cell, image in enumerate(permutation):
+        inverse[image] = cell
+    return tuple(inverse)
+
+
+class Variant:
+    # Board geometry and rules for a rows x cols board, win_length in a row to
+    # win, each player keeping at most max_pieces pieces.
+    #
+    # Packed state layout, low to high bits:
+    #   X occupancy mask | O occupancy mask | X queue | O queue | side to move
+    # Each queue holds max_pieces slots of slot_bits, oldest piece in the
+    # lowest slot, storing cell + 1 so that 0 marks an empty slot.
+    def __init__(self, rows=3, cols=3, win_length=3, max_pieces=3):
+        if rows < 1 or cols < 1 or win_length < 1:
+            raise ValueError(f"{rows}x{cols} with {win_length} in a row is not a board")
+        if win_length > max(rows, cols):
+            raise ValueError(f"{win_length} in a row does not fit on a {rows}x{cols} board")
+        if max_pieces < win_length:
+            raise ValueError(f"{max_pieces} pieces can never make {win_length} in a row")
+        if 2 * max_pieces >= rows * cols:
+            # The side to move would have no empty cell once both queues fill.
+            raise ValueError(f"{max_pieces} pieces each can fill a {rows}x{cols} board")
+        self.rows = rows
+        self.cols = cols
+        self.win_length = win_length
+        self.max_pieces = max_pieces
+        self.name = f"{rows}x{cols}-k{win_length}-p{max_pieces}"
+        self.spec = f"{rows}x{cols}:{win_length}:{max_pieces}"
+
+        self.cells = rows * cols
+        self.full_mask = (1 << self.cells) - 1
+        self.lines = self._lines()
+        self.line_masks = [sum(1 << self.cell_index(row, col) for row, col in line) for line in self.lines]
+        self.lines_through = [[] for _ in range(self.cells)]
+        for mask in self.line_masks:
+            for cell in iter_cells(mask):
+                self.lines_through[cell].append(mask)
+
+        self.slot_bits = self.cells.bit_length()
+        self.slot_mask = (1 << self.slot_bits) - 1
+        self.queue_bits = self.slot_bits * max_pieces
+        self.queue_mask = (1 << self.queue_bits) - 1
+        self.newest_slot_shift = self.slot_bits * (max_pieces - 1)
+        self.queue_shift = 2 * self.cells
+        self.side_shift = self.queue_shift + 2 * self.queue_bits
+        self.side_bit = 1 << self.side_shift
+
+        self.symmetries = self._symmetries()
+        self.inverse_symmetries = [_invert(permutation) for permutation in self.symmetries]
+
+    def __eq__(self, other):
+        return isinstance(other, Variant) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"Variant({self.rows}, {self.cols}, {self.win_length}, {self.max_pieces})"
+
+    def key(self):
+        return self.rows, self.cols, self.win_length, self.max_pieces
+
+    def _lines(self):
+        lines = []
+        for row in range(self.rows):
+            for col in range(self.cols):
+                for d_row, d_col in DIRECTIONS:
+                    end_row = row + d_row * (self.win_length - 1)
+                    end_col = col + d_col * (self.win_length - 1)
+                    if 0 <= end_row < self.rows and 0 <= end_col < self.cols:
+                        lines.append([(row + d_row * i, col + d_col * i) for i in range(self.win_length)])
+        return lines
+
+    def _symmetries(self):
+        last_row, last_col = self.rows - 1, self.cols - 1
+        maps = [
+            lambda row, col: (row, col),
+            lambda row, col: (col, last_row - row),
+            lambda row, col: (last_row - row, last_col - col),
+            lambda row, col: (last_col - col, row),
+            lambda row, col: (row, last_col - col),
+            lambda row, col: (last_row - row, col),
+            lambda row, col: (col, row),
+            lambda row, col: (last_col - col, last_row - row),
+        ]
+        if self.rows != self.cols:
+            # Quarter turns and diagonal reflections swap the board's shape.
+            maps = [maps[0], maps[2], maps[4], maps[5]]
+        return [
+            tuple(self.cell_index(*symmetry(*self.cell_position(cell))) for cell in range(self.cells))
+            for symmetry in maps
+        ]
+
+    def cell_index(self, row, col):
+        return row * self.cols + col
+
+    def cell_position(self, cell):
+        return divmod(cell, self.cols)
+
+    def preferred_cells(self):
+        # Center first, then corners, then everything else by distance from
+        # the center; for 3x3 this is the classic center/corners/edges order.
+        center_row, center_col = (self.rows - 1) / 2, (self.cols - 1) / 2
+        corners = {(0, 0), (0, self.cols - 1), (self.rows - 1, 0), (self.rows - 1, self.cols - 1)}
+        return sorted(
+            (self.cell_position(cell) for cell in range(self.cells)),
+            key=lambda pos: (
+                max(abs(pos[0] - center_row), abs(pos[1] - center_col)) > 0.5,
+                pos not in corners,
+                abs(pos[0] - center_row) + abs(pos[1] - center_col),
+            ),
+        )
+
+    def side_to_move(self, state):
+        return state >> self.side_shift
+
+    def occupancy(self, state, side):
+        return state >> (side * self.cells) & self.full_mask
+
+    def empty_mask(self, state):
+        return ~(state | state >> self.cells) & self.full_mask
+
+    def queue_cells(self, state, side):
+        queue = state >> (self.queue_shift + side * self.queue_bits) & self.queue_mask
+        cells = []
+        while queue:
+            cells.append((queue & self.slot_mask) - 1)
+            queue >>= self.slot_bits
+        return cells
+
+    def oldest_cell(self, state, side):
+        queue = state >> (self.queue_shift + side * self.queue_bits) & self.queue_mask
+        if queue >> self.newest_slot_shift:
+            return (queue & self.slot_mask) - 1
+        return None
+
+    def is_winning_placement(self, mask, cell):
+        for line in self.lines_through[cell]:
+            if mask & line == line:
+                return True
+        return False
+
+    def play(self, state, cell):
+        side = state >> self.side_shift
+        slot_bits = self.slot_bits
+        mask_shift = side * self.cells
+        queue_shift = self.queue_shift + side * self.queue_bits
+        mask = state >> mask_shift & self.full_mask
+        queue = state >> queue_shift & self.queue_mask
+
+        # The mover's oldest piece expires before the win check, and the
+        # opponent's lines are untouched, so only the windows through the
+        # placed cell on the updated mask need testing.
+        if queue >> self.newest_slot_shift:
+            mask &= ~(1 << ((queue & self.slot_mask) - 1))
+            queue = queue >> slot_bits | (cell + 1) << self.newest_slot_shift
+        else:
+            length = (queue.bit_length() + slot_bits - 1) // slot_bits
+            queue |= (cell + 1) << (slot_bits * length)
+        mask |= 1 << cell
+
+        state &= ~(self.full_mask << mask_shift | self.queue_mask << queue_shift)
+        state |= mask << mask_shift | queue << queue_shift
+        for line in self.lines_through[cell]:
+            if mask & line == line:
+                return state ^ self.side_bit, True
+        return state ^ self.side_bit, False
+
+    def winning_cells(self, state, side):
+        mask = self.occupancy(state, side)
+        oldest = self.oldest_cell(state, side)
+        if oldest is not None:
+            mask &= ~(1 << oldest)
+        empty = self.empty_mask(state)
+        threats = 0
+        for line in self.line_masks:
+            missing = line & ~mask
+            if missing & empty == missing and missing & (missing - 1) == 0:
+                threats |= missing
+        return list(iter_cells(threats))
+
+    def pack(self, x_cells, o_cells, side):
+        state = EMPTY_STATE
+        for queue_side, cells in ((X, x_cells), (O, o_cells)):
+            queue = 0
+            mask = 0
+            for slot, cell in enumerate(cells):
+                queue |= (cell + 1) << (self.slot_bits * slot)
+                mask |= 1 << cell
+            state |= mask << (queue_side * self.cells) | queue << (self.queue_shift + queue_side * self.queue_bits)
+        return state | side << self.side_shift
+
+    def transform(self, state, permutation):
+        return self.pack(
+            [permutation[cell] for cell in self.queue_cells(state, X)],
+            [permutation[cell] for cell in self.queue_cells(state, O)],
+            self.side_to_move(state),
+        )
+
+    def canonical(self, state):
+        return min((self.transform(state, permutation), index) for index, permutation in enumerate(self.symmetries))
+
+
+def parse_spec(text):
+    # "7x7", "7x7:4" or "7x7:4:5" -> rows, cols, win length, max pieces.
+    size, _, rest = text.partition(":")
+    rows, _, cols = size.lower().partition("x")
+    rows = int(rows)
+    cols = int(cols) if cols else rows
+    parts = [int(part) for part in rest.split(":") if part]
+    win_length = parts[0] if parts else min(rows, cols, 3)
+    max_pieces = parts[1] if len(parts) > 1 else win_length
+    return rows, cols, win_length, max_pieces
+
+
+def parse_variant(text):
+    return Variant(*parse_spec(text))
+
+
+DEFAULT_VARIANT = Variant()
+
+# Module-level names for the classic 3x3 / 3-piece game.
+BOARD_COLS = DEFAULT_VARIANT.cols
+MAX_PIECES = DEFAULT_VARIANT.max_pieces
+CELLS = DEFAULT_VARIANT.cells
+SLOT_BITS = DEFAULT_VARIANT.slot_bits
+SLOT_MASK = DEFAULT_VARIANT.slot_mask
+QUEUE_SHIFT = DEFAULT_VARIANT.queue_shift
+SIDE_SHIFT = DEFAULT_VARIANT.side_shift
+
+cell_position = DEFAULT_VARIANT.cell_position
+empty_mask = DEFAULT_VARIANT.empty_mask
+play = DEFAULT_VARIANT.play
+winning_cells = DEFAULT_VARIANT.winning_cells
@@ -0,0 +1,64 @@
+import atexit
+import time
+
+import pygame
+
+from metrics import metrics
+
+FPS = 60
+CPU_REPORT_INTERVAL = 30.0
+
+
+class EventLoop:
+    # In event-driven mode the loop blocks in pygame.event.wait() until input
+    # arrives and only ticks at a fixed frame rate while something animates.
+    def __init__(self, fps=FPS, event_driven=True, report_interval=CPU_REPORT_INTERVAL):
+        self.clock = pygame.time.Clock()
+        self.fps = fps
+        self.event_driven = event_driven
+        self.report_interval = report_interval
+        self.frames = 0
+        self.total_frames = 0
+        self.started_wall = self.window_wall = time.perf_counter()
+        self.started_cpu = self.window_cpu = time.process_time()
+        atexit.register(self.report_total)
+
+    def events(self, animating=False):
+        self.frames += 1
+        self.total_frames += 1
+        with metrics.span("frame.wait"):
+            if not self.event_driven or animating:
+                self.clock.tick(self.fps)
+                events = pygame.event.get()
+            else:
+                event = pygame.event.wait(self.wait_timeout())
+                events = [] if event.type == pygame.NOEVENT else [event] + pygame.event.get()
+        self.report_if_due()
+        return events
+
+    def wait_timeout(self):
+        if not self.report_interval:
+            return 0
+        remaining = self.report_interval - (time.perf_counter() - self.window_wall)
+        return max(1, int(remaining * 1000))
+
+    def cpu_percent(self, since_wall, since_cpu):
+        wall = time.perf_counter() - since_wall
+        return (time.process_time() - since_cpu) / wall * 100 if wall > 0 else 0.0
+
+    def report_if_due(self):
+        if not self.report_interval:
+            return
+        wall = time.perf_counter() - self.window_wall
+        if wall < self.report_interval:
+            return
+        cpu = self.cpu_percent(self.window_wall, self.window_cpu)
+        print(f"[cpu] {cpu:.1f}% over the last {wall:.0f}s, {self.frames} frames")
+        self.frames = 0
+        self.window_wall = time.perf_counter()
+        self.window_cpu = time.process_time()
+
+    def report_total(self):
+        wall = time.perf_counter() - self.started_wall
+        cpu = self.cpu_percent(self.started_wall, self.started_cpu)
+        print(f"[cpu] {cpu:.1f}% average over {wall:.0f}s, {self.total_frames} frames")
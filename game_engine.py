@@ -0,0 +1,200 @@
+from bitboard import EMPTY_STATE, SYMBOLS, DEFAULT_VARIANT, Variant, X, O, iter_cells
+
+
+# A position seen this many times, or a game this many moves long, is a
+# draw: pieces expire forever, so nothing else stops two careful players.
+REPETITION_LIMIT = 3
+DEFAULT_MAX_MOVES = 200
+
+
+def other_player(player):
+    return 'O' if player == 'X' else 'X'
+
+
+def side_of(player):
+    return X if player == 'X' else O
+
+
+class GameSession:
+    __slots__ = (
+        "state", "game_over", "winner", "last_cell", "variant", "history",
+        "max_moves", "move_count", "seen", "seen_shared", "draw_reason",
+    )
+
+    def __init__(self, state=EMPTY_STATE, variant=DEFAULT_VARIANT, max_moves=DEFAULT_MAX_MOVES):
+        self.state = state
+        self.game_over = False
+        self.winner = None
+        self.last_cell = None
+        self.variant = variant
+        # Takebacks: (previous state, previous last_cell, previous node) per
+        # move, newest first. Nodes are immutable, so a move costs one tuple
+        # and copies share the chain instead of building their own.
+        self.history = None
+        self.max_moves = max_moves
+        self.move_count = 0
+        # Times each position occurred; the packed state is the position key
+        # (exact, and play() already updates it incrementally). Built on the
+        # first move; copies share it until one of them moves or undoes.
+        self.seen = None
+        self.seen_shared = False
+        self.draw_reason = None
+
+    def reset(self):
+        self.state = EMPTY_STATE
+        self.game_over = False
+        self.winner = None
+        self.last_cell = None
+        self.history = None
+        self.move_count = 0
+        self.seen = None
+        self.seen_shared = False
+        self.draw_reason = None
+
+    @property
+    def result(self):
+        # 'X', 'O', 'draw', or None while the game is on.
+        if not self.game_over:
+            return None
+        return self.winner or "draw"
+
+    @property
+    def player(self):
+        return SYMBOLS[self.variant.side_to_move(self.state)]
+
+    @property
+    def board(self):
+        variant = self.variant
+        x_mask = variant.occupancy(self.state, X)
+        o_mask = variant.occupancy(self.state, O)
+        return [
+            [
+                'X' if x_mask >> variant.cell_index(row, col) & 1
+                else 'O' if o_mask >> variant.cell_index(row, col) & 1
+                else None
+                for col in range(variant.cols)
+            ]
+            for row in range(variant.rows)
+        ]
+
+    def positions(self, player):
+        variant = self.variant
+        return [variant.cell_position(cell) for cell in variant.queue_cells(self.state, side_of(player))]
+
+    @property
+    def x_positions(self):
+        return self.positions('X')
+
+    @property
+    def o_positions(self):
+        return self.positions('O')
+
+    def oldest(self, player):
+        cell = self.variant.oldest_cell(self.state, side_of(player))
+        return self.variant.cell_position(cell) if cell is not None else None
+
+    def is_valid_move(self, row, col):
+        variant = self.variant
+        return (
+            not self.game_over
+            and 0 <= row < variant.rows
+            and 0 <= col < variant.cols
+            and variant.empty_mask(self.state) >> variant.cell_index(row, col) & 1 == 1
+        )
+
+    def empty_cells(self):
+        variant = self.variant
+        return [variant.cell_position(cell) for cell in iter_cells(variant.empty_mask(self.state))]
+
+    def make_move(self, row, col):
+        # is_valid_move() inlined; this runs for every move of every game.
+        variant = self.variant
+        state = self.state
+        if self.game_over or not (0 <= row < variant.rows and 0 <= col < variant.cols):
+            return False
+        cell = row * variant.cols + col
+        if (state | state >> variant.cells) >> cell & 1:
+            return False
+
+        seen = self.own_seen()
+        mover = SYMBOLS[state >> variant.side_shift]
+        self.history = (state, self.last_cell, self.history)
+        state, won = variant.play(state, cell)
+        self.state = state
+        self.last_cell = cell
+        self.move_count += 1
+        repeats = seen[state] = seen.get(state, 0) + 1
+        if won:
+            self.game_over = True
+            self.winner = mover
+        elif repeats >= REPETITION_LIMIT:
+            self.game_over = True
+            self.draw_reason = "repetition"
+        elif self.max_moves and self.move_count >= self.max_moves:
+            self.game_over = True
+            self.draw_reason = "move limit"
+        return True
+
+    def own_seen(self):
+        seen = self.seen
+        if seen is None:
+            seen = self.seen = {self.state: 1}
+        elif self.seen_shared:
+            seen = self.seen = dict(seen)
+            self.seen_shared = False
+        return seen
+
+    def can_undo(self):
+        return self.history is not None
+
+    def undo(self):
+        # Takes back the last move, expired piece included. Moves are never
+        # played after the game ends, so the position before it was still open.
+        if self.history is None:
+            return None
+        seen = self.own_seen()
+        if seen[self.state] == 1:
+            del seen[self.state]
+        else:
+            seen[self.state] -= 1
+        cell = self.last_cell
+        self.state, self.last_cell, self.history = self.history
+        self.move_count -= 1
+        self.game_over = False
+        self.winner = None
+        self.draw_reason = None
+        return self.variant.cell_position(cell)
+
+    def winning_line(self):
+        if self.winner is None:
+            return None
+        variant = self.variant
+        mask = variant.occupancy(self.state, side_of(self.winner))
+        for line, line_mask in zip(variant.lines, variant.line_masks):
+            if mask & line_mask == line_mask and line_mask >> self.last_cell & 1:
+                return line
+        return None
+
+    def check_winner(self):
+        return self.winner
+
+    def copy(self):
+        # Every slot set once, skipping __init__. The history chain is
+        # immutable and the position counts are copied on first write, so
+        # neither is duplicated here.
+        clone = GameSession.__new__(GameSession)
+        clone.state = self.state
+        clone.game_over = self.game_over
+        clone.winner = self.winner
+        clone.last_cell = self.last_cell
+        clone.variant = self.variant
+        clone.history = self.history
+        clone.max_moves = self.max_moves
+        clone.move_count = self.move_count
+        clone.seen = self.seen
+        clone.seen_shared = self.seen_shared = self.seen is not None
+        clone.draw_reason = self.draw_reason
+        return clone
+
+    def board_string(self):
+        return "\n".join(" ".join("_" if not c else c for c in row) for row in self.board)
@@ -0,0 +1,244 @@
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+
+from bitboard import Variant
+from game_engine import GameSession
+
+# File layout: one header describing the variant, then games back to back.
+# A game is one byte per move (the flat cell index; expired pieces follow
+# from the queue rule) closed by a single result byte. Result bytes sit above
+# any cell index, so a game can be appended move by move and the reader finds
+# game boundaries without an index.
+MAGIC = b"TTTG"
+VERSION = 1
+HEADER = struct.Struct("<4sHBBBB")
+RESULT_DRAW, RESULT_X, RESULT_O, RESULT_ABANDONED = 0xFC, 0xFD, 0xFE, 0xFF
+MAX_CELLS = RESULT_DRAW
+RESULTS = {RESULT_DRAW: "draw", RESULT_X: "X", RESULT_O: "O", RESULT_ABANDONED: "abandoned"}
+RESULT_CODES = {result: code for code, result in RESULTS.items()}
+GAME_PATTERN = re.compile(rb"[\x00-\xfb]*[\xfc-\xff]")
+RESULT_BYTES = [bytes((code,)) for code in RESULTS]
+DEFAULT_RECORD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "games.ttr")
+
+
+class RecordWriter:
+    # Appends moves as they are played. A game that is never closed (for
+    # example when the process is killed) is read back as unfinished.
+    def __init__(self, path, variant):
+        if variant.cells > MAX_CELLS:
+            raise ValueError(f"{variant.name} has too many cells for one byte per move")
+        self.path = path
+        self.variant = variant
+        self.lock = threading.Lock()
+        self.moves = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                header = read_header(f.read(HEADER.size), path)
+                f.seek(-1, os.SEEK_END)
+                last = f.read(1)[0]
+            if header != variant:
+                raise ValueError(f"{path} records {header.name} games, not {variant.name}")
+            self.file = open(path, "ab")
+            # Close a game left open by a process that never finished it.
+            if os.path.getsize(path) > HEADER.size and last < RESULT_DRAW:
+                self.file.write(bytes((RESULT_ABANDONED,)))
+        else:
+            self.file = open(path, "ab")
+            self.file.write(HEADER.pack(MAGIC, VERSION, variant.rows, variant.cols, variant.win_length, variant.max_pieces))
+
+    def move(self, cell):
+        with self.lock:
+            self.file.write(bytes((cell,)))
+            self.moves += 1
+
+    def end_game(self, result):
+        # result is 'X', 'O', 'draw' or 'abandoned'.
+        with self.lock:
+            self.file.write(bytes((RESULT_CODES[result],)))
+            self.file.flush()
+            self.moves = 0
+
+    def undo(self):
+        # Takes the last move of the game in progress back out of the file.
+        with self.lock:
+            if not self.moves:
+                return
+            # truncate() leaves the position where it was, so find the end
+            # first or a second undo would cut at the same offset again.
+            self.file.flush()
+            self.file.truncate(self.file.seek(0, os.SEEK_END) - 1)
+            self.moves -= 1
+
+    def abandon(self):
+        if self.moves:
+            self.end_game("abandoned")
+
+    def write_game(self, cells, result):
+        with self.lock:
+            self.file.write(bytes(cells) + bytes((RESULT_CODES[result],)))
+            self.moves = 0
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def open_recorder(path=DEFAULT_RECORD_PATH, variant=None):
+    try:
+        return RecordWriter(path, variant or Variant())
+    except (OSError, ValueError) as e:
+        print(f"Game recording disabled: {e}")
+        return None
+
+
+def read_header(data, path="record"):
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a game record")
+    magic, version, rows, cols, win_length, max_pieces = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a compatible game record")
+    return Variant(rows, cols, win_length, max_pieces)
+
+
+class RecordedGame:
+    __slots__ = ("cells", "result", "variant")
+
+    def __init__(self, cells, result, variant):
+        self.cells = cells
+        self.result = result
+        self.variant = variant
+
+    def __len__(self):
+        return len(self.cells)
+
+    def session(self, moves=None):
+        # The position after the first `moves` moves (all of them by default).
+        game = GameSession(variant=self.variant)
+        for cell in self.cells[:moves]:
+            game.make_move(*self.variant.cell_position(cell))
+        return game
+
+
+class RecordReader:
+    # Memory-maps the file; games are sliced out of the map one at a time, so
+    # iterating never loads more than the current game.
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.variant = read_header(self.data[:HEADER.size], path)
+        except ValueError:
+            self.close()
+            raise
+
+    def __iter__(self):
+        end = HEADER.size
+        for match in GAME_PATTERN.finditer(self.data, HEADER.size):
+            record = match.group()
+            end = match.end()
+            yield RecordedGame(record[:-1], RESULTS[record[-1]], self.variant)
+        if end < len(self.data):
+            yield RecordedGame(self.data[end:], "unfinished", self.variant)
+
+    def count(self):
+        # Matches only, so no game is copied out of the map.
+        end = HEADER.size
+        games = 0
+        for match in GAME_PATTERN.finditer(self.data, HEADER.size):
+            end = match.end()
+            games += 1
+        return games + (end < len(self.data))
+
+    def game_start(self, end):
+        # Where the game ending at offset `end` begins: just past the closest
+        # result byte before its own last byte.
+        last = max(self.data.rfind(code, HEADER.size, end - 1) for code in RESULT_BYTES)
+        return max(last + 1, HEADER.size)
+
+    def game_at(self, start, end):
+        record = self.data[start:end]
+        if record and record[-1] >= RESULT_DRAW:
+            return RecordedGame(record[:-1], RESULTS[record[-1]], self.variant)
+        return RecordedGame(record, "unfinished", self.variant)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Replay:
+    # Steps through the games of a record for the pygame replay mode. Keeps
+    # the reader open and finds game boundaries back from the end of the file
+    # only as far as the player has switched, so opening a long record reads
+    # just the newest game. `starts` holds the end of the file followed by
+    # the start of each game found so far, newest first.
+    def __init__(self, reader):
+        self.reader = reader
+        self.total = reader.count()
+        self.starts = [len(reader.data)]
+        self.current = None
+        self.game_index = self.total - 1
+        self.move = len(self.game)
+        self.session = self.game.session(self.move)
+
+    @property
+    def game(self):
+        back = self.total - 1 - self.game_index
+        if self.current is None or self.current[0] != back:
+            while len(self.starts) <= back + 1:
+                self.starts.append(self.reader.game_start(self.starts[-1]))
+            self.current = back, self.reader.game_at(self.starts[back + 1], self.starts[back])
+        return self.current[1]
+
+    def step(self, delta):
+        self.seek(self.move + delta)
+
+    def seek(self, move):
+        self.move = max(0, min(len(self.game), move))
+        self.session = self.game.session(self.move)
+
+    def switch(self, delta):
+        self.game_index = max(0, min(self.total - 1, self.game_index + delta))
+        self.seek(len(self.game))
+
+    def caption(self):
+        return f"Game {self.game_index + 1}/{self.total}  move {self.move}/{len(self.game)}  ({self.game.result})"
+
+    def close(self):
+        self.current = None
+        self.reader.close()
+
+
+def load_replay(path=DEFAULT_RECORD_PATH):
+    # The caller closes the returned Replay when it leaves the replay mode.
+    if not os.path.exists(path) or os.path.getsize(path) <= HEADER.size:
+        return None
+    return Replay(RecordReader(path))
+
+
+def summarize(path=DEFAULT_RECORD_PATH):
+    results = {}
+    moves = 0
+    with RecordReader(path) as reader:
+        for game in reader:
+            results[game.result] = results.get(game.result, 0) + 1
+            moves += len(game)
+        variant = reader.variant
+    print(f"{path}: {variant.name}, {sum(results.values())} games, {moves} moves, {os.path.getsize(path)} bytes")
+    for result, count in sorted(results.items()):
+        print(f"  {result:<10} {count:8d}")
+
+
+if __name__ == "__main__":
+    summarize(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_RECORD_PATH)
@@ -0,0 +1,330 @@
+import http.client
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from ai_session import build_prompt
+from metrics import metrics
+
+OLLAMA_URL = "http://localhost:11434"
+DEFAULT_MODEL = "llama3.2"
+APIS = ("ollama", "openai")
+CELL_HINT = '\nAnswer as {{ "cell": <row * {cols} + col> }} instead.\n'
+
+
+def move_schema(game):
+    # JSON schema whose only instances are the legal moves: one branch per
+    # empty cell, so a backend that decodes against it (Ollama `format`,
+    # OpenAI-style `response_format`) cannot produce anything else. The
+    # properties keep row before col, which is also the order they stream in.
+    return {
+        "anyOf": [
+            {
+                "type": "object",
+                "properties": {"row": {"enum": [row]}, "col": {"enum": [col]}},
+                "required": ["row", "col"],
+                "additionalProperties": False,
+            }
+            for row, col in game.empty_cells()
+        ]
+    }
+
+
+def cell_schema(game):
+    # The same constraint for OpenAI's strict mode, which is the only mode
+    # that enforces a schema there and which rejects a root-level anyOf: a
+    # single property restricted to the legal flat cell indices.
+    variant = game.variant
+    return {
+        "type": "object",
+        "properties": {"cell": {"enum": [variant.cell_index(row, col) for row, col in game.empty_cells()]}},
+        "required": ["cell"],
+        "additionalProperties": False,
+    }
+
+
+def schema_moves(schema, cols=None):
+    if "anyOf" not in schema:
+        return [divmod(cell, cols) for cell in schema["properties"]["cell"]["enum"]]
+    return [
+        (branch["properties"]["row"]["enum"][0], branch["properties"]["col"]["enum"][0])
+        for branch in schema["anyOf"]
+    ]
+
+
+def shutdown(sock):
+    # Unlike close(), shutdown() wakes a thread blocked reading the socket.
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+def is_set(cancelled):
+    return cancelled is not None and cancelled.is_set()
+
+
+def parse_object(text, cols=None):
+    try:
+        move = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(move, dict):
+        return None
+    if cols and type(move.get("cell")) is int and move["cell"] >= 0:
+        return divmod(move["cell"], cols)
+    row, col = move.get("row"), move.get("col")
+    if type(row) is not int or type(col) is not int:
+        return None
+    return row, col
+
+
+class MoveScanner:
+    # Finds JSON objects in streamed text without rescanning what came before:
+    # brace depth and string state are carried across chunks, and every
+    # complete top-level object that looks like {"row": r, "col": c} (or
+    # {"cell": n} when the board width is given) is returned as a candidate
+    # move.
+    def __init__(self, cols=None):
+        self.cols = cols
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.current = []
+
+    def feed(self, text):
+        moves = []
+        for char in text:
+            if self.depth == 0:
+                if char == "{":
+                    self.depth = 1
+                    self.current = [char]
+                continue
+            self.current.append(char)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    move = parse_object("".join(self.current), self.cols)
+                    if move:
+                        moves.append(move)
+        return moves
+
+
+class StreamingSession:
+    # Talks to the model server directly instead of through CrewAI so tokens
+    # can be read as they arrive. As soon as a complete, legal move object has
+    # streamed in, the response is closed; Ollama and OpenAI-compatible
+    # servers stop generating when the client disconnects. With constrained
+    # set, the request carries move_schema() (cell_schema() in strict mode on
+    # the OpenAI API) so the reply can only be a legal move. Same get_move()
+    # and stats() interface as AISession.
+    def __init__(self, base_url=OLLAMA_URL, model=DEFAULT_MODEL, api="ollama", api_key=None,
+                 timeout=30.0, stop_early=True, constrained=True, verbose=False):
+        if api not in APIS:
+            raise ValueError(f"unknown streaming API {api!r}, expected one of {APIS}")
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api = api
+        self.api_key = api_key
+        self.timeout = timeout
+        self.stop_early = stop_early
+        self.constrained = constrained
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.moves = 0
+        self.cancelled = 0
+        self.stopped_early = 0
+        self.illegal = 0
+        self.invalid = 0
+        self.first_token_time = 0.0
+        self.move_time = 0.0
+        self.total_time = 0.0
+        self.chars = 0
+
+    def headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def warm_up(self, ping=False):
+        # Fails fast (and AILoader reports the AI as unavailable) when nothing
+        # is listening at base_url.
+        path = "/api/tags" if self.api == "ollama" else "/models"
+        request = urllib.request.Request(self.base_url + path, headers=self.headers())
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+        return self
+
+    def request(self, prompt, schema=None):
+        if self.api == "ollama":
+            url = self.base_url + "/api/generate"
+            body = {"model": self.model, "prompt": prompt, "stream": True}
+            if schema:
+                body["format"] = schema
+        else:
+            url = self.base_url + "/chat/completions"
+            body = {"model": self.model, "messages": [{"role": "user", "content": prompt}], "stream": True}
+            if schema:
+                body["response_format"] = {
+                    "type": "json_schema",
+                    "json_schema": {"name": "move", "strict": True, "schema": schema},
+                }
+        return urllib.request.Request(url, data=json.dumps(body).encode(), headers=self.headers())
+
+    def schema(self, game):
+        if not self.constrained:
+            return None
+        return move_schema(game) if self.api == "ollama" else cell_schema(game)
+
+    def prompt(self, game, schema):
+        prompt = build_prompt(game)
+        if schema and "anyOf" not in schema:
+            prompt += CELL_HINT.format(cols=game.variant.cols)
+        return prompt
+
+    def open(self, request, cancelled=None):
+        # http.client rather than urlopen, so the socket can be reached: once
+        # connected, setting `cancelled` (an ai_worker.CancelEvent) shuts it
+        # down, ending a read stalled before the first token or between
+        # chunks. Returns the connection and the response.
+        url = urllib.parse.urlsplit(request.full_url)
+        if url.scheme == "https":
+            connection = http.client.HTTPSConnection(url.netloc, timeout=self.timeout)
+        else:
+            connection = http.client.HTTPConnection(url.netloc, timeout=self.timeout)
+        try:
+            connection.connect()
+            if cancelled is not None:
+                # Bound now: the connection hands its socket over to a
+                # close-delimited response and forgets it.
+                sock = connection.sock
+                cancelled.on_set(lambda: shutdown(sock))
+            headers = dict(request.header_items())
+            headers["Connection"] = "close"
+            path = url.path + ("?" + url.query if url.query else "")
+            connection.request(request.get_method(), path, request.data, headers)
+            response = connection.getresponse()
+            if response.status >= 400:
+                raise urllib.error.HTTPError(request.full_url, response.status, response.reason, response.headers, None)
+        except BaseException:
+            connection.close()
+            raise
+        return connection, response
+
+    def chunk_text(self, line):
+        # Returns (text, done) for one line of the response body: NDJSON for
+        # Ollama, server-sent events for the OpenAI API.
+        line = line.strip()
+        if not line:
+            return "", False
+        if self.api == "ollama":
+            chunk = json.loads(line)
+            return chunk.get("response", ""), chunk.get("done", False)
+        if not line.startswith(b"data:"):
+            return "", False
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            return "", True
+        choices = json.loads(data).get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content") or "", choices[0].get("finish_reason") is not None
+
+    def get_move(self, game, cancelled=None):
+        # Setting `cancelled` (see ai_worker.MoveRace) ends the request at
+        # once; unless a move had already arrived, it then counts only as
+        # cancelled, not as a move or an invalid reply. Sessions are shared
+        # by race, speculation and UI threads, so counters change under lock.
+        started = time.perf_counter()
+        first_token = None
+        move_at = None
+        move = None
+        scanner = MoveScanner(game.variant.cols)
+        text = []
+        illegal = 0
+        stopped_early = False
+        schema = self.schema(game)
+
+        with metrics.span("ai.stream"):
+            connection = None
+            try:
+                connection, response = self.open(self.request(self.prompt(game, schema), schema), cancelled)
+                for line in response:
+                    if is_set(cancelled):
+                        break
+                    chunk, done = self.chunk_text(line)
+                    if chunk:
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                            metrics.record("ai.first_token", first_token)
+                        text.append(chunk)
+                        if move is None:
+                            for candidate in scanner.feed(chunk):
+                                if game.is_valid_move(*candidate):
+                                    move = candidate
+                                    move_at = time.perf_counter() - started
+                                    metrics.record("ai.time_to_move", move_at)
+                                    break
+                                illegal += 1
+                    if done:
+                        break
+                    if move and self.stop_early:
+                        # Closing the connection mid-stream (below) cancels
+                        # the rest of the generation.
+                        stopped_early = True
+                        break
+            except (OSError, http.client.HTTPException, ValueError):
+                # A shut-down socket fails wherever the read was; only errors
+                # of a request nobody cancelled are real.
+                if not is_set(cancelled):
+                    raise
+            finally:
+                if connection is not None:
+                    connection.close()
+        finished = time.perf_counter() - started
+        if self.verbose:
+            print("[AI OUTPUT]:", "".join(text))
+
+        with self.lock:
+            if move is None and is_set(cancelled):
+                self.cancelled += 1
+                return None
+            self.moves += 1
+            if move is None:
+                # The caller (AITurn) falls back to the rule-based engine.
+                self.invalid += 1
+            self.illegal += illegal
+            self.stopped_early += stopped_early
+            self.first_token_time += first_token or finished
+            self.move_time += move_at or finished
+            self.total_time += finished
+            self.chars += sum(len(chunk) for chunk in text)
+        return move
+
+    def stats(self):
+        moves = self.moves or 1
+        return {
+            "moves": self.moves,
+            "cancelled": self.cancelled,
+            "stopped_early": self.stopped_early,
+            "illegal_objects": self.illegal,
+            "invalid_replies": self.invalid,
+            "avg_first_token_ms": self.first_token_time / moves * 1000,
+            "avg_time_to_move_ms": self.move_time / moves * 1000,
+            "avg_request_ms": self.total_time / moves * 1000,
+            "avg_chars": self.chars / moves,
+        }
@@ -0,0 +1,222 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bitboard import Variant
+from llm_stream import schema_moves
+
+BOARD_LINE = re.compile(r'^[XO_]( [XO_])+$')
+TOKEN = re.compile(r'\s*\S+')
+DEFAULT_TRAILER = (
+    "\n\nReasoning: the opponent has no immediate threat, so I looked for a line of my own. "
+    "The chosen cell is empty, sits on the most open lines and keeps my oldest piece out of "
+    "danger when it expires next turn. Corners come next, then edges, and every other "
+    "candidate either repeats a line the opponent already blocks or hands over the centre."
+)
+
+
+def parse_board(prompt):
+    return [line.split() for line in prompt.splitlines() if BOARD_LINE.match(line.strip())]
+
+
+class StubLLM:
+    # Deterministic stand-in for the model: reads the board out of the prompt
+    # and answers with canned JSON for the first free preferred cell. With
+    # mistake_rate, that share of answers names an occupied cell or carries no
+    # JSON at all, like a sloppy model. Passing `allowed` moves (what a
+    # schema-constrained decoder would permit) forces a bare JSON answer from
+    # that set instead, as {"cell": n} with as_cell.
+    def __init__(self, latency=0.0, preamble="", mistake_rate=0.0, seed=None):
+        self.latency = latency
+        self.preamble = preamble
+        self.mistake_rate = mistake_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.preferred = {}
+
+    def choose(self, board):
+        if not board:
+            return 0, 0
+        rows, cols = len(board), len(board[0])
+        cells = self.preferred.get((rows, cols))
+        if cells is None:
+            cells = self.preferred[(rows, cols)] = Variant(rows, cols, 1, 1).preferred_cells()
+        for row, col in cells:
+            if board[row][col] == '_':
+                return row, col
+        return 0, 0
+
+    def complete(self, prompt, allowed=None, as_cell=False):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        board = parse_board(prompt)
+        row, col = self.choose(board)
+        prose = False
+        if self.mistake_rate and self.rng.random() < self.mistake_rate:
+            occupied = [(r, c) for r, line in enumerate(board) for c, value in enumerate(line) if value != '_']
+            if occupied and self.rng.random() < 0.5:
+                row, col = self.rng.choice(occupied)
+            else:
+                prose = True
+        if allowed is not None:
+            if (row, col) not in allowed:
+                row, col = allowed[0]
+            if as_cell:
+                return f'{{"cell": {row * (len(board[0]) if board else 3) + col}}}'
+            return f'{{"row": {row}, "col": {col}}}'
+        if prose:
+            return f'{self.preamble}I would take the centre, or a corner if it is taken.'
+        return f'{self.preamble}{{ "row": {row}, "col": {col} }}'
+
+
+class StubCrew:
+    # Stands in for crewai.Crew in AISession: interpolates the task prompt the
+    # way kickoff(inputs=...) does and answers through a StubLLM.
+    def __init__(self, llm, prompt):
+        self.llm = llm
+        self.prompt = prompt
+
+    def kickoff(self, inputs=None):
+        prompt = self.prompt
+        for key, value in (inputs or {}).items():
+            prompt = prompt.replace("{" + key + "}", str(value))
+        return self.llm.complete(prompt)
+
+
+class StubStreamServer:
+    # Streams StubLLM answers token by token over HTTP, in the Ollama
+    # (/api/generate, NDJSON) and OpenAI (/v1/chat/completions, server-sent
+    # events) formats. The move is followed by `trailer`, the way verbose models
+    # keep reasoning after the answer, so early cancellation is measurable:
+    # `sent` counts the tokens that were written before each client hung up.
+    # first_token_delay holds the response back like a slow prompt prefill.
+    # Like OpenAI, the chat endpoint only enforces strict schemas and refuses
+    # a strict schema with a root-level anyOf.
+    def __init__(self, llm=None, token_delay=0.01, trailer=DEFAULT_TRAILER, host="127.0.0.1", port=0,
+                 first_token_delay=0.0):
+        self.llm = llm or StubLLM()
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+        self.trailer = trailer
+        self.sent = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def tokens(self, prompt, schema=None):
+        # A constrained reply ends with the JSON: the grammar leaves nothing
+        # after it but end-of-sequence.
+        if schema:
+            board = parse_board(prompt)
+            cols = len(board[0]) if board else 3
+            return TOKEN.findall(self.llm.complete(prompt, schema_moves(schema, cols), "anyOf" not in schema))
+        return TOKEN.findall(self.llm.complete(prompt) + self.trailer)
+
+    def count(self, sent, completed):
+        with self.lock:
+            self.sent += sent
+            if completed:
+                self.completed += 1
+            else:
+                self.cancelled += 1
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path not in ("/api/tags", "/v1/models"):
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"models": [], "data": []}')
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if self.path == "/api/generate":
+                    prompt = body["prompt"]
+                    schema = body.get("format")
+                    frame = lambda token: json.dumps({"response": token, "done": False}) + "\n"
+                    last = json.dumps({"response": "", "done": True}) + "\n"
+                    content_type = "application/x-ndjson"
+                elif self.path == "/v1/chat/completions":
+                    prompt = body["messages"][-1]["content"]
+                    json_schema = body.get("response_format", {}).get("json_schema", {})
+                    schema = json_schema.get("schema") if json_schema.get("strict") else None
+                    if isinstance(schema, dict) and "anyOf" in schema:
+                        self.send_error(400, "strict schemas cannot use anyOf at the root")
+                        return
+                    frame = lambda token: "data: " + json.dumps({"choices": [{"delta": {"content": token}}]}) + "\n\n"
+                    last = "data: [DONE]\n\n"
+                    content_type = "text/event-stream"
+                else:
+                    self.send_error(404)
+                    return
+
+                if server.first_token_delay:
+                    time.sleep(server.first_token_delay)
+                sent = 0
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.end_headers()
+                except (BrokenPipeError, ConnectionResetError):
+                    server.count(sent, completed=False)
+                    return
+                try:
+                    for token in server.tokens(prompt, schema if isinstance(schema, dict) else None):
+                        self.wfile.write(frame(token).encode())
+                        self.wfile.flush()
+                        sent += 1
+                        if server.token_delay:
+                            time.sleep(server.token_delay)
+                    self.wfile.write(last.encode())
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    server.count(sent, completed=False)
+                else:
+                    server.count(sent, completed=True)
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve canned streaming LLM answers for local testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-delay", type=float, default=0.03, help="seconds between streamed tokens")
+    args = parser.parse_args(argv)
+
+    server = StubStreamServer(token_delay=args.token_delay, host=args.host, port=args.port)
+    print(f"[stub] streaming on {server.url} (Ollama) and {server.url}/v1 (OpenAI)", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
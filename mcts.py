@@ -0,0 +1,168 @@
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import DEFAULT_VARIANT, iter_cells
+from metrics import metrics
+
+DEFAULT_BUDGET_MS = 200
+DEFAULT_EXPLORATION = 1.4
+DEFAULT_PLAYOUT_LIMIT = 200
+
+
+class Node:
+    __slots__ = ("state", "cell", "parent", "mover", "children", "untried", "visits", "score", "won")
+
+    def __init__(self, variant, state, cell=None, parent=None, won=False):
+        self.state = state
+        self.cell = cell
+        self.parent = parent
+        # Scores are kept from the point of view of the player whose move led
+        # here, which is what the parent compares when selecting.
+        self.mover = 1 - variant.side_to_move(state)
+        self.children = []
+        self.untried = [] if won else list(iter_cells(variant.empty_mask(state)))
+        self.visits = 0
+        self.score = 0.0
+        self.won = won
+
+
+def playout(variant, state, rng, limit=DEFAULT_PLAYOUT_LIMIT):
+    # Uniformly random moves until someone wins or the limit is reached (a
+    # draw). Rolling boards stay sparse, so picking random cells until one is
+    # empty beats building the list of empty cells every move.
+    play = variant.play
+    cells = variant.cells
+    side_shift = variant.side_shift
+    randrange = rng.randrange
+    for _ in range(limit):
+        empty = variant.empty_mask(state)
+        if not empty:
+            return None
+        cell = randrange(cells)
+        while not empty >> cell & 1:
+            cell = randrange(cells)
+        mover = state >> side_shift
+        state, won = play(state, cell)
+        if won:
+            return mover
+    return None
+
+
+def run_tree(variant, state, budget_ms=DEFAULT_BUDGET_MS, iterations=None,
+             exploration=DEFAULT_EXPLORATION, playout_limit=DEFAULT_PLAYOUT_LIMIT, seed=None):
+    # One UCT tree grown until the time or iteration budget runs out. Returns
+    # {cell: (visits, score)} for the root's children and the playout count,
+    # so independent trees from several processes can be merged.
+    rng = random.Random(seed)
+    root = Node(variant, state)
+    deadline = time.perf_counter() + budget_ms / 1000 if budget_ms else None
+    log = math.log
+    sqrt = math.sqrt
+    playouts = 0
+    while (iterations is None or playouts < iterations) and (deadline is None or time.perf_counter() < deadline):
+        node = root
+        while not node.untried and node.children and not node.won:
+            scale = exploration * sqrt(log(node.visits))
+            node = max(node.children, key=lambda c: c.score / c.visits + scale / sqrt(c.visits))
+
+        if node.untried and not node.won:
+            cell = node.untried.pop(rng.randrange(len(node.untried)))
+            child_state, won = variant.play(node.state, cell)
+            child = Node(variant, child_state, cell, node, won)
+            node.children.append(child)
+            node = child
+
+        if node.won:
+            winner = node.mover
+        else:
+            winner = playout(variant, node.state, rng, playout_limit)
+        playouts += 1
+
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.score += 0.5
+            elif winner == node.mover:
+                node.score += 1.0
+            node = node.parent
+
+        if iterations is None and deadline is None:
+            break
+
+    return {child.cell: (child.visits, child.score) for child in root.children}, playouts
+
+
+class MCTSEngine:
+    # UCT search with root parallelization: every worker process grows its
+    # own tree from the same position and the root visit counts are summed.
+    # The move with the most combined visits is played.
+    def __init__(self, variant=DEFAULT_VARIANT, budget_ms=DEFAULT_BUDGET_MS, iterations=None, workers=1,
+                 exploration=DEFAULT_EXPLORATION, playout_limit=DEFAULT_PLAYOUT_LIMIT, seed=None):
+        if budget_ms is None and iterations is None:
+            raise ValueError("MCTS needs a time budget, an iteration budget or both")
+        self.variant = variant
+        self.budget_ms = budget_ms
+        self.iterations = iterations
+        self.workers = workers or os.cpu_count()
+        self.exploration = exploration
+        self.playout_limit = playout_limit
+        self.rng = random.Random(seed)
+        self.pool = None
+        self.lock = threading.Lock()
+        self.last = {}
+
+    def _pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def search(self, state):
+        with self.lock:
+            started = time.perf_counter()
+            iterations = self.iterations
+            if iterations is not None:
+                iterations = max(1, iterations // self.workers)
+            args = (self.variant, state, self.budget_ms, iterations, self.exploration, self.playout_limit)
+            seeds = [self.rng.getrandbits(32) for _ in range(self.workers)]
+            if self.workers == 1:
+                results = [run_tree(*args, seed=seeds[0])]
+            else:
+                pool = self._pool()
+                futures = [pool.submit(run_tree, *args, seed=seed) for seed in seeds]
+                results = [future.result() for future in futures]
+
+            totals = {}
+            playouts = 0
+            for children, count in results:
+                playouts += count
+                for cell, (visits, score) in children.items():
+                    total = totals.setdefault(cell, [0, 0.0])
+                    total[0] += visits
+                    total[1] += score
+
+            best_cell = max(totals, key=lambda cell: totals[cell][0]) if totals else None
+            elapsed = time.perf_counter() - started
+            self.last = {
+                "playouts": playouts,
+                "playouts_per_s": playouts / elapsed if elapsed > 0 else 0.0,
+                "workers": self.workers,
+                "win_rate": totals[best_cell][1] / totals[best_cell][0] if best_cell is not None else 0.0,
+                "ms": elapsed * 1000,
+            }
+            return best_cell
+
+    def best_move(self, game):
+        if game.variant != self.variant:
+            raise ValueError(f"engine is set up for {self.variant.name}, not {game.variant.name}")
+        with metrics.span("ai.mcts"):
+            cell = self.search(game.state)
+        return self.variant.cell_position(cell) if cell is not None else None
@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_WINDOW = 500
+BUCKET_BOUNDS_MS = (0.1, 0.5, 1, 2, 5, 10, 16.7, 33, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    # Rolling window of recent samples for percentiles, plus cumulative
+    # Prometheus-style buckets over the whole run.
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.buckets = [0] * len(BUCKET_BOUNDS_MS)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.samples.append(ms)
+        self.count += 1
+        self.total += ms
+        for i, bound in enumerate(BUCKET_BOUNDS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "last_ms": self.samples[-1] if self.samples else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": max(self.samples) if self.samples else 0.0,
+        }
+
+
+class Metrics:
+    def __init__(self, window=DEFAULT_WINDOW, event_log=10000):
+        self.window = window
+        self.histograms = {}
+        self.events = deque(maxlen=event_log)
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.window)
+            histogram.add(seconds)
+            self.events.append((time.time(), name, seconds))
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        with self.lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def export_jsonl(self, path):
+        with self.lock:
+            events = list(self.events)
+            self.events.clear()
+        with open(path, "a") as f:
+            for timestamp, name, seconds in events:
+                f.write(json.dumps({"ts": timestamp, "span": name, "ms": round(seconds * 1000, 4)}) + "\n")
+
+    def export_prometheus(self, path):
+        lines = [
+            "# HELP tictactoe_span_ms Duration of instrumented spans in milliseconds.",
+            "# TYPE tictactoe_span_ms histogram",
+        ]
+        with self.lock:
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKET_BOUNDS_MS, histogram.buckets):
+                    cumulative += count
+                    lines.append(f'tictactoe_span_ms_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'tictactoe_span_ms_bucket{{span="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'tictactoe_span_ms_sum{{span="{name}"}} {histogram.total:.4f}')
+                lines.append(f'tictactoe_span_ms_count{{span="{name}"}} {histogram.count}')
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def export(self, path):
+        if path.endswith(".prom") or path.endswith(".txt"):
+            self.export_prometheus(path)
+        else:
+            self.export_jsonl(path)
+
+
+metrics = Metrics()
@@ -0,0 +1,126 @@
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from bitboard import DEFAULT_VARIANT
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_move_cache.json")
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_SAVE_DELAY = 2.0
+
+
+def cache_path(variant=DEFAULT_VARIANT):
+    if variant == DEFAULT_VARIANT:
+        return DEFAULT_CACHE_PATH
+    return os.path.join(os.path.dirname(DEFAULT_CACHE_PATH), f"llm_move_cache-{variant.name}.json")
+
+
+class MoveCache:
+    # put() only marks the cache dirty; a timer writes it save_delay seconds
+    # later, off the move path, and flush() writes what is pending (at exit).
+    # Saves are serialized and go through a unique temp file.
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, variant=DEFAULT_VARIANT,
+                 save_delay=DEFAULT_SAVE_DELAY):
+        self.path = path
+        self.variant = variant
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.dirty = False
+        self.timer = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION or data.get("variant", DEFAULT_VARIANT.name) != self.variant.name:
+                return
+            for state, cell in data["entries"]:
+                self.entries[int(state)] = int(cell)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable move cache {self.path}: {e}")
+            self.entries.clear()
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        if not self.path:
+            return
+        with self.save_lock:
+            with self.lock:
+                self.dirty = False
+                data = {"version": CACHE_VERSION, "variant": self.variant.name, "entries": list(self.entries.items())}
+            directory, name = os.path.split(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def flush(self):
+        with self.lock:
+            timer, self.timer = self.timer, None
+            dirty = self.dirty
+        if timer is not None:
+            timer.cancel()
+        if dirty:
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Could not save move cache {self.path}: {e}")
+
+    def get(self, game):
+        key, symmetry = self.variant.canonical(game.state)
+        with self.lock:
+            cell = self.entries.get(key)
+            if cell is None:
+                self.misses += 1
+                return None
+            move = self.variant.cell_position(self.variant.inverse_symmetries[symmetry][cell])
+            if not game.is_valid_move(*move):
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return move
+
+    def put(self, game, move):
+        if not game.is_valid_move(*move):
+            return
+        key, symmetry = self.variant.canonical(game.state)
+        with self.lock:
+            self.entries[key] = self.variant.symmetries[symmetry][self.variant.cell_index(*move)]
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            self.dirty = True
+            if self.path and self.timer is None:
+                self.timer = threading.Timer(self.save_delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
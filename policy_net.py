@@ -0,0 +1,409 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+import batch_eval
+from bitboard import DEFAULT_VARIANT, parse_variant
+from solver import DRAW, LOSS, WIN, labeled_positions
+
+DEFAULT_NET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "policy_net.npz")
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "training_data")
+DEFAULT_SHARD_SIZE = 65536
+DEFAULT_HIDDEN = 256
+SHARD_ARRAYS = ("features", "policy", "value", "weight")
+RESULT_VALUES = {WIN: 1.0, DRAW: 0.0, LOSS: -1.0}
+
+# Features are from the side to move's point of view: one plane per
+# (own/opponent, queue age, cell) holding a 1 where that piece stands, then
+# two flags for own/opponent queue full (so age 0 is the piece that expires
+# next). That is the whole position, so the net never sees an ambiguous board.
+
+
+def feature_count(variant):
+    return 2 * variant.max_pieces * variant.cells + 2
+
+
+def encode(boards, ages, sides, variant=DEFAULT_VARIANT):
+    # Batch encoding of batch_eval arrays -> (N, features) uint8.
+    count = len(boards)
+    flat_boards = boards.reshape(count, -1)
+    flat_ages = ages.reshape(count, -1)
+    planes = np.zeros((count, 2, variant.max_pieces, variant.cells), dtype=np.uint8)
+    games, cells = np.nonzero(flat_boards != batch_eval.EMPTY)
+    owner = (flat_boards[games, cells] != sides[games] + 1).astype(np.intp)
+    planes[games, owner, flat_ages[games, cells], cells] = 1
+    full = planes.sum(axis=(2, 3)) == variant.max_pieces
+    return np.concatenate([planes.reshape(count, -1), full.astype(np.uint8)], axis=1)
+
+
+def encode_state(state, variant=DEFAULT_VARIANT):
+    # Single-position encoding straight from the packed state, for play.
+    features = np.zeros(feature_count(variant), dtype=np.float32)
+    side = variant.side_to_move(state)
+    plane = variant.max_pieces * variant.cells
+    for slot, who in ((0, side), (1, 1 - side)):
+        queue = variant.queue_cells(state, who)
+        for age, cell in enumerate(queue):
+            features[slot * plane + age * variant.cells + cell] = 1
+        if len(queue) == variant.max_pieces:
+            features[2 * plane + slot] = 1
+    return features
+
+
+def legal_from_features(features, variant):
+    plane = variant.max_pieces * variant.cells
+    pieces = features[:, :2 * plane].reshape(len(features), 2 * variant.max_pieces, variant.cells)
+    return pieces.sum(axis=1) == 0
+
+
+def masked_softmax(logits, legal):
+    logits = np.where(legal, logits, -np.inf)
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class PolicyValueNet:
+    # Two ReLU layers feeding a policy head (one logit per cell, softmaxed
+    # over the legal cells) and a tanh value head (+1: side to move wins).
+    # Inference is plain NumPy.
+    def __init__(self, variant=DEFAULT_VARIANT, hidden=DEFAULT_HIDDEN, seed=0, params=None):
+        self.variant = variant
+        if params is None:
+            rng = np.random.default_rng(seed)
+            inputs = feature_count(variant)
+            params = {
+                "w1": rng.normal(0, np.sqrt(2 / inputs), (inputs, hidden)),
+                "b1": np.zeros(hidden),
+                "w2": rng.normal(0, np.sqrt(2 / hidden), (hidden, hidden)),
+                "b2": np.zeros(hidden),
+                "wp": rng.normal(0, np.sqrt(1 / hidden), (hidden, variant.cells)),
+                "bp": np.zeros(variant.cells),
+                "wv": rng.normal(0, np.sqrt(1 / hidden), (hidden, 1)),
+                "bv": np.zeros(1),
+            }
+        self.params = {name: value.astype(np.float32) for name, value in params.items()}
+
+    def forward(self, features):
+        p = self.params
+        h1 = np.maximum(features @ p["w1"] + p["b1"], 0)
+        h2 = np.maximum(h1 @ p["w2"] + p["b2"], 0)
+        logits = h2 @ p["wp"] + p["bp"]
+        value = np.tanh(h2 @ p["wv"] + p["bv"])[:, 0]
+        return h1, h2, logits, value
+
+    def evaluate(self, features, legal=None):
+        # Batched: (N, features) -> move probabilities over cells and values.
+        features = np.asarray(features, dtype=np.float32)
+        if legal is None:
+            legal = legal_from_features(features, self.variant)
+        _, _, logits, value = self.forward(features)
+        return masked_softmax(logits, legal), value
+
+    def evaluate_states(self, states):
+        boards, ages, sides = batch_eval.from_states(states, self.variant)
+        return self.evaluate(encode(boards, ages, sides, self.variant))
+
+    def best_move(self, game):
+        variant = self.variant
+        empty = variant.empty_mask(game.state)
+        if not empty:
+            return None
+        _, _, logits, _ = self.forward(encode_state(game.state, variant)[None])
+        logits = logits[0]
+        best = max((cell for cell in range(variant.cells) if empty >> cell & 1), key=logits.__getitem__)
+        return variant.cell_position(best)
+
+    def save(self, path=DEFAULT_NET_PATH):
+        np.savez(path, variant=np.array(self.variant.spec), **self.params)
+
+    @classmethod
+    def load(cls, path=DEFAULT_NET_PATH):
+        with np.load(path) as data:
+            variant = parse_variant(str(data["variant"]))
+            params = {name: data[name] for name in data.files if name != "variant"}
+        return cls(variant, params=params)
+
+
+def load_net(path=DEFAULT_NET_PATH, variant=DEFAULT_VARIANT):
+    if not os.path.exists(path):
+        return None
+    try:
+        net = PolicyValueNet.load(path)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Policy network unavailable: {e}")
+        return None
+    if net.variant != variant:
+        print(f"Policy network unavailable: {path} was trained for {net.variant.name}, not {variant.name}")
+        return None
+    return net
+
+
+class ShardWriter:
+    # Streams samples into fixed-size .npy shards written through
+    # np.lib.format.open_memmap, so building a data set never holds more than
+    # one shard in memory.
+    def __init__(self, directory, variant, shard_size=DEFAULT_SHARD_SIZE, source=None):
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*-[0-9][0-9][0-9][0-9][0-9].npy")):
+            os.remove(path)
+        self.directory = directory
+        self.variant = variant
+        self.shard_size = shard_size
+        self.source = source
+        self.pending = []
+        self.pending_rows = 0
+        self.shards = 0
+        self.rows = 0
+
+    def add(self, features, policy, value, weight):
+        self.pending.append((features, policy, value, weight))
+        self.pending_rows += len(features)
+        while self.pending_rows >= self.shard_size:
+            self.flush(self.shard_size)
+
+    def flush(self, rows):
+        arrays = [np.concatenate(parts) for parts in zip(*self.pending)]
+        for name, array in zip(SHARD_ARRAYS, arrays):
+            path = os.path.join(self.directory, f"{name}-{self.shards:05d}.npy")
+            shard = np.lib.format.open_memmap(path, mode="w+", dtype=array.dtype, shape=(rows,) + array.shape[1:])
+            shard[:] = array[:rows]
+            shard.flush()
+            del shard
+        rest = [array[rows:] for array in arrays]
+        self.pending = [tuple(rest)] if len(rest[0]) else []
+        self.pending_rows -= rows
+        self.shards += 1
+        self.rows += rows
+
+    def close(self):
+        if self.pending_rows:
+            self.flush(self.pending_rows)
+        meta = {
+            "variant": self.variant.spec,
+            "features": feature_count(self.variant),
+            "rows": self.rows,
+            "shards": self.shards,
+            "source": self.source,
+        }
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+
+def solver_samples(chunk=8192):
+    # Every position of the solved 3x3 game: the value for the side to move
+    # and a uniform policy over the moves that keep that value.
+    variant = DEFAULT_VARIANT
+    states, values, policies = [], [], []
+    for state, result, cells in labeled_positions():
+        policy = np.zeros(variant.cells, dtype=np.float32)
+        policy[cells] = 1 / len(cells)
+        states.append(state)
+        values.append(RESULT_VALUES[result])
+        policies.append(policy)
+        if len(states) == chunk:
+            yield solver_chunk(states, values, policies)
+            states, values, policies = [], [], []
+    if states:
+        yield solver_chunk(states, values, policies)
+
+
+def solver_chunk(states, values, policies):
+    boards, ages, sides = batch_eval.from_states(states)
+    return (
+        encode(boards, ages, sides),
+        np.array(policies, dtype=np.float32),
+        np.array(values, dtype=np.float32),
+        np.ones(len(states), dtype=np.float32),
+    )
+
+
+def self_play_samples(games, variant=DEFAULT_VARIANT, seed=None, chunk=2000):
+    # Random self-play for variants too big to solve: the value is the final
+    # result for the side to move, and the policy target is the move played,
+    # kept (weight 1) only when the side that played it went on to win.
+    rng = np.random.default_rng(seed)
+    for start in range(0, games, chunk):
+        results, _, history = batch_eval.self_play(
+            min(chunk, games - start), variant, seed=int(rng.integers(1 << 31)), record=True,
+        )
+        for active, boards, ages, sides, cells in history:
+            movers = sides + 1
+            outcome = results[active]
+            value = np.where(outcome == batch_eval.EMPTY, 0.0, np.where(outcome == movers, 1.0, -1.0))
+            policy = np.zeros((len(active), variant.cells), dtype=np.float32)
+            policy[np.arange(len(active)), cells] = 1
+            yield (
+                encode(boards, ages, sides, variant),
+                policy,
+                value.astype(np.float32),
+                (value > 0).astype(np.float32),
+            )
+
+
+def build_data(directory=DEFAULT_DATA_DIR, source="solver", variant=DEFAULT_VARIANT, games=20000,
+               shard_size=DEFAULT_SHARD_SIZE, seed=0):
+    if source == "solver":
+        if variant != DEFAULT_VARIANT:
+            raise ValueError(f"the solver only covers {DEFAULT_VARIANT.name}, use --source self-play")
+        samples = solver_samples()
+    else:
+        samples = self_play_samples(games, variant, seed)
+    writer = ShardWriter(directory, variant, shard_size, source)
+    for features, policy, value, weight in samples:
+        writer.add(features, policy, value, weight)
+    return writer.close()
+
+
+def load_shards(directory):
+    # Memory-mapped views of every shard; nothing is read until it is sliced.
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    shards = [
+        tuple(np.load(os.path.join(directory, f"{name}-{index:05d}.npy"), mmap_mode="r") for name in SHARD_ARRAYS)
+        for index in range(meta["shards"])
+    ]
+    return meta, shards
+
+
+def iter_batches(shards, batch_size, rng):
+    for index in rng.permutation(len(shards)):
+        features, policy, value, weight = shards[index]
+        order = rng.permutation(len(features))
+        for start in range(0, len(order), batch_size):
+            rows = np.sort(order[start:start + batch_size])
+            yield features[rows].astype(np.float32), policy[rows], value[rows], weight[rows]
+
+
+class Adam:
+    def __init__(self, params, lr=1e-3, beta1=0.9, beta2=0.999, eps=1e-8):
+        self.params = params
+        self.lr = lr
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.eps = eps
+        self.steps = 0
+        self.m = {name: np.zeros_like(value) for name, value in params.items()}
+        self.v = {name: np.zeros_like(value) for name, value in params.items()}
+
+    def step(self, grads):
+        self.steps += 1
+        correction = np.sqrt(1 - self.beta2 ** self.steps) / (1 - self.beta1 ** self.steps)
+        for name, grad in grads.items():
+            self.m[name] = self.beta1 * self.m[name] + (1 - self.beta1) * grad
+            self.v[name] = self.beta2 * self.v[name] + (1 - self.beta2) * grad * grad
+            self.params[name] -= self.lr * correction * self.m[name] / (np.sqrt(self.v[name]) + self.eps)
+
+
+def train_step(net, optimizer, features, policy, value, weight):
+    # Cross-entropy on the policy (weighted per sample) plus squared error on
+    # the value, backpropagated by hand.
+    p = net.params
+    count = len(features)
+    legal = legal_from_features(features, net.variant)
+    h1, h2, logits, predicted = net.forward(features)
+    probs = masked_softmax(logits, legal)
+
+    policy_loss = -(weight * (policy * np.log(np.where(policy > 0, probs, 1))).sum(axis=1)).sum() / count
+    value_loss = ((predicted - value) ** 2).mean()
+
+    d_logits = (probs - policy) * weight[:, None] / count
+    d_value = (2 * (predicted - value) * (1 - predicted ** 2) / count)[:, None]
+    grads = {
+        "wp": h2.T @ d_logits,
+        "bp": d_logits.sum(axis=0),
+        "wv": h2.T @ d_value,
+        "bv": d_value.sum(axis=0),
+    }
+    d_h2 = (d_logits @ p["wp"].T + d_value @ p["wv"].T) * (h2 > 0)
+    grads["w2"] = h1.T @ d_h2
+    grads["b2"] = d_h2.sum(axis=0)
+    d_h1 = d_h2 @ p["w2"].T * (h1 > 0)
+    grads["w1"] = features.T @ d_h1
+    grads["b1"] = d_h1.sum(axis=0)
+    optimizer.step(grads)
+    return policy_loss, value_loss
+
+
+def measure(net, shards, batch_size=8192):
+    # Share of positions whose top move is one of the targets, and of
+    # decided positions whose value has the right sign.
+    hits = decided = value_hits = rows = 0
+    for features, policy, value, weight in shards:
+        for start in range(0, len(features), batch_size):
+            x = features[start:start + batch_size].astype(np.float32)
+            probs, predicted = net.evaluate(x)
+            target = policy[start:start + batch_size]
+            keep = weight[start:start + batch_size] > 0
+            chosen = probs.argmax(axis=1)
+            hits += (target[np.arange(len(x)), chosen] > 0)[keep].sum()
+            rows += keep.sum()
+            z = value[start:start + batch_size]
+            decisive = z != 0
+            decided += decisive.sum()
+            value_hits += (np.sign(predicted[decisive]) == z[decisive]).sum()
+    return {
+        "policy_accuracy": round(float(hits / max(rows, 1)), 4),
+        "value_sign_accuracy": round(float(value_hits / max(decided, 1)), 4),
+    }
+
+
+def train(directory=DEFAULT_DATA_DIR, path=DEFAULT_NET_PATH, hidden=DEFAULT_HIDDEN, epochs=60, batch_size=256,
+          lr=1e-3, seed=0):
+    meta, shards = load_shards(directory)
+    variant = parse_variant(meta["variant"])
+    rng = np.random.default_rng(seed)
+    net = PolicyValueNet(variant, hidden, seed)
+    optimizer = Adam(net.params, lr)
+    for epoch in range(1, epochs + 1):
+        started = time.perf_counter()
+        totals = np.zeros(2)
+        batches = 0
+        for batch in iter_batches(shards, batch_size, rng):
+            totals += train_step(net, optimizer, *batch)
+            batches += 1
+        policy_loss, value_loss = totals / max(batches, 1)
+        print(f"epoch {epoch:3d}  policy loss {policy_loss:.4f}  value loss {value_loss:.4f}"
+              f"  ({time.perf_counter() - started:.1f}s)", flush=True)
+    net.save(path)
+    return net, measure(net, shards)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build training shards and train the NumPy policy/value network.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="write labeled positions to .npy shards")
+    build.add_argument("-d", "--data", default=DEFAULT_DATA_DIR)
+    build.add_argument("--source", choices=("solver", "self-play"), default="solver")
+    build.add_argument("--variant", type=parse_variant, default=DEFAULT_VARIANT, help="board as ROWSxCOLS[:K[:PIECES]]")
+    build.add_argument("-g", "--games", type=int, default=20000, help="self-play games")
+    build.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    build.add_argument("--seed", type=int, default=0)
+    fit = commands.add_parser("train", help="train on the shards and save the weights")
+    fit.add_argument("-d", "--data", default=DEFAULT_DATA_DIR)
+    fit.add_argument("-o", "--output", default=DEFAULT_NET_PATH)
+    fit.add_argument("--hidden", type=int, default=DEFAULT_HIDDEN)
+    fit.add_argument("-e", "--epochs", type=int, default=60)
+    fit.add_argument("--batch-size", type=int, default=256)
+    fit.add_argument("--lr", type=float, default=1e-3)
+    fit.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        try:
+            meta = build_data(args.data, args.source, args.variant, args.games, args.shard_size, args.seed)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Wrote {meta['rows']} positions in {meta['shards']} shards to {args.data}")
+    else:
+        net, report = train(args.data, args.output, args.hidden, args.epochs, args.batch_size, args.lr, args.seed)
+        print(f"Saved {net.variant.name} network to {args.output}: {report}")
+
+
+if __name__ == "__main__":
+    main()
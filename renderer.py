@@ -0,0 +1,300 @@
+import pygame
+
+from game_engine import DEFAULT_VARIANT
+from metrics import metrics
+
+WIDTH, HEIGHT = 600, 600
+# Sizes below are for BASE_SQUARE_SIZE squares and scale with the board.
+BASE_SQUARE_SIZE = 200
+LINE_WIDTH = 15
+CIRCLE_WIDTH = 15
+CROSS_WIDTH = 25
+WIN_LINE_WIDTH = 15
+WIN_LINE_MARGIN = 15
+
+BG_COLOR = (28, 170, 156)
+LINE_COLOR = (23, 145, 135)
+CIRCLE_COLOR = (239, 231, 200)
+CROSS_COLOR = (66, 66, 66)
+FADED_CIRCLE_COLOR = (180, 175, 160)
+FADED_CROSS_COLOR = (150, 150, 150)
+MENU_BG_COLOR = (52, 152, 219)
+BUTTON_COLOR = (41, 128, 185)
+BUTTON_HOVER_COLOR = (26, 88, 126)
+BUTTON_DISABLED_COLOR = (150, 150, 150)
+BUTTON_DISABLED_TEXT_COLOR = (200, 200, 200)
+TEXT_COLOR = (255, 255, 255)
+WIN_LINE_COLOR = (255, 0, 0)
+HUD_BG_COLOR = (0, 0, 0, 170)
+HUD_TEXT_COLOR = (120, 255, 120)
+HUD_REFRESH_MS = 250
+
+_surfaces = {}
+
+
+def cached(key, build):
+    surface = _surfaces.get(key)
+    if surface is None:
+        surface = _surfaces[key] = build()
+    return surface
+
+
+def render_text(font, text, color=TEXT_COLOR):
+    return cached(("text", id(font), text, color), lambda: font.render(text, True, color))
+
+
+def centered(surface, center):
+    return surface, surface.get_rect(center=center).topleft
+
+
+def _build_titled_background(font, text):
+    surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+    surface.fill(MENU_BG_COLOR)
+    title, pos = centered(render_text(font, text), (WIDTH//2, HEIGHT//4))
+    surface.blit(title, pos)
+    return surface
+
+
+def titled_background(font, text):
+    return cached(("titled", id(font), text), lambda: _build_titled_background(font, text))
+
+
+class BoardLayout:
+    # Pixel geometry for a variant. Line and piece sizes are scaled from the
+    # classic 200px squares and the board is centered in the window.
+    def __init__(self, variant):
+        self.variant = variant
+        self.square_size = min(WIDTH // variant.cols, HEIGHT // variant.rows)
+        self.left = (WIDTH - self.square_size * variant.cols) // 2
+        self.top = (HEIGHT - self.square_size * variant.rows) // 2
+        scale = self.square_size / BASE_SQUARE_SIZE
+        self.line_width = max(1, round(LINE_WIDTH * scale))
+        self.circle_radius = self.square_size // 3
+        self.circle_width = max(1, round(CIRCLE_WIDTH * scale))
+        self.cross_width = max(1, round(CROSS_WIDTH * scale))
+        self.space = self.square_size // 4
+        self.win_line_margin = round(WIN_LINE_MARGIN * scale)
+        self.win_line_width = max(2, round(WIN_LINE_WIDTH * scale))
+
+    def cell_origin(self, row, col):
+        return self.left + col * self.square_size, self.top + row * self.square_size
+
+    def cell_center(self, row, col):
+        x, y = self.cell_origin(row, col)
+        return x + self.square_size // 2, y + self.square_size // 2
+
+    def cell_at(self, pos):
+        row = (pos[1] - self.top) // self.square_size
+        col = (pos[0] - self.left) // self.square_size
+        if 0 <= row < self.variant.rows and 0 <= col < self.variant.cols:
+            return row, col
+        return None
+
+    def _build_background(self):
+        surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+        surface.fill(BG_COLOR)
+        right = self.left + self.square_size * self.variant.cols
+        bottom = self.top + self.square_size * self.variant.rows
+        for row in range(1, self.variant.rows):
+            y = self.top + row * self.square_size
+            pygame.draw.line(surface, LINE_COLOR, (self.left, y), (right, y), self.line_width)
+        for col in range(1, self.variant.cols):
+            x = self.left + col * self.square_size
+            pygame.draw.line(surface, LINE_COLOR, (x, self.top), (x, bottom), self.line_width)
+        return surface
+
+    def background(self):
+        return cached(("board", self.variant), self._build_background)
+
+    def _build_piece(self, player, faded):
+        size, space = self.square_size, self.space
+        surface = pygame.Surface((size, size), pygame.SRCALPHA)
+        if player == 'X':
+            color = FADED_CROSS_COLOR if faded else CROSS_COLOR
+            pygame.draw.line(surface, color, (space, space), (size - space, size - space), self.cross_width)
+            pygame.draw.line(surface, color, (size - space, space), (space, size - space), self.cross_width)
+        else:
+            color = FADED_CIRCLE_COLOR if faded else CIRCLE_COLOR
+            pygame.draw.circle(surface, color, (size // 2, size // 2), self.circle_radius, self.circle_width)
+        return surface
+
+    def piece_sprite(self, player, faded):
+        return cached(("piece", self.square_size, player, faded), lambda: self._build_piece(player, faded))
+
+    def line_endpoints(self, line):
+        # Extend the line from the centers of its end cells towards the cell
+        # edges, stopping win_line_margin short of them.
+        (start_row, start_col), (end_row, end_col) = line[0], line[-1]
+        d_row = (end_row > start_row) - (end_row < start_row)
+        d_col = (end_col > start_col) - (end_col < start_col)
+        reach = self.square_size // 2 - self.win_line_margin
+        start_x, start_y = self.cell_center(start_row, start_col)
+        end_x, end_y = self.cell_center(end_row, end_col)
+        return (
+            (start_x - d_col * reach, start_y - d_row * reach),
+            (end_x + d_col * reach, end_y + d_row * reach),
+        )
+
+    def _build_winning_line(self, line):
+        surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        start, end = self.line_endpoints(line)
+        pygame.draw.line(surface, WIN_LINE_COLOR, start, end, self.win_line_width)
+        return surface
+
+    def winning_line_sprite(self, line):
+        key = ("winning_line", self.variant, tuple(line))
+        return cached(key, lambda: self._build_winning_line(line)), (0, 0)
+
+    def sprites(self, session):
+        board = session.board
+        oldest = {'X': session.oldest('X'), 'O': session.oldest('O')}
+        sprites = {}
+        for row in range(self.variant.rows):
+            for col in range(self.variant.cols):
+                player = board[row][col]
+                if player:
+                    sprite = self.piece_sprite(player, (row, col) == oldest[player])
+                    sprites[(row, col)] = (sprite, self.cell_origin(row, col))
+        if session.game_over and session.winner:
+            sprites["winning_line"] = self.winning_line_sprite(session.winning_line())
+        return sprites
+
+
+_layouts = {}
+
+
+def board_layout(variant=DEFAULT_VARIANT):
+    layout = _layouts.get(variant)
+    if layout is None:
+        layout = _layouts[variant] = BoardLayout(variant)
+    return layout
+
+
+def board_background(variant=DEFAULT_VARIANT):
+    return board_layout(variant).background()
+
+
+def board_sprites(session):
+    return board_layout(session.variant).sprites(session)
+
+
+class Button:
+    def __init__(self, x, y, width, height, text, font):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.text = text
+        self.font = font
+        self.is_hovered = False
+        self.enabled = True
+
+    def _build(self, color, text_color):
+        surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        pygame.draw.rect(surface, color, surface.get_rect(), border_radius=10)
+        label, pos = centered(render_text(self.font, self.text, text_color), surface.get_rect().center)
+        surface.blit(label, pos)
+        return surface
+
+    def sprite(self):
+        if not self.enabled:
+            key, colors = "disabled", (BUTTON_DISABLED_COLOR, BUTTON_DISABLED_TEXT_COLOR)
+        elif self.is_hovered:
+            key, colors = "hover", (BUTTON_HOVER_COLOR, TEXT_COLOR)
+        else:
+            key, colors = "normal", (BUTTON_COLOR, TEXT_COLOR)
+        surface = cached(("button", id(self), self.text, key), lambda: self._build(*colors))
+        return surface, self.rect.topleft
+
+    def check_hover(self, pos):
+        self.is_hovered = self.enabled and self.rect.collidepoint(pos)
+        return self.is_hovered
+
+    def is_clicked(self, pos):
+        return self.enabled and self.rect.collidepoint(pos)
+
+
+class DebugHUD:
+    # Rebuilt at most every HUD_REFRESH_MS and never cached by text, since the
+    # numbers change on every refresh.
+    def __init__(self, font, source=metrics, refresh_ms=HUD_REFRESH_MS):
+        self.font = font
+        self.source = source
+        self.refresh_ms = refresh_ms
+        self.visible = False
+        self.surface = None
+        self.updated_at = None
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.updated_at = None
+
+    def lines(self):
+        lines = [f"{'span (ms)':<18} {'p50':>7} {'p90':>7} {'max':>7}"]
+        for name, summary in self.source.snapshot().items():
+            lines.append(
+                f"{name:<18} {summary['p50_ms']:7.2f} {summary['p90_ms']:7.2f} {summary['max_ms']:7.1f}"
+            )
+        return lines
+
+    def sprite(self):
+        now = pygame.time.get_ticks()
+        if self.updated_at is None or now - self.updated_at >= self.refresh_ms:
+            rendered = [self.font.render(line, True, HUD_TEXT_COLOR) for line in self.lines()]
+            width = max(surface.get_width() for surface in rendered) + 12
+            height = sum(surface.get_height() for surface in rendered) + 12
+            self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+            self.surface.fill(HUD_BG_COLOR)
+            y = 6
+            for surface in rendered:
+                self.surface.blit(surface, (6, y))
+                y += surface.get_height()
+            self.updated_at = now
+        return self.surface, (8, HEIGHT - self.surface.get_height() - 8)
+
+
+class Renderer:
+    # Retained-mode compositor: each frame is a background plus named sprites.
+    # Only rectangles whose sprites changed since the last frame are redrawn
+    # and pushed to the display.
+    def __init__(self, screen):
+        self.screen = screen
+        self.background = None
+        self.sprites = {}
+        self.hud = None
+
+    def invalidate(self):
+        self.background = None
+
+    def present(self, background, sprites):
+        if self.hud and self.hud.visible:
+            sprites["hud"] = self.hud.sprite()
+        if background is not self.background:
+            self.screen.blit(background, (0, 0))
+            for surface, pos in sprites.values():
+                self.screen.blit(surface, pos)
+            pygame.display.update()
+            self.background = background
+            self.sprites = sprites
+            return True
+
+        dirty = []
+        for name, sprite in sprites.items():
+            old = self.sprites.get(name)
+            if old is None or old[0] is not sprite[0] or old[1] != sprite[1]:
+                dirty.append(pygame.Rect(sprite[1], sprite[0].get_size()))
+                if old is not None:
+                    dirty.append(pygame.Rect(old[1], old[0].get_size()))
+        for name, old in self.sprites.items():
+            if name not in sprites:
+                dirty.append(pygame.Rect(old[1], old[0].get_size()))
+        if not dirty:
+            return False
+
+        for rect in dirty:
+            self.screen.set_clip(rect)
+            self.screen.blit(background, rect, rect)
+            for surface, pos in sprites.values():
+                if rect.colliderect(pygame.Rect(pos, surface.get_size())):
+                    self.screen.blit(surface, pos)
+        self.screen.set_clip(None)
+        pygame.display.update(dirty)
+        self.sprites = sprites
+        return True
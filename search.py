@@ -0,0 +1,305 @@
+import random
+import threading
+import time
+
+from bitboard import DEFAULT_VARIANT, X, O, iter_cells
+from metrics import metrics
+
+DEFAULT_BUDGET_MS = 100
+DEFAULT_MAX_DEPTH = 32
+DEFAULT_TABLE_BITS = 18
+NEIGHBOURHOOD = 2
+PRUNE_MIN_CELLS = 26
+
+WIN_SCORE = 1000000
+MATE_BOUND = WIN_SCORE - 1000
+INFINITY = WIN_SCORE + 1
+EXACT, LOWER, UPPER = 0, 1, 2
+LINE_WEIGHTS = (0, 1, 8, 64, 512, 4096, 32768)
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Zobrist:
+    # One random key per (side, queue age, cell) plus one for the side to
+    # move. Age is part of the key because two positions with the same pieces
+    # but a different expiry order play differently.
+    def __init__(self, variant=DEFAULT_VARIANT, seed=0):
+        rng = random.Random(seed)
+        self.variant = variant
+        self.keys = [
+            [[rng.getrandbits(64) for _ in range(variant.cells)] for _ in range(variant.max_pieces)]
+            for _ in (X, O)
+        ]
+        self.side_key = rng.getrandbits(64)
+
+    def hash(self, state):
+        variant = self.variant
+        h = self.side_key if variant.side_to_move(state) else 0
+        for side in (X, O):
+            for age, cell in enumerate(variant.queue_cells(state, side)):
+                h ^= self.keys[side][age][cell]
+        return h
+
+    def update(self, h, state, cell):
+        # Hash of the position after the side to move in `state` plays `cell`.
+        # With a full queue the oldest piece leaves and every other piece gets
+        # one step older.
+        variant = self.variant
+        side = variant.side_to_move(state)
+        keys = self.keys[side]
+        queue = variant.queue_cells(state, side)
+        if len(queue) == variant.max_pieces:
+            h ^= keys[0][queue[0]]
+            for age in range(1, len(queue)):
+                h ^= keys[age][queue[age]] ^ keys[age - 1][queue[age]]
+            h ^= keys[-1][cell]
+        else:
+            h ^= keys[len(queue)][cell]
+        return h ^ self.side_key
+
+
+class TranspositionTable:
+    # Fixed number of slots indexed by the low hash bits. A slot is replaced
+    # when it is stale (from an earlier search) or the new entry is at least
+    # as deep, so memory stays bounded however long the engine runs.
+    def __init__(self, bits=DEFAULT_TABLE_BITS):
+        self.mask = (1 << bits) - 1
+        self.slots = [None] * (1 << bits)
+        self.generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        self.generation += 1
+        self.hits = 0
+        self.stores = 0
+
+    def get(self, h):
+        entry = self.slots[h & self.mask]
+        if entry is not None and entry[0] == h:
+            self.hits += 1
+            return entry
+        return None
+
+    def put(self, h, depth, score, flag, cell):
+        index = h & self.mask
+        old = self.slots[index]
+        if old is None or old[0] == h or old[5] != self.generation or depth >= old[1]:
+            self.slots[index] = (h, depth, score, flag, cell, self.generation)
+            self.stores += 1
+
+    def clear(self):
+        self.slots = [None] * len(self.slots)
+
+
+def _to_table(score, ply):
+    # Mate scores are stored relative to the node, not the root.
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _from_table(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class AlphaBetaEngine:
+    # Negamax with alpha-beta pruning over the rolling-queue rules: play()
+    # expires the mover's oldest piece before the win check, so every line of
+    # the search sees pieces vanish exactly as they will in the game.
+    # Iterative deepening keeps the best move of the last finished depth and
+    # stops when the millisecond budget runs out.
+    def __init__(self, variant=DEFAULT_VARIANT, budget_ms=DEFAULT_BUDGET_MS, max_depth=DEFAULT_MAX_DEPTH,
+                 table_bits=DEFAULT_TABLE_BITS, seed=0):
+        self.variant = variant
+        self.budget_ms = budget_ms
+        self.max_depth = max_depth
+        self.zobrist = Zobrist(variant, seed)
+        self.table = TranspositionTable(table_bits)
+        self.lock = threading.Lock()
+        self.preferred = [variant.cell_index(row, col) for row, col in variant.preferred_cells()]
+        self.rank = {cell: rank for rank, cell in enumerate(self.preferred)}
+        self.near = [self._neighbourhood(cell) for cell in range(variant.cells)]
+        self.history = [0] * variant.cells
+        self.nodes = 0
+        self.root_cell = None
+        self.deadline = None
+        self.last = {}
+
+    def _neighbourhood(self, cell):
+        row, col = self.variant.cell_position(cell)
+        mask = 0
+        for r in range(max(0, row - NEIGHBOURHOOD), min(self.variant.rows, row + NEIGHBOURHOOD + 1)):
+            for c in range(max(0, col - NEIGHBOURHOOD), min(self.variant.cols, col + NEIGHBOURHOOD + 1)):
+                mask |= 1 << self.variant.cell_index(r, c)
+        return mask
+
+    def candidates(self, state):
+        # On large boards only empty cells near a piece are searched; far-away
+        # moves rarely matter for a K-in-a-row race and pruning them keeps the
+        # branching factor manageable. Small boards are searched in full.
+        variant = self.variant
+        empty = variant.empty_mask(state)
+        if variant.cells < PRUNE_MIN_CELLS:
+            return list(iter_cells(empty))
+        occupied = ~empty & variant.full_mask
+        if not occupied:
+            return [self.preferred[0]] if empty else []
+        near = 0
+        for cell in iter_cells(occupied):
+            near |= self.near[cell]
+        return list(iter_cells(empty & near))
+
+    def ordered_moves(self, state, tt_cell):
+        variant = self.variant
+        side = variant.side_to_move(state)
+        moves = self.candidates(state)
+        wins = set(variant.winning_cells(state, side))
+        blocks = set(variant.winning_cells(state, 1 - side))
+        history = self.history
+        rank = self.rank
+        moves.sort(key=lambda cell: (
+            cell != tt_cell,
+            cell not in wins,
+            cell not in blocks,
+            -history[cell],
+            rank[cell],
+        ))
+        return moves
+
+    def evaluate(self, state):
+        # Open-line count from the side to move's view. Each side's oldest
+        # piece is ignored once its queue is full, since it is gone before that
+        # side moves again.
+        variant = self.variant
+        masks = []
+        lines = set()
+        for side in (X, O):
+            mask = variant.occupancy(state, side)
+            queue = variant.queue_cells(state, side)
+            if len(queue) == variant.max_pieces:
+                mask &= ~(1 << queue[0])
+            masks.append(mask)
+            for cell in iter_cells(mask):
+                lines.update(variant.lines_through[cell])
+        x_mask, o_mask = masks
+        score = 0
+        for line in lines:
+            x = (line & x_mask).bit_count()
+            o = (line & o_mask).bit_count()
+            if x and not o:
+                score += LINE_WEIGHTS[min(x, len(LINE_WEIGHTS) - 1)]
+            elif o and not x:
+                score -= LINE_WEIGHTS[min(o, len(LINE_WEIGHTS) - 1)]
+        return -score if variant.side_to_move(state) else score
+
+    def negamax(self, state, h, depth, alpha, beta, ply):
+        # Nodes cost tens of microseconds, so reading the clock every time is
+        # cheap and keeps the budget tight.
+        self.nodes += 1
+        if time.perf_counter() >= self.deadline and self.root_cell is not None:
+            raise SearchTimeout
+
+        alpha_start = alpha
+        tt_cell = None
+        entry = self.table.get(h)
+        if entry is not None:
+            tt_cell = entry[4]
+            if entry[1] >= depth and ply:
+                score = _from_table(entry[2], ply)
+                flag = entry[3]
+                if flag == EXACT:
+                    return score
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        if depth == 0:
+            return self.evaluate(state)
+
+        play = self.variant.play
+        update = self.zobrist.update
+        best_score = -INFINITY
+        best_cell = None
+        for cell in self.ordered_moves(state, tt_cell):
+            child, won = play(state, cell)
+            if won:
+                score = WIN_SCORE - ply - 1
+            else:
+                score = -self.negamax(child, update(h, state, cell), depth - 1, -beta, -alpha, ply + 1)
+            if score > best_score:
+                best_score = score
+                best_cell = cell
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.history[cell] += depth * depth
+                break
+
+        if best_cell is None:
+            return 0
+        if ply == 0:
+            self.root_cell = best_cell
+
+        if best_score <= alpha_start:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.put(h, depth, _to_table(best_score, ply), flag, best_cell)
+        return best_score
+
+    def search(self, state, budget_ms=None):
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        with self.lock:
+            started = time.perf_counter()
+            self.deadline = started + budget_ms / 1000
+            self.nodes = 0
+            self.root_cell = None
+            self.history = [0] * self.variant.cells
+            self.table.new_search()
+            h = self.zobrist.hash(state)
+
+            best_cell, best_score, completed = None, 0, 0
+            for depth in range(1, self.max_depth + 1):
+                try:
+                    score = self.negamax(state, h, depth, -INFINITY, INFINITY, 0)
+                except SearchTimeout:
+                    break
+                best_cell, best_score, completed = self.root_cell, score, depth
+                # A forced result will not change with more depth.
+                if abs(score) > MATE_BOUND or time.perf_counter() >= self.deadline:
+                    break
+
+            if best_cell is None:
+                candidates = self.ordered_moves(state, None)
+                best_cell = candidates[0] if candidates else None
+
+            self.last = {
+                "depth": completed,
+                "score": best_score,
+                "nodes": self.nodes,
+                "tt_hits": self.table.hits,
+                "ms": (time.perf_counter() - started) * 1000,
+            }
+            return best_cell, best_score, completed
+
+    def best_move(self, game):
+        if game.variant != self.variant:
+            raise ValueError(f"engine is set up for {self.variant.name}, not {game.variant.name}")
+        with metrics.span("ai.search"):
+            cell = self.search(game.state)[0]
+        return self.variant.cell_position(cell) if cell is not None else None
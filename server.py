@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import itertools
+import json
+import socket
+import threading
+
+from bitboard import DEFAULT_VARIANT, Variant, parse_spec, parse_variant
+from game_engine import DEFAULT_MAX_MOVES, GameSession, other_player
+from game_record import MAX_CELLS, RecordWriter
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_LINE = 4096
+PLAYERS = ('X', 'O')
+# Building a Variant costs milliseconds on big boards and runs on the event
+# loop, so client boards are capped (one byte per cell in game records) and
+# built variants are kept, up to MAX_VARIANTS of them.
+MAX_VARIANTS = 64
+
+# Protocol: one JSON object per line in each direction.
+#   client -> server  {"op": "join", "variant": "7x7:4:5"}   variant optional
+#                     {"op": "move", "row": 1, "col": 2}
+#                     {"op": "leave"}
+#   server -> client  {"type": "joined", "match": 3, "player": "X", "variant": {...}}
+#                     {"type": "start", "match": 3, "turn": "X"}
+#                     {"type": "diff", "seq": 1, "player": "X", "move": [1, 2],
+#                      "removed": [0, 0] or null, "turn": "O", "winner": null,
+#                      "result": null or "X" / "O" / "draw", "draw_reason": null}
+#                     {"type": "end", "winner": "O", "reason": "opponent_left"}
+#                     {"type": "error", "message": "..."}
+# A diff carries the placed piece and the piece that expired with it, which is
+# everything a client needs to keep its board in sync. Threefold repetition
+# or the move cap ends a match as a draw.
+
+
+def encode(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+
+def variant_info(variant):
+    return {
+        "name": variant.name,
+        "rows": variant.rows,
+        "cols": variant.cols,
+        "win_length": variant.win_length,
+        "max_pieces": variant.max_pieces,
+    }
+
+
+def variant_from_info(info):
+    return Variant(info["rows"], info["cols"], info["win_length"], info["max_pieces"])
+
+
+class Match:
+    __slots__ = ("id", "session", "players", "seq", "cells")
+
+    def __init__(self, match_id, variant, max_moves=DEFAULT_MAX_MOVES):
+        self.id = match_id
+        self.session = GameSession(variant=variant, max_moves=max_moves)
+        self.players = [None, None]
+        self.seq = 0
+        self.cells = bytearray()
+
+
+class Connection:
+    __slots__ = ("writer", "match", "player")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.match = None
+        self.player = None
+
+    def send(self, message):
+        self.writer.write(encode(message))
+
+
+class GameServer:
+    # Owns every match on one event loop. Players are paired in join order
+    # per variant; the first to join plays X.
+    def __init__(self, variant=DEFAULT_VARIANT, recorder=None, max_moves=DEFAULT_MAX_MOVES):
+        self.variant = variant
+        self.recorder = recorder
+        self.max_moves = max_moves
+        self.matches = {}
+        self.waiting = {}
+        self.variants = {variant.key(): variant}
+        self.ids = itertools.count(1)
+        self.connections = 0
+        self.moves = 0
+        self.games = 0
+        self.handlers = {"join": self.join, "move": self.move, "leave": self.leave}
+
+    async def handle(self, reader, writer):
+        conn = Connection(writer)
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    conn.send({"type": "error", "message": "line too long"})
+                    break
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    handler = self.handlers[message["op"]]
+                except (ValueError, KeyError, TypeError):
+                    conn.send({"type": "error", "message": "bad request"})
+                else:
+                    handler(conn, message)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.leave(conn)
+            self.connections -= 1
+            writer.close()
+
+    def join(self, conn, message):
+        if conn.match is not None:
+            conn.send({"type": "error", "message": "already in a match"})
+            return
+        try:
+            variant = self.lookup_variant(message["variant"]) if message.get("variant") else self.variant
+        except (ValueError, TypeError) as e:
+            conn.send({"type": "error", "message": f"bad variant: {e}"})
+            return
+
+        match = self.waiting.pop(variant, None)
+        if match is None:
+            match = Match(next(self.ids), variant, self.max_moves)
+            self.matches[match.id] = match
+            self.waiting[variant] = match
+            side = 0
+        else:
+            side = 1
+        match.players[side] = conn
+        conn.match = match
+        conn.player = PLAYERS[side]
+        conn.send({"type": "joined", "match": match.id, "player": conn.player, "variant": variant_info(variant)})
+        if side == 1:
+            for player in match.players:
+                player.send({"type": "start", "match": match.id, "turn": match.session.player})
+
+    def lookup_variant(self, spec):
+        if not isinstance(spec, str):
+            raise ValueError("expected a string like '7x7:4:5'")
+        key = parse_spec(spec)
+        variant = self.variants.get(key)
+        if variant is None:
+            rows, cols = key[0], key[1]
+            if rows * cols > MAX_CELLS:
+                raise ValueError(f"{rows}x{cols} is over the {MAX_CELLS}-cell limit")
+            if len(self.variants) >= MAX_VARIANTS:
+                del self.variants[next(iter(self.variants))]
+            variant = self.variants[key] = Variant(*key)
+        return variant
+
+    def move(self, conn, message):
+        match = conn.match
+        if match is None or match.players[1] is None:
+            conn.send({"type": "error", "message": "no game in progress"})
+            return
+        session = match.session
+        if session.player != conn.player:
+            conn.send({"type": "error", "message": "not your turn"})
+            return
+        try:
+            row, col = int(message["row"]), int(message["col"])
+        except (KeyError, TypeError, ValueError):
+            conn.send({"type": "error", "message": "bad move"})
+            return
+
+        removed = None
+        if len(session.positions(conn.player)) == session.variant.max_pieces:
+            removed = session.oldest(conn.player)
+        if not session.make_move(row, col):
+            conn.send({"type": "error", "message": "illegal move"})
+            return
+
+        match.seq += 1
+        match.cells.append(session.last_cell)
+        self.moves += 1
+        diff = {
+            "type": "diff",
+            "seq": match.seq,
+            "player": conn.player,
+            "move": [row, col],
+            "removed": list(removed) if removed else None,
+            "turn": session.player,
+            "winner": session.winner,
+            "result": session.result,
+            "draw_reason": session.draw_reason,
+        }
+        for player in match.players:
+            player.send(diff)
+        if session.game_over:
+            self.finish(match, session.result)
+
+    def leave(self, conn, message=None):
+        match = conn.match
+        if match is None:
+            return
+        if self.waiting.get(match.session.variant) is match:
+            del self.waiting[match.session.variant]
+            self.matches.pop(match.id, None)
+            conn.match = None
+            return
+        opponent = match.players[PLAYERS.index(other_player(conn.player))]
+        if opponent is not None:
+            opponent.send({"type": "end", "winner": opponent.player, "reason": "opponent_left"})
+        self.finish(match, None)
+
+    def finish(self, match, result):
+        self.matches.pop(match.id, None)
+        for player in match.players:
+            if player is not None:
+                player.match = None
+        self.games += 1
+        if self.recorder and self.recorder.variant == match.session.variant:
+            self.recorder.write_game(match.cells, result or "abandoned")
+
+    def stats(self):
+        return {
+            "connections": self.connections,
+            "matches": len(self.matches),
+            "games": self.games,
+            "moves": self.moves,
+        }
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, variant=DEFAULT_VARIANT, recorder=None, stats_interval=0,
+                max_moves=DEFAULT_MAX_MOVES):
+    game_server = GameServer(variant, recorder, max_moves)
+    server = await asyncio.start_server(game_server.handle, host, port, limit=MAX_LINE)
+    address = server.sockets[0].getsockname()
+    print(f"[server] listening on {address[0]}:{address[1]}", flush=True)
+    async with server:
+        reporter = asyncio.create_task(report_stats(game_server, stats_interval)) if stats_interval else None
+        try:
+            await server.serve_forever()
+        finally:
+            if reporter:
+                reporter.cancel()
+
+
+async def report_stats(game_server, interval):
+    while True:
+        await asyncio.sleep(interval)
+        print(f"[server] {game_server.stats()}", flush=True)
+
+
+class NetworkClient:
+    # Blocking client for front ends that do not run an asyncio loop. Server
+    # messages are handed to on_message from a daemon reader thread, followed
+    # by {"type": "disconnected"} when the connection closes.
+    def __init__(self, host, port, on_message):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.on_message = on_message
+        self.lock = threading.Lock()
+        threading.Thread(target=self.read_loop, daemon=True).start()
+
+    def read_loop(self):
+        try:
+            for line in self.sock.makefile("rb"):
+                self.on_message(json.loads(line))
+        except (OSError, ValueError):
+            pass
+        self.on_message({"type": "disconnected"})
+
+    def send(self, message):
+        with self.lock:
+            self.sock.sendall(encode(message))
+
+    def join(self, variant=None):
+        self.send({"op": "join", "variant": variant})
+
+    def move(self, row, col):
+        self.send({"op": "move", "row": row, "col": col})
+
+    def close(self):
+        try:
+            self.send({"op": "leave"})
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Line-delimited JSON game server.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="0 picks a free port")
+    parser.add_argument("--variant", type=parse_variant, default=DEFAULT_VARIANT,
+                        help="default board as ROWSxCOLS[:K[:PIECES]]")
+    parser.add_argument("-r", "--record", help="append finished games of the default variant to this game record")
+    parser.add_argument("--stats", type=float, default=0, help="print server stats every N seconds")
+    parser.add_argument("--max-moves", type=int, default=DEFAULT_MAX_MOVES, help="moves before a match is a draw")
+    args = parser.parse_args(argv)
+
+    recorder = RecordWriter(args.record, args.variant) if args.record else None
+    try:
+        asyncio.run(serve(args.host, args.port, args.variant, recorder, args.stats, args.max_moves))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if recorder:
+            recorder.close()
+
+
+if __name__ == "__main__":
+    main()
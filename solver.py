@@ -0,0 +1,177 @@
+import mmap
+import os
+import struct
+import sys
+from collections import deque
+
+from bitboard import (
+    CELLS, MAX_PIECES, BOARD_COLS, EMPTY_STATE, QUEUE_SHIFT, SIDE_SHIFT, SLOT_BITS, SLOT_MASK,
+    empty_mask, iter_cells, play,
+)
+
+RADIX = CELLS + 1
+TABLE_SIZE = RADIX ** (2 * MAX_PIECES) * 2
+
+MAGIC = b"TTTR"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+
+UNKNOWN, WIN, LOSS, DRAW = 0, 1, 2, 3
+VALUE_NAMES = {UNKNOWN: "unknown", WIN: "win", LOSS: "loss", DRAW: "draw"}
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perfect_play.tbl")
+
+
+def state_index(state):
+    queues = state >> QUEUE_SHIFT
+    index = 0
+    for slot in range(2 * MAX_PIECES):
+        index = index * RADIX + (queues >> (slot * SLOT_BITS) & SLOT_MASK)
+    return index * 2 + (state >> SIDE_SHIFT)
+
+
+def successors(state):
+    for cell in iter_cells(empty_mask(state)):
+        child, won = play(state, cell)
+        yield cell, child, won
+
+
+def solve_graph():
+    # Retrograde analysis of every reachable position. Returns the move lists,
+    # the WIN/LOSS value and distance to the end of every decided position
+    # (the rest are draws) and the set of positions where the game is over.
+    start = EMPTY_STATE
+    children = {}
+    parents = {start: []}
+    terminal = set()
+    frontier = deque([start])
+    while frontier:
+        state = frontier.popleft()
+        moves = []
+        for cell, child, won in successors(state):
+            moves.append((cell, child))
+            if child not in parents:
+                parents[child] = []
+                if won:
+                    terminal.add(child)
+                else:
+                    frontier.append(child)
+            parents[child].append(state)
+        children[state] = moves
+
+    value = {}
+    depth = {}
+    remaining = {state: len(moves) for state, moves in children.items()}
+    queue = deque()
+    for state in terminal:
+        value[state] = LOSS
+        depth[state] = 0
+        queue.append(state)
+
+    while queue:
+        state = queue.popleft()
+        for parent in parents[state]:
+            if parent in value:
+                continue
+            if value[state] == LOSS:
+                value[parent] = WIN
+                depth[parent] = depth[state] + 1
+                queue.append(parent)
+            else:
+                remaining[parent] -= 1
+                if remaining[parent] == 0:
+                    value[parent] = LOSS
+                    depth[parent] = depth[state] + 1
+                    queue.append(parent)
+    return children, value, depth, terminal
+
+
+def optimal_cells(moves, result, value, depth):
+    # Every move that keeps the game value: the wins, the draws, or, when
+    # lost, the moves that hold out longest.
+    if result == WIN:
+        return [cell for cell, child in moves if value.get(child) == LOSS]
+    if result == DRAW:
+        return [cell for cell, child in moves if value.get(child, DRAW) == DRAW]
+    longest = max(depth[child] for cell, child in moves)
+    return [cell for cell, child in moves if depth[child] == longest]
+
+
+def labeled_positions():
+    # (state, WIN/LOSS/DRAW for the side to move, optimal cells) for every
+    # position that is still being played, as training labels.
+    children, value, depth, terminal = solve_graph()
+    for state, moves in children.items():
+        if moves:
+            result = value.get(state, DRAW)
+            yield state, result, optimal_cells(moves, result, value, depth)
+
+
+def solve():
+    children, value, depth, terminal = solve_graph()
+    table = bytearray(TABLE_SIZE)
+    for state, moves in children.items():
+        result = value.get(state, DRAW)
+        best = None
+        if result == WIN:
+            best = min(
+                (depth[child], cell) for cell, child in moves if value.get(child) == LOSS
+            )[1]
+        elif result == LOSS:
+            best = max(
+                (depth[child], -cell) for cell, child in moves if value.get(child) == WIN
+            )
+            best = -best[1]
+        else:
+            best = next(cell for cell, child in moves if value.get(child, DRAW) == DRAW)
+        table[state_index(state)] = result | ((best + 1) << 2)
+    for state in terminal:
+        table[state_index(state)] = LOSS
+    return table
+
+
+def write_table(path=DEFAULT_TABLE_PATH):
+    table = solve()
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, CELLS, len(table)))
+        f.write(table)
+    return len(table)
+
+
+class PerfectPlayTable:
+    def __init__(self, path=DEFAULT_TABLE_PATH):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, cells, size = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION or cells != CELLS or size != TABLE_SIZE:
+            self.close()
+            raise ValueError(f"{path} is not a compatible perfect-play table")
+
+    def lookup(self, session):
+        entry = self.data[HEADER.size + state_index(session.state)]
+        cell = (entry >> 2) - 1
+        move = divmod(cell, BOARD_COLS) if cell >= 0 else None
+        return entry & 3, move
+
+    def best_move(self, session):
+        return self.lookup(session)[1]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def load_table(path=DEFAULT_TABLE_PATH):
+    if not os.path.exists(path):
+        return None
+    try:
+        return PerfectPlayTable(path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Perfect-play table unavailable: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TABLE_PATH
+    size = write_table(path)
+    print(f"Wrote {size} entries to {path}")
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_worker import CancelEvent
+from strategies import preferred_cells
+
+DEFAULT_WORKERS = 2
+DEFAULT_MOVES = 9
+
+
+def likely_moves(game, limit=DEFAULT_MOVES):
+    # The human's candidate moves, most likely first: blocks of the AI's
+    # winning cells, then the usual centre/corner/edge preference. Moves that
+    # win outright need no reply and are left out.
+    variant = game.variant
+    state = game.state
+    side = variant.side_to_move(state)
+    wins = set(variant.winning_cells(state, side))
+    blocks = [cell for cell in variant.winning_cells(state, 1 - side) if cell not in wins]
+    empty = variant.empty_mask(state)
+    ordered = blocks + [cell for cell in preferred_cells(variant) if empty >> cell & 1 and cell not in wins]
+    moves = []
+    for cell in ordered:
+        if cell not in moves:
+            moves.append(cell)
+    return [variant.cell_position(cell) for cell in moves[:limit]]
+
+
+class Speculator:
+    # While the human thinks, computes the AI's reply to each of their likely
+    # moves on a small thread pool (max_workers is the concurrency cap). When
+    # the human moves, take() hands over the matching future, finished or
+    # still running, and the rest are dropped: queued ones never start and
+    # running ones have their `cancelled` event set, so move_fn(game,
+    # cancelled) can give up early.
+    def __init__(self, move_fn, max_workers=DEFAULT_WORKERS, max_moves=DEFAULT_MOVES):
+        self.move_fn = move_fn
+        self.max_moves = max_moves
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="speculate")
+        self.pending = {}
+        self.hits = 0
+        self.ready_hits = 0
+        self.misses = 0
+        self.wasted = 0
+
+    def start(self, game, max_moves=None):
+        self.discard()
+        for row, col in likely_moves(game, max_moves or self.max_moves):
+            child = game.copy()
+            child.make_move(row, col)
+            cancelled = CancelEvent()
+            self.pending[child.state] = self.executor.submit(self.move_fn, child.copy(), cancelled), cancelled
+
+    def take(self, game):
+        future, _ = self.pending.pop(game.state, (None, None))
+        if future is not None and future.cancel():
+            # Still queued behind other guesses; a fresh request is faster.
+            future = None
+        if future is None:
+            if self.pending:
+                self.misses += 1
+        else:
+            self.hits += 1
+            if future.done():
+                self.ready_hits += 1
+        self.discard()
+        return future
+
+    def discard(self):
+        for future, cancelled in self.pending.values():
+            cancelled.set()
+            if not future.cancel():
+                self.wasted += 1
+        self.pending.clear()
+
+    def close(self):
+        self.discard()
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        taken = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "ready_hits": self.ready_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / taken if taken else 0.0,
+            "wasted": self.wasted,
+        }
@@ -0,0 +1,100 @@
+import random
+
+from ai_session import build_prompt, parse_move
+from bitboard import DEFAULT_VARIANT
+from llm_stub import StubLLM
+from mcts import MCTSEngine
+from search import AlphaBetaEngine
+from solver import load_table
+
+_preferred_cells = {}
+
+
+def preferred_cells(variant):
+    cells = _preferred_cells.get(variant)
+    if cells is None:
+        cells = _preferred_cells[variant] = [variant.cell_index(row, col) for row, col in variant.preferred_cells()]
+    return cells
+
+
+def fallback_move(game):
+    variant = game.variant
+    state = game.state
+    side = variant.side_to_move(state)
+    for candidate in (side, 1 - side):
+        cells = variant.winning_cells(state, candidate)
+        if cells:
+            return variant.cell_position(cells[0])
+
+    empty = variant.empty_mask(state)
+    for cell in preferred_cells(variant):
+        if empty >> cell & 1:
+            return variant.cell_position(cell)
+
+    return None
+
+
+def random_strategy(seed=None, variant=DEFAULT_VARIANT):
+    rng = random.Random(seed)
+
+    def move(game):
+        return rng.choice(game.empty_cells())
+    return move
+
+
+def fallback_strategy(seed=None, variant=DEFAULT_VARIANT):
+    return fallback_move
+
+
+def perfect_strategy(seed=None, variant=DEFAULT_VARIANT):
+    if variant != DEFAULT_VARIANT:
+        raise ValueError(f"the perfect-play table only covers {DEFAULT_VARIANT.name}, not {variant.name}")
+    table = load_table()
+    if table is None:
+        raise ValueError("perfect-play table not found, build it with: python solver.py")
+    return table.best_move
+
+
+def alphabeta_strategy(seed=None, variant=DEFAULT_VARIANT):
+    return AlphaBetaEngine(variant, seed=seed or 0).best_move
+
+
+def mcts_strategy(seed=None, variant=DEFAULT_VARIANT):
+    return MCTSEngine(variant, seed=seed).best_move
+
+
+def net_strategy(seed=None, variant=DEFAULT_VARIANT):
+    # Imported here so NumPy is only loaded when the network plays.
+    from policy_net import DEFAULT_NET_PATH, load_net
+
+    net = load_net(DEFAULT_NET_PATH, variant)
+    if net is None:
+        raise ValueError("no policy network for this variant, train one with: python policy_net.py build && python policy_net.py train")
+    return net.best_move
+
+
+def llm_stub_strategy(seed=None, variant=DEFAULT_VARIANT, latency=0.0):
+    llm = StubLLM(latency=latency)
+
+    def move(game):
+        return parse_move(llm.complete(build_prompt(game)))
+    return move
+
+
+STRATEGIES = {
+    "random": random_strategy,
+    "fallback": fallback_strategy,
+    "perfect": perfect_strategy,
+    "alphabeta": alphabeta_strategy,
+    "mcts": mcts_strategy,
+    "net": net_strategy,
+    "llm-stub": llm_stub_strategy,
+}
+
+
+def make_strategy(name, seed=None, variant=DEFAULT_VARIANT):
+    try:
+        factory = STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"unknown strategy {name!r}, choose from: {', '.join(STRATEGIES)}") from None
+    return factory(seed, variant)
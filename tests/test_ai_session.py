@@ -0,0 +1,12 @@
+from ai_session import EXPECTED_OUTPUT, MOVE_PROMPT, build_prompt, parse_move, prompt_inputs
+from bitboard import Variant
+from game_engine import GameSession
+
+
+def test_templates_interpolate_with_str_format():
+    # Older CrewAI versions fill task templates with str.format().
+    game = GameSession(variant=Variant(4, 4, 3, 3))
+    inputs = prompt_inputs(game)
+    assert MOVE_PROMPT.format(**inputs) == build_prompt(game)
+    assert '{ "row": <0-3>, "col": <0-3> }' in build_prompt(game)
+    assert parse_move(EXPECTED_OUTPUT.format(**inputs)) == (0, 2)
@@ -0,0 +1,105 @@
+import time
+
+from ai_worker import AITurn, CancelEvent, MoveRace
+from game_engine import GameSession
+from llm_stream import StreamingSession
+from llm_stub import StubLLM, StubStreamServer
+
+
+def delayed(move, delay):
+    def provider(game, cancelled):
+        if cancelled.wait(delay):
+            return None
+        return move
+    return provider
+
+
+def test_preferred_provider_wins_when_it_answers_in_time():
+    race = MoveRace([("llm", delayed((0, 0), 0.05)), ("search", delayed((1, 1), 0))], target=1)
+    assert race(GameSession()) == (0, 0)
+    assert race.stats()["wins"] == {"llm": 1, "search": 0}
+
+
+def test_target_hands_the_move_to_the_fastest_legal_answer():
+    race = MoveRace([("llm", delayed((0, 0), 5)), ("search", delayed((1, 1), 0))], target=0.1)
+    started = time.perf_counter()
+    assert race(GameSession()) == (1, 1)
+    assert time.perf_counter() - started < 1
+    assert race.stats()["decided_by_target"] == 1
+
+
+def test_illegal_answers_never_win():
+    game = GameSession()
+    game.make_move(1, 1)
+    race = MoveRace([("llm", delayed((1, 1), 0)), ("search", delayed((0, 0), 0.05))], target=1)
+    assert race(game) == (0, 0)
+
+
+def test_callbacks_run_once_and_late_ones_run_at_once():
+    calls = []
+    cancelled = CancelEvent()
+    cancelled.on_set(lambda: calls.append("early"))
+    cancelled.set()
+    cancelled.set()
+    cancelled.on_set(lambda: calls.append("late"))
+    assert calls == ["early", "late"]
+
+
+def test_race_cancels_a_stalled_stream():
+    server = StubStreamServer(StubLLM(), token_delay=0, first_token_delay=3).start()
+    try:
+        session = StreamingSession(server.url, constrained=False, timeout=30)
+        race = MoveRace([("llm", session.get_move), ("search", delayed((0, 0), 0))], target=0.1)
+        started = time.perf_counter()
+        assert race(GameSession()) == (0, 0)
+        deadline = time.perf_counter() + 1
+        while session.cancelled == 0 and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        assert time.perf_counter() - started < 1.5
+        stats = session.stats()
+        assert (stats["cancelled"], stats["moves"], stats["invalid_replies"]) == (1, 0, 0)
+    finally:
+        server.close()
+
+
+def poll_until_done(turn, limit=2):
+    deadline = time.perf_counter() + limit
+    longest = 0.0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        move = turn.poll()
+        longest = max(longest, time.perf_counter() - started)
+        if move:
+            return move, longest
+        time.sleep(0.005)
+    return None, longest
+
+
+def slow_fallback(game):
+    time.sleep(0.2)
+    return (2, 2)
+
+
+def test_illegal_answer_falls_back_without_blocking_poll():
+    game = GameSession()
+    game.make_move(1, 1)
+    turn = AITurn(lambda game: (1, 1), slow_fallback, game, deadline=5, min_delay=0)
+    move, longest = poll_until_done(turn)
+    assert move == (2, 2) and turn.used_fallback
+    assert longest < 0.05
+
+
+def test_deadline_falls_back_without_blocking_poll():
+    turn = AITurn(lambda game: time.sleep(5), slow_fallback, GameSession(), deadline=0.05, min_delay=0)
+    move, longest = poll_until_done(turn)
+    assert move == (2, 2) and turn.used_fallback
+    assert longest < 0.05
+
+
+def test_failed_fallback_still_ends_the_turn():
+    def broken(game):
+        raise RuntimeError("no engine")
+
+    turn = AITurn(lambda game: None, broken, GameSession(), deadline=5, min_delay=0)
+    move, _ = poll_until_done(turn)
+    assert move is not None and GameSession().is_valid_move(*move)
@@ -0,0 +1,24 @@
+import random
+
+import pytest
+
+from bitboard import parse_variant
+from game_engine import GameSession
+from strategies import fallback_move
+
+
+@pytest.mark.parametrize("spec", ["3x3:3:5", "2x2:2:2", "0x0", "3x0:1:1", "3x3:0:1"])
+def test_boards_that_can_fill_up_or_do_not_exist_are_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_variant(spec)
+
+
+def test_the_tightest_board_always_leaves_a_move():
+    # 3x3 with 4 pieces each: eight pieces on nine cells.
+    rng = random.Random(3)
+    game = GameSession(variant=parse_variant("3x3:3:4"))
+    for _ in range(200):
+        if game.game_over:
+            game.reset()
+        assert game.empty_cells() and fallback_move(game)
+        game.make_move(*rng.choice(game.empty_cells()))
@@ -0,0 +1,68 @@
+from game_engine import GameSession
+from strategies import fallback_move
+
+OPENING = [(1, 1), (0, 0), (2, 2), (0, 2), (0, 1), (2, 0)]
+
+
+def self_play(game):
+    # The rule-based engine against itself cycles until threefold repetition.
+    moves = []
+    while not game.game_over:
+        moves.append(fallback_move(game))
+        game.make_move(*moves[-1])
+    return moves
+
+
+def test_undo_restores_the_expired_piece_and_counts():
+    game = GameSession()
+    for move in OPENING:
+        game.make_move(*move)
+    before = (game.state, game.last_cell, dict(game.seen))
+    game.make_move(1, 0)
+    assert game.undo() == (1, 0)
+    assert (game.state, game.last_cell, game.seen) == before
+    while game.can_undo():
+        game.undo()
+    assert game.state == GameSession().state and game.last_cell is None
+
+
+def test_self_play_ends_in_repetition():
+    game = GameSession()
+    self_play(game)
+    assert game.result == "draw" and game.draw_reason == "repetition"
+
+
+def test_copies_keep_their_own_position_counts():
+    game = GameSession()
+    moves = self_play(game)
+    game.undo()
+    counts = dict(game.seen)
+    clone = game.copy()
+    clone.make_move(*moves[-1])
+    assert clone.draw_reason == "repetition"
+    assert not game.game_over
+
+    # Moves and takebacks on the copy leave the original's counts alone.
+    clone.undo()
+    clone.undo()
+    assert game.seen == counts
+    assert game.make_move(*moves[-1]) and game.draw_reason == "repetition"
+
+
+def test_copies_share_takebacks():
+    game = GameSession()
+    for move in OPENING:
+        game.make_move(*move)
+    clone = game.copy()
+    assert clone.undo() == OPENING[-1]
+    assert game.last_cell == clone.variant.cell_index(*OPENING[-1])
+
+
+def test_move_cap():
+    game = GameSession(max_moves=len(OPENING))
+    for move in OPENING:
+        game.make_move(*move)
+    assert game.draw_reason == "move limit"
+    game = GameSession(max_moves=0)
+    self_play(game)
+    assert game.draw_reason == "repetition"
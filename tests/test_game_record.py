@@ -0,0 +1,70 @@
+from bitboard import Variant
+from game_record import RecordReader, RecordWriter, load_replay
+
+
+def test_consecutive_undos_remove_one_move_each(tmp_path):
+    path = str(tmp_path / "games.ttr")
+    writer = RecordWriter(path, Variant())
+    for cell in (4, 0, 8, 2):
+        writer.move(cell)
+    writer.undo()
+    writer.undo()
+    writer.move(1)
+    writer.end_game("draw")
+    writer.close()
+
+    with RecordReader(path) as reader:
+        games = [(list(game.cells), game.result) for game in reader]
+    assert games == [([4, 0, 1], "draw")]
+
+
+def test_undo_stops_at_the_start_of_the_game(tmp_path):
+    path = str(tmp_path / "games.ttr")
+    writer = RecordWriter(path, Variant())
+    writer.move(4)
+    writer.end_game("X")
+    writer.move(0)
+    writer.undo()
+    writer.undo()
+    writer.move(8)
+    writer.end_game("O")
+    writer.close()
+
+    with RecordReader(path) as reader:
+        games = [(list(game.cells), game.result) for game in reader]
+    assert games == [([4], "X"), ([8], "O")]
+
+
+def test_replay_reads_games_from_the_end_on_demand(tmp_path):
+    path = str(tmp_path / "games.ttr")
+    writer = RecordWriter(path, Variant())
+    games = [([4, 0, 8], "X"), ([], "abandoned"), ([1, 2], "draw"), ([5], "O")]
+    for cells, result in games:
+        writer.write_game(cells, result)
+    writer.move(3)
+    writer.close()
+    games.append(([3], "unfinished"))
+
+    replay = load_replay(path)
+    assert replay.total == 5
+    assert (list(replay.game.cells), replay.game.result) == games[-1]
+    assert replay.move == 1
+    # Only the newest game has been looked for so far.
+    assert len(replay.starts) == 2
+
+    seen = []
+    for _ in range(len(games)):
+        seen.append((list(replay.game.cells), replay.game.result))
+        replay.switch(-1)
+    assert seen == games[::-1]
+    assert replay.game_index == 0
+    replay.switch(1)
+    assert (list(replay.game.cells), replay.game.result) == games[1]
+    assert replay.caption() == "Game 2/5  move 0/0  (abandoned)"
+    replay.close()
+
+
+def test_load_replay_skips_an_empty_record(tmp_path):
+    path = str(tmp_path / "games.ttr")
+    RecordWriter(path, Variant()).close()
+    assert load_replay(path) is None
@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from ai_worker import CancelEvent
+from game_engine import GameSession
+from llm_stream import MoveScanner, StreamingSession, move_schema
+from llm_stub import StubLLM, StubStreamServer
+
+
+def session_url(server, api):
+    return server.url if api == "ollama" else server.url + "/v1"
+
+
+def positions():
+    game = GameSession()
+    for move in ((1, 1), (0, 0), (2, 2), (0, 2), (0, 1), (2, 0), (1, 0)):
+        game.make_move(*move)
+        yield game.copy()
+
+
+@pytest.fixture
+def server():
+    # Every unconstrained answer is a mistake: an occupied cell or prose.
+    server = StubStreamServer(StubLLM(mistake_rate=1.0, seed=1), token_delay=0).start()
+    yield server
+    server.close()
+
+
+@pytest.mark.parametrize("api", ["ollama", "openai"])
+def test_constrained_replies_are_always_legal(server, api):
+    session = StreamingSession(session_url(server, api), api=api, constrained=True)
+    for game in positions():
+        move = session.get_move(game)
+        assert move is not None and game.is_valid_move(*move)
+    assert session.stats()["invalid_replies"] == 0
+
+
+@pytest.mark.parametrize("api", ["ollama", "openai"])
+def test_unconstrained_mistakes_are_rejected(server, api):
+    session = StreamingSession(session_url(server, api), api=api, constrained=False)
+    for game in positions():
+        move = session.get_move(game)
+        assert move is None or game.is_valid_move(*move)
+    assert session.stats()["invalid_replies"] > 0
+
+
+def test_openai_request_is_strict_and_has_no_root_any_of():
+    session = StreamingSession("http://unused/v1", api="openai")
+    game = GameSession()
+    body = json.loads(session.request("prompt", session.schema(game)).data)
+    json_schema = body["response_format"]["json_schema"]
+    assert json_schema["strict"] is True
+    assert "anyOf" not in json_schema["schema"]
+    assert json_schema["schema"]["properties"]["cell"]["enum"] == list(range(9))
+
+
+def test_stub_refuses_strict_root_any_of(server):
+    body = {
+        "model": "stub",
+        "messages": [{"role": "user", "content": "prompt"}],
+        "stream": True,
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": "move", "strict": True, "schema": move_schema(GameSession())},
+        },
+    }
+    request = urllib.request.Request(server.url + "/v1/chat/completions", data=json.dumps(body).encode())
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(request, timeout=5)
+    assert error.value.code == 400
+
+
+def test_early_stop_closes_the_stream():
+    server = StubStreamServer(StubLLM(), token_delay=0.002).start()
+    try:
+        session = StreamingSession(server.url, constrained=False)
+        assert session.get_move(GameSession()) == (1, 1)
+        assert session.stats()["stopped_early"] == 1
+    finally:
+        server.close()
+
+
+def test_scanner_reads_cells_and_split_objects():
+    scanner = MoveScanner(cols=3)
+    assert scanner.feed('text {"ro') == []
+    assert scanner.feed('w": 2, "col": 1} and {"cell": 5}') == [(2, 1), (1, 2)]
+
+
+@pytest.mark.parametrize("stall", ["first_token", "between_chunks"])
+def test_cancel_interrupts_a_stalled_request(stall):
+    if stall == "first_token":
+        server = StubStreamServer(StubLLM(), token_delay=0, first_token_delay=3).start()
+    else:
+        server = StubStreamServer(StubLLM(), token_delay=3).start()
+    try:
+        session = StreamingSession(server.url, constrained=False, timeout=30)
+        cancelled = CancelEvent()
+        threading.Timer(0.2, cancelled.set).start()
+        started = time.perf_counter()
+        assert session.get_move(GameSession(), cancelled) is None
+        assert time.perf_counter() - started < 1.5
+        stats = session.stats()
+        assert (stats["cancelled"], stats["moves"], stats["invalid_replies"]) == (1, 0, 0)
+    finally:
+        server.close()
@@ -0,0 +1,55 @@
+import os
+import random
+import threading
+
+from game_engine import GameSession
+from move_cache import MoveCache
+
+
+def random_positions(count, seed):
+    rng = random.Random(seed)
+    positions = []
+    game = GameSession()
+    while len(positions) < count:
+        if game.game_over:
+            game.reset()
+        move = rng.choice(game.empty_cells())
+        positions.append((game.copy(), move))
+        game.make_move(*move)
+    return positions
+
+
+def test_puts_do_not_write_and_concurrent_saves_do_not_collide(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = MoveCache(path, save_delay=60)
+    errors = []
+
+    def worker(seed):
+        try:
+            for game, move in random_positions(200, seed):
+                cache.put(game, move)
+                if seed % 2:
+                    cache.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    cache.flush()
+    assert os.listdir(tmp_path) == ["cache.json"]
+    assert MoveCache(path).entries == cache.entries
+
+
+def test_put_saves_after_the_delay(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = MoveCache(path, save_delay=0.05)
+    game, move = random_positions(1, 0)[0]
+    cache.put(game, move)
+    timer = cache.timer
+    assert not os.path.exists(path)
+    timer.join(2)
+    assert MoveCache(path).get(game) == move
@@ -0,0 +1,47 @@
+import json
+import time
+
+from server import Connection, GameServer
+
+
+class Writer:
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+    def messages(self):
+        return [json.loads(line) for line in self.data.splitlines()]
+
+
+def join(server, variant):
+    conn = Connection(Writer())
+    server.join(conn, {"op": "join", "variant": variant})
+    return conn, conn.writer.messages()[-1]
+
+
+def test_bad_variants_get_an_error_reply():
+    server = GameServer()
+    for variant in (5, ["3x3"], "abc", "3x3:3:5"):
+        conn, reply = join(server, variant)
+        assert reply["type"] == "error" and conn.match is None
+
+
+def test_oversized_boards_are_refused_without_building_them():
+    server = GameServer()
+    started = time.perf_counter()
+    _, reply = join(server, "300x300:5:5")
+    assert reply["type"] == "error" and "limit" in reply["message"]
+    assert time.perf_counter() - started < 0.05
+
+
+def test_variants_are_built_once_and_players_paired():
+    server = GameServer()
+    first, reply = join(server, "7x7:4:5")
+    second, _ = join(server, "7X7:4:5")
+    third, _ = join(server, "7x7:4:5")
+    assert reply["type"] == "joined" and first.match is second.match
+    assert first.writer.messages()[-1]["type"] == "start"
+    assert third.match is not first.match
+    assert third.match.session.variant is first.match.session.variant
@@ -0,0 +1,44 @@
+import threading
+
+from game_engine import GameSession
+from speculation import Speculator
+from strategies import fallback_move
+
+
+def test_discard_cancels_running_guesses():
+    started = threading.Semaphore(0)
+    stopped = []
+
+    def move(game, cancelled):
+        started.release()
+        stopped.append(cancelled.wait(5))
+        return fallback_move(game)
+
+    speculator = Speculator(move, max_workers=2)
+    speculator.start(GameSession(), max_moves=2)
+    assert started.acquire(timeout=5) and started.acquire(timeout=5)
+    speculator.discard()
+    speculator.executor.shutdown(wait=True)
+    assert stopped == [True, True]
+    assert speculator.stats()["wasted"] == 2
+
+
+def test_take_keeps_the_matching_guess_running():
+    release = threading.Event()
+    seen = {}
+
+    def move(game, cancelled):
+        release.wait(5)
+        seen[game.state] = cancelled.is_set()
+        return fallback_move(game)
+
+    speculator = Speculator(move, max_workers=2)
+    game = GameSession()
+    speculator.start(game, max_moves=2)
+    game.make_move(1, 1)
+    future = speculator.take(game)
+    release.set()
+    assert future.result(5) is not None
+    speculator.executor.shutdown(wait=True)
+    assert seen[game.state] is False
+    assert list(seen.values()).count(True) == 1
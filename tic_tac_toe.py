@@ -1,244 +1,244 @@
+import time
+STARTED_AT = time.perf_counter()
+
+import atexit
 import pygame
 import sys
-from collections import deque
+from game_engine import GameSession, Variant
+from event_loop import EventLoop
+from game_record import DEFAULT_RECORD_PATH, load_replay, open_recorder
+from metrics import metrics
+from server import NetworkClient, variant_from_info
+from renderer import (
+    WIDTH, HEIGHT, Button, DebugHUD, Renderer, board_background, board_layout, board_sprites, centered,
+    render_text, titled_background,
+)
 
 pygame.init()
 
-WIDTH, HEIGHT = 600, 600
-LINE_WIDTH = 15
-BOARD_ROWS, BOARD_COLS = 3, 3
-SQUARE_SIZE = WIDTH // BOARD_COLS
-CIRCLE_RADIUS = SQUARE_SIZE // 3
-CIRCLE_WIDTH = 15
-CROSS_WIDTH = 25
-SPACE = SQUARE_SIZE // 4
-
-BG_COLOR = (28, 170, 156)
-LINE_COLOR = (23, 145, 135)
-CIRCLE_COLOR = (239, 231, 200)
-CROSS_COLOR = (66, 66, 66)
-FADED_CIRCLE_COLOR = (180, 175, 160)
-FADED_CROSS_COLOR = (150, 150, 150)
-MENU_BG_COLOR = (52, 152, 219)
-BUTTON_COLOR = (41, 128, 185)
-BUTTON_HOVER_COLOR = (26, 88, 126)
-TEXT_COLOR = (255, 255, 255)
-
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption('Advanced Tic Tac Toe')
+renderer = Renderer(screen)
 
-board = [[None for _ in range(BOARD_COLS)] for _ in range(BOARD_ROWS)]
-x_positions = deque()  
-o_positions = deque()  
-player = 'X'
-game_over = False
-winner = None
+EVENT_DRIVEN = True
+METRICS_EXPORT = None  # e.g. "metrics.prom" (Prometheus text) or "metrics.jsonl"
+VARIANT = Variant()  # e.g. Variant(7, 7, win_length=4, max_pieces=5)
+RECORD_PATH = DEFAULT_RECORD_PATH  # None disables game recording
+SERVER_ADDRESS = None  # e.g. ("127.0.0.1", 8765) to play remote matches through server.py
+NET_EVENT = pygame.USEREVENT + 1
+END_SCREEN_DELAY = 1000  # ms the final position stays up before the end screen
+
+session = GameSession(variant=VARIANT)
+layout = board_layout(VARIANT)
+recorder = open_recorder(RECORD_PATH, VARIANT) if RECORD_PATH else None
+replay = None
+client = None
+my_player = None
+end_reason = None
+end_screen_at = None
 game_state = "menu"   
 
 
 title_font = pygame.font.SysFont(None, 80)
 button_font = pygame.font.SysFont(None, 50)
 winner_font = pygame.font.SysFont(None, 70)
+hud_font = pygame.font.SysFont("monospace", 14)
+hint_font = pygame.font.SysFont(None, 28)
 
-class Button:
-    def __init__(self, x, y, width, height, text):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.text = text
-        self.is_hovered = False
-    
-    def draw(self):
-        color = BUTTON_HOVER_COLOR if self.is_hovered else BUTTON_COLOR
-        pygame.draw.rect(screen, color, self.rect, border_radius=10)
-        
-        text_surface = button_font.render(self.text, True, TEXT_COLOR)
-        text_rect = text_surface.get_rect(center=self.rect.center)
-        screen.blit(text_surface, text_rect)
-    
-    def check_hover(self, pos):
-        self.is_hovered = self.rect.collidepoint(pos)
-        return self.is_hovered
-    
-    def is_clicked(self, pos):
-        return self.rect.collidepoint(pos)
+renderer.hud = DebugHUD(hud_font)
+if METRICS_EXPORT:
+    atexit.register(metrics.export, METRICS_EXPORT)
+if recorder:
+    atexit.register(recorder.abandon)
 
-play_button = Button(WIDTH//4, HEIGHT//2, WIDTH//2, 70, "Play")
-exit_button = Button(WIDTH//4, HEIGHT//2 + 100, WIDTH//2, 70, "Exit")
+play_button = Button(WIDTH//4, HEIGHT//2, WIDTH//2, 70, "Play", button_font)
+exit_button = Button(WIDTH//4, HEIGHT//2 + 100, WIDTH//2, 70, "Exit", button_font)
 
-play_again_button = Button(WIDTH//4, HEIGHT//2 + 50, WIDTH//2, 70, "Play Again")
-menu_button = Button(WIDTH//4, HEIGHT//2 + 150, WIDTH//2, 70, "Main Menu")
+play_again_button = Button(WIDTH//4, HEIGHT//2 + 50, WIDTH//2, 70, "Play Again", button_font)
+menu_button = Button(WIDTH//4, HEIGHT//2 + 150, WIDTH//2, 70, "Main Menu", button_font)
 
-def draw_lines():
-    pygame.draw.line(screen, LINE_COLOR, (0, SQUARE_SIZE), (WIDTH, SQUARE_SIZE), LINE_WIDTH)
-    pygame.draw.line(screen, LINE_COLOR, (0, 2 * SQUARE_SIZE), (WIDTH, 2 * SQUARE_SIZE), LINE_WIDTH)
-    
-    pygame.draw.line(screen, LINE_COLOR, (SQUARE_SIZE, 0), (SQUARE_SIZE, HEIGHT), LINE_WIDTH)
-    pygame.draw.line(screen, LINE_COLOR, (2 * SQUARE_SIZE, 0), (2 * SQUARE_SIZE, HEIGHT), LINE_WIDTH)
+def record_move():
+    if recorder:
+        recorder.move(session.last_cell)
+        if session.game_over:
+            recorder.end_game(session.result)
 
-def draw_figures():
-    for row in range(BOARD_ROWS):
-        for col in range(BOARD_COLS):
-            if board[row][col] == 'X':
-                is_oldest_x = len(x_positions) >= 3 and (row, col) == x_positions[0]
-                
-                color = FADED_CROSS_COLOR if is_oldest_x else CROSS_COLOR
-                pygame.draw.line(
-                    screen, color,
-                    (col * SQUARE_SIZE + SPACE, row * SQUARE_SIZE + SPACE),
-                    ((col + 1) * SQUARE_SIZE - SPACE, (row + 1) * SQUARE_SIZE - SPACE),
-                    CROSS_WIDTH
-                )
-                pygame.draw.line(
-                    screen, color,
-                    ((col + 1) * SQUARE_SIZE - SPACE, row * SQUARE_SIZE + SPACE),
-                    (col * SQUARE_SIZE + SPACE, (row + 1) * SQUARE_SIZE - SPACE),
-                    CROSS_WIDTH
-                )
-            elif board[row][col] == 'O':
-                is_oldest_o = len(o_positions) >= 3 and (row, col) == o_positions[0]
-                
-                color = FADED_CIRCLE_COLOR if is_oldest_o else CIRCLE_COLOR
-                pygame.draw.circle(
-                    screen, color,
-                    (col * SQUARE_SIZE + SQUARE_SIZE // 2, row * SQUARE_SIZE + SQUARE_SIZE // 2),
-                    CIRCLE_RADIUS, CIRCLE_WIDTH
-                )
+def reset_game():
+    global end_screen_at
+    if recorder:
+        recorder.abandon()
+    session.reset()
+    end_screen_at = None
 
-def check_winner():
-    for row in range(BOARD_ROWS):
-        if board[row][0] == board[row][1] == board[row][2] and board[row][0]:
-            return board[row][0]
-    
-    for col in range(BOARD_COLS):
-        if board[0][col] == board[1][col] == board[2][col] and board[0][col]:
-            return board[0][col]
-    
-    if board[0][0] == board[1][1] == board[2][2] and board[0][0]:
-        return board[0][0]
-    if board[0][2] == board[1][1] == board[2][0] and board[0][2]:
-        return board[0][2]
-    
-    return None
+def undo_move():
+    if session.undo() and recorder:
+        recorder.undo()
 
-def draw_winning_line(winner):
-    for row in range(BOARD_ROWS):
-        if board[row][0] == board[row][1] == board[row][2] == winner:
-            y = row * SQUARE_SIZE + SQUARE_SIZE // 2
-            pygame.draw.line(
-                screen, (255, 0, 0), 
-                (15, y), (WIDTH - 15, y), 15
-            )
-            return
+def post_net_message(message):
+    pygame.event.post(pygame.event.Event(NET_EVENT, message=message))
+
+def start_network_game():
+    global client, game_state, end_reason
     
-    for col in range(BOARD_COLS):
-        if board[0][col] == board[1][col] == board[2][col] == winner:
-            x = col * SQUARE_SIZE + SQUARE_SIZE // 2
-            pygame.draw.line(
-                screen, (255, 0, 0), 
-                (x, 15), (x, HEIGHT - 15), 15
-            )
+    if client is None:
+        try:
+            client = NetworkClient(*SERVER_ADDRESS, post_net_message)
+        except OSError as e:
+            print(f"Could not connect to {SERVER_ADDRESS}: {e}")
             return
+    end_reason = None
+    client.join(VARIANT.spec)
+    game_state = "waiting"
+
+def stop_network_game():
+    global client
     
-    if board[0][0] == board[1][1] == board[2][2] == winner:
-        pygame.draw.line(
-            screen, (255, 0, 0), 
-            (15, 15), (WIDTH - 15, HEIGHT - 15), 15
-        )
-        return
-    
-    if board[0][2] == board[1][1] == board[2][0] == winner:
-        pygame.draw.line(
-            screen, (255, 0, 0), 
-            (WIDTH - 15, 15), (15, HEIGHT - 15), 15
-        )
-        return
+    if client:
+        client.close()
+        client = None
 
-def reset_game():
-    global board, player, game_over, winner, x_positions, o_positions
-    board = [[None for _ in range(BOARD_COLS)] for _ in range(BOARD_ROWS)]
-    x_positions = deque()
-    o_positions = deque()
-    player = 'X'
-    game_over = False
-    winner = None
-    screen.fill(BG_COLOR)
-    draw_lines()
+def handle_net_message(message):
+    global session, layout, my_player, game_state, end_reason, end_screen_at
+    
+    kind = message["type"]
+    if kind == "joined":
+        reset_game()
+        my_player = message["player"]
+        # Uncapped: the server's diffs decide when a remote game ends.
+        session = GameSession(variant=variant_from_info(message["variant"]), max_moves=0)
+        layout = board_layout(session.variant)
+    elif kind == "start":
+        game_state = "game"
+    elif kind == "diff":
+        # The server's result is final, whatever our own checks make of the
+        # move (its repetition and move-cap rules are the ones that count).
+        if session.make_move(*message["move"]):
+            result = message["result"]
+            session.game_over = result is not None
+            session.winner = result if result in ("X", "O") else None
+            session.draw_reason = message["draw_reason"]
+            record_move()
+            if session.game_over:
+                end_screen_at = pygame.time.get_ticks() + END_SCREEN_DELAY
+    elif kind == "end":
+        session.game_over = True
+        session.winner = message["winner"]
+        end_reason = message["reason"]
+        end_screen_at = None
+        game_state = "end_screen"
+    elif kind == "error":
+        print("Server error:", message["message"])
+    elif kind == "disconnected" and client:
+        print("Disconnected from server")
+        stop_network_game()
+        if game_state in ("waiting", "game"):
+            game_state = "menu"
 
 def make_move(row, col):
-    global player, board, game_state, game_over, winner
+    global end_screen_at
     
-    if board[row][col] is None and not game_over:
-        if player == 'X':
-            if len(x_positions) >= 3:
-                old_row, old_col = x_positions.popleft()
-                board[old_row][old_col] = None
-            x_positions.append((row, col))
-        else:  
-            if len(o_positions) >= 3:
-                old_row, old_col = o_positions.popleft()
-                board[old_row][old_col] = None
-            o_positions.append((row, col))
-        
-        board[row][col] = player
-        
-        result = check_winner()
-        if result:
-            game_over = True
-            winner = result
-            draw_board()
-            pygame.display.update()
-            pygame.time.delay(1000) 
-            game_state = "end_screen"
-            return
-        
-        player = 'O' if player == 'X' else 'X'
-        
-        draw_board()
+    if session.make_move(row, col):
+        record_move()
+        if session.game_over:
+            end_screen_at = pygame.time.get_ticks() + END_SCREEN_DELAY
 
 
 def draw_board():
-    screen.fill(BG_COLOR)
-    draw_lines()
-    draw_figures()
-    if game_over and winner:
-        draw_winning_line(winner)
+    renderer.present(board_background(session.variant), board_sprites(session))
+
+def draw_waiting():
+    renderer.present(titled_background(winner_font, "Waiting for opponent..."), {
+        "menu": menu_button.sprite(),
+    })
 
 def draw_menu():
-    screen.fill(MENU_BG_COLOR)
+    sprites = {
+        "play": play_button.sprite(),
+        "exit": exit_button.sprite(),
+    }
+    if RECORD_PATH:
+        sprites["replay_hint"] = centered(render_text(hint_font, "Press R to replay recorded games"), (WIDTH//2, HEIGHT - 20))
     
-    title_text = title_font.render("Advanced Tic Tac Toe", True, TEXT_COLOR)
-    title_rect = title_text.get_rect(center=(WIDTH//2, HEIGHT//4))
-    screen.blit(title_text, title_rect)
-    
-    play_button.draw()
-    exit_button.draw()
+    renderer.present(titled_background(title_font, "Advanced Tic Tac Toe"), sprites)
+
+def draw_replay():
+    sprites = board_sprites(replay.session)
+    sprites["caption"] = centered(render_text(hint_font, replay.caption()), (WIDTH//2, 20))
+    sprites["keys"] = centered(
+        render_text(hint_font, "Left/Right: step   Up/Down: game   Esc: menu"), (WIDTH//2, HEIGHT - 20)
+    )
+    renderer.present(board_background(replay.session.variant), sprites)
 
 def draw_end_screen():
-    screen.fill(MENU_BG_COLOR)
-    
-    if winner == 'X':
-        winner_text = winner_font.render("Player 1 Won!", True, TEXT_COLOR)
+    if client and session.winner == my_player:
+        winner_text = "Opponent Left - You Won!" if end_reason == "opponent_left" else "You Won!"
+    elif session.draw_reason:
+        winner_text = f"Draw by {session.draw_reason}!"
+    elif client:
+        winner_text = "You Lost!"
+    elif session.winner == 'X':
+        winner_text = "Player 1 Won!"
     else:
-        winner_text = winner_font.render("Player 2 Won!", True, TEXT_COLOR)
+        winner_text = "Player 2 Won!"
     
-    winner_rect = winner_text.get_rect(center=(WIDTH//2, HEIGHT//4))
-    screen.blit(winner_text, winner_rect)
-    
-    play_again_button.draw()
-    menu_button.draw()
+    renderer.present(titled_background(winner_font, winner_text), {
+        "play_again": play_again_button.sprite(),
+        "menu": menu_button.sprite(),
+    })
+
+event_loop = EventLoop(event_driven=EVENT_DRIVEN)
 
-clock = pygame.time.Clock()
+draw_menu()
+print(f"[startup] menu shown after {(time.perf_counter() - STARTED_AT) * 1000:.0f} ms")
 
 while True:
-    mouse_pos = pygame.mouse.get_pos()
+    animating = end_screen_at is not None or renderer.hud.visible
+    events = event_loop.events(animating)
+    update_started = time.perf_counter()
     
-    for event in pygame.event.get():
+    for event in events:
         if event.type == pygame.QUIT:
             pygame.quit()
             sys.exit()
         
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            renderer.hud.toggle()
+        
+        if event.type == NET_EVENT:
+            handle_net_message(event.message)
+        
+        if event.type == pygame.KEYDOWN:
+            if game_state == "menu" and event.key == pygame.K_r and RECORD_PATH:
+                replay = load_replay(RECORD_PATH)
+                if replay:
+                    game_state = "replay"
+            elif game_state == "game" and event.key in (pygame.K_u, pygame.K_BACKSPACE):
+                # Remote games are decided by the server, so no takebacks there.
+                if not client and not session.game_over:
+                    undo_move()
+            elif game_state == "replay":
+                if event.key == pygame.K_ESCAPE:
+                    replay.close()
+                    replay = None
+                    game_state = "menu"
+                elif event.key == pygame.K_LEFT:
+                    replay.step(-1)
+                elif event.key == pygame.K_RIGHT:
+                    replay.step(1)
+                elif event.key == pygame.K_UP:
+                    replay.switch(-1)
+                elif event.key == pygame.K_DOWN:
+                    replay.switch(1)
+                elif event.key == pygame.K_HOME:
+                    replay.seek(0)
+                elif event.key == pygame.K_END:
+                    replay.seek(len(replay.game))
+        
         if event.type == pygame.MOUSEBUTTONDOWN:
             if game_state == "menu":
-                if play_button.is_clicked(event.pos):
+                if play_button.is_clicked(event.pos) and SERVER_ADDRESS:
+                    start_network_game()
+                elif play_button.is_clicked(event.pos):
                     game_state = "game"
                     reset_game()
                 elif exit_button.is_clicked(event.pos):
@@ -246,36 +246,55 @@ while True:
                     sys.exit()
             
             elif game_state == "game":
-                if not game_over:
-                    mouseX = event.pos[0]
-                    mouseY = event.pos[1]
-                    
-                    clicked_row = mouseY // SQUARE_SIZE
-                    clicked_col = mouseX // SQUARE_SIZE
+                if not session.game_over:
+                    clicked = layout.cell_at(event.pos)
                     
-                    if 0 <= clicked_row < 3 and 0 <= clicked_col < 3:
-                        make_move(clicked_row, clicked_col)
+                    if clicked and client:
+                        if session.player == my_player:
+                            client.move(*clicked)
+                    elif clicked:
+                        make_move(*clicked)
+            
+            elif game_state == "waiting":
+                if menu_button.is_clicked(event.pos):
+                    stop_network_game()
+                    game_state = "menu"
             
             elif game_state == "end_screen":
-                if play_again_button.is_clicked(event.pos):
+                if play_again_button.is_clicked(event.pos) and client:
+                    start_network_game()
+                elif play_again_button.is_clicked(event.pos):
                     game_state = "game"
                     reset_game()
                 elif menu_button.is_clicked(event.pos):
+                    stop_network_game()
                     game_state = "menu"
     
+    if game_state == "game" and end_screen_at is not None and pygame.time.get_ticks() >= end_screen_at:
+        end_screen_at = None
+        game_state = "end_screen"
+    
+    mouse_pos = pygame.mouse.get_pos()
+    
     if game_state == "menu":
         play_button.check_hover(mouse_pos)
         exit_button.check_hover(mouse_pos)
     elif game_state == "end_screen":
         play_again_button.check_hover(mouse_pos)
         menu_button.check_hover(mouse_pos)
+    elif game_state == "waiting":
+        menu_button.check_hover(mouse_pos)
     
-    if game_state == "menu":
-        draw_menu()
-    elif game_state == "game":
-        draw_board()
-    elif game_state == "end_screen":
-        draw_end_screen()
+    metrics.record("frame.update", time.perf_counter() - update_started)
     
-    pygame.display.update()
-    clock.tick(60)  
\ No newline at end of file
+    with metrics.span("frame.render"):
+        if game_state == "menu":
+            draw_menu()
+        elif game_state == "game":
+            draw_board()
+        elif game_state == "end_screen":
+            draw_end_screen()
+        elif game_state == "replay":
+            draw_replay()
+        elif game_state == "waiting":
+            draw_waiting()  
\ No newline at end of file
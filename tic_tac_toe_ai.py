@@ -1,395 +1,379 @@
+import time
+STARTED_AT = time.perf_counter()
+
+import atexit
 import pygame
 import sys
-import json
-import re
-from collections import deque
-from crewai import Crew, Agent, Task
-from langchain.llms import Ollama
+from game_engine import DEFAULT_VARIANT, GameSession, Variant
+from event_loop import EventLoop
+from game_record import DEFAULT_RECORD_PATH, load_replay, open_recorder
+from metrics import metrics
+from renderer import (
+    WIDTH, HEIGHT, Button, DebugHUD, Renderer, board_background, board_layout, board_sprites, centered,
+    render_text, titled_background,
+)
+from solver import load_table
+from ai_worker import AITurn, MoveRace
+from speculation import Speculator
+from move_cache import MoveCache, cache_path
+from strategies import fallback_move
+from search import AlphaBetaEngine
+from mcts import MCTSEngine
+from ai_session import AILoader
+from llm_stream import StreamingSession
 import os
 
 pygame.init()
 
 KEY="OPENAI_API_KEY"
-WIDTH, HEIGHT = 600, 600
-LINE_WIDTH = 15
-BOARD_ROWS, BOARD_COLS = 3, 3
-SQUARE_SIZE = WIDTH // BOARD_COLS
-CIRCLE_RADIUS = SQUARE_SIZE // 3
-CIRCLE_WIDTH = 15
-CROSS_WIDTH = 25
-SPACE = SQUARE_SIZE // 4
-
-BG_COLOR = (28, 170, 156)
-LINE_COLOR = (23, 145, 135)
-CIRCLE_COLOR = (239, 231, 200)
-CROSS_COLOR = (66, 66, 66)
-FADED_CIRCLE_COLOR = (180, 175, 160)
-FADED_CROSS_COLOR = (150, 150, 150)
-MENU_BG_COLOR = (52, 152, 219)
-BUTTON_COLOR = (41, 128, 185)
-BUTTON_HOVER_COLOR = (26, 88, 126)
-TEXT_COLOR = (255, 255, 255)
+AI_MOVE_DEADLINE = 10.0
+AI_VERBOSE = False
+AI_MIN_THINK_TIME = 0.5
+# Stream moves straight from a local model server instead of going through
+# CrewAI, e.g. "http://localhost:11434" (Ollama) or "http://localhost:8000/v1"
+# with LLM_STREAM_API = "openai". `python llm_stub.py` serves canned answers.
+LLM_STREAM_URL = None
+LLM_STREAM_API = "ollama"
+LLM_STREAM_MODEL = "llama3.2"
+LLM_CONSTRAINED = True  # restrict the streamed reply to a JSON schema of the legal moves
+# Who answers the AI's moves; only that backend is loaded:
+#   "llm"    the model, through CrewAI or LLM_STREAM_URL
+#   "table"  the solved perfect-play table, classic board only (python solver.py)
+#   "net"    the local NumPy policy network, no model server
+#            (python policy_net.py build && python policy_net.py train)
+AI_OPPONENT = "llm"
+SEARCH_BUDGET_MS = 100
+SEARCH_ENGINE = "alphabeta"  # or "mcts"
+# Extra MCTS processes; the script has no __main__ guard, so keep this at 1
+# on platforms that spawn rather than fork.
+MCTS_WORKERS = 1
+# Race the streamed LLM (LLM_STREAM_URL) against the local search every turn.
+# The first provider in AI_RACE_ORDER that answers legally wins; after
+# AI_RACE_TARGET seconds the best answer so far is played and the LLM request
+# is cancelled. The CrewAI session cannot be cancelled, so it is never raced:
+# an abandoned kickoff would hold its lock and queue the next turns' calls.
+AI_RACE = True
+AI_RACE_TARGET = 2.0
+AI_RACE_ORDER = ("llm", "search")
+# Precompute the AI's replies to the human's likely moves while they think.
+SPECULATE = True
+SPECULATION_WORKERS = 2
+END_SCREEN_DELAY = 1000
+EVENT_DRIVEN = True
+METRICS_EXPORT = None  # e.g. "metrics.prom" (Prometheus text) or "metrics.jsonl"
+VARIANT = Variant()  # e.g. Variant(7, 7, win_length=4, max_pieces=5)
+RECORD_PATH = DEFAULT_RECORD_PATH  # None disables game recording
+AI_LOADED_EVENT = pygame.USEREVENT + 1
 
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption('Advanced Tic Tac Toe')
+renderer = Renderer(screen)
 os.environ["OPENAI_API_KEY"] = KEY
 
-board = [[None for _ in range(BOARD_COLS)] for _ in range(BOARD_ROWS)]
-x_positions = deque()  
-o_positions = deque()  
-player = 'X'
-game_over = False
-winner = None
+session = GameSession(variant=VARIANT)
+layout = board_layout(VARIANT)
+recorder = open_recorder(RECORD_PATH, VARIANT) if RECORD_PATH else None
+replay = None
 game_state = "menu"
 ai_mode = False  
-
-try:    
-    ai_agent = Agent(
-        role="Tic Tac Toe Strategist",
-        goal="Win or block the opponent using optimal strategy",
-        backstory="You're a master of Tic Tac Toe trained to think logically about each move.",
-        verbose=True,
-        allow_delegation=False,
-        llm="gpt-4o-mini",
-    )
-    ai_available = True
-except Exception as e:
-    print(f"AI initialization failed: {e}")
-    ai_available = False
+ai_turn = None
+end_screen_at = None
+perfect_play = None
+policy_network = None
+if AI_OPPONENT == "table":
+    # The solved table only covers the classic board.
+    perfect_play = load_table() if VARIANT == DEFAULT_VARIANT else None
+    if not perfect_play:
+        print("No perfect-play table for this board (run: python solver.py), using the LLM")
+elif AI_OPPONENT == "net":
+    from policy_net import load_net
+    policy_network = load_net(variant=VARIANT)
+    if not policy_network:
+        print("No policy network for this board (run: python policy_net.py train), using the LLM")
+elif AI_OPPONENT != "llm":
+    raise ValueError(f"unknown AI_OPPONENT {AI_OPPONENT!r}, expected 'llm', 'table' or 'net'")
+move_cache = MoveCache(cache_path(VARIANT), variant=VARIANT)
+atexit.register(move_cache.flush)
+if SEARCH_ENGINE == "mcts":
+    search_engine = MCTSEngine(VARIANT, budget_ms=SEARCH_BUDGET_MS, workers=MCTS_WORKERS)
+else:
+    search_engine = AlphaBetaEngine(VARIANT, budget_ms=SEARCH_BUDGET_MS)
+
+instant_ai = policy_network or perfect_play
+speculator = Speculator(
+    lambda game, cancelled: ai_move_fn()(game, cancelled), SPECULATION_WORKERS,
+) if SPECULATE and not instant_ai else None
+race_providers = {
+    "llm": lambda game, cancelled: get_ai_move(game, cancelled),
+    "search": lambda game, cancelled: get_fallback_ai_move(game, cancelled),
+}
+move_race = MoveRace(
+    [(name, race_providers[name]) for name in AI_RACE_ORDER], AI_RACE_TARGET,
+) if AI_RACE and LLM_STREAM_URL and not instant_ai else None
+
+ai_loader = AILoader(
+    verbose=AI_VERBOSE,
+    on_done=lambda loader: pygame.event.post(pygame.event.Event(AI_LOADED_EVENT)),
+    session_factory=(
+        lambda: StreamingSession(
+            LLM_STREAM_URL, LLM_STREAM_MODEL, LLM_STREAM_API, constrained=LLM_CONSTRAINED, verbose=AI_VERBOSE,
+        )
+    ) if LLM_STREAM_URL else None,
+)
 
 title_font = pygame.font.SysFont(None, 80)
 button_font = pygame.font.SysFont(None, 50)
 winner_font = pygame.font.SysFont(None, 70)
+hud_font = pygame.font.SysFont("monospace", 14)
+hint_font = pygame.font.SysFont(None, 28)
+
+renderer.hud = DebugHUD(hud_font)
+if METRICS_EXPORT:
+    atexit.register(metrics.export, METRICS_EXPORT)
+if recorder:
+    atexit.register(recorder.abandon)
+if speculator:
+    atexit.register(lambda: print("[speculation]", speculator.stats()))
+if move_race:
+    atexit.register(lambda: print("[race]", move_race.stats()))
 mode_font = pygame.font.SysFont(None, 40)
 
-class Button:
-    def __init__(self, x, y, width, height, text):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.text = text
-        self.is_hovered = False
-    
-    def draw(self):
-        color = BUTTON_HOVER_COLOR if self.is_hovered else BUTTON_COLOR
-        pygame.draw.rect(screen, color, self.rect, border_radius=10)
-        
-        text_surface = button_font.render(self.text, True, TEXT_COLOR)
-        text_rect = text_surface.get_rect(center=self.rect.center)
-        screen.blit(text_surface, text_rect)
-    
-    def check_hover(self, pos):
-        self.is_hovered = self.rect.collidepoint(pos)
-        return self.is_hovered
-    
-    def is_clicked(self, pos):
-        return self.rect.collidepoint(pos)
-
-play_pvp_button = Button(WIDTH//4, HEIGHT//2 - 50, WIDTH//2, 70, "Player vs Player")
-play_ai_button = Button(WIDTH//4, HEIGHT//2 + 50, WIDTH//2, 70, "Player vs AI")
-exit_button = Button(WIDTH//4, HEIGHT//2 + 150, WIDTH//2, 70, "Exit")
+play_pvp_button = Button(WIDTH//4, HEIGHT//2 - 50, WIDTH//2, 70, "Player vs Player", button_font)
+play_ai_button = Button(WIDTH//4, HEIGHT//2 + 50, WIDTH//2, 70, "Player vs AI", button_font)
+exit_button = Button(WIDTH//4, HEIGHT//2 + 150, WIDTH//2, 70, "Exit", button_font)
 
-play_again_button = Button(WIDTH//4, HEIGHT//2 + 50, WIDTH//2, 70, "Play Again")
-menu_button = Button(WIDTH//4, HEIGHT//2 + 150, WIDTH//2, 70, "Main Menu")
+play_again_button = Button(WIDTH//4, HEIGHT//2 + 50, WIDTH//2, 70, "Play Again", button_font)
+menu_button = Button(WIDTH//4, HEIGHT//2 + 150, WIDTH//2, 70, "Main Menu", button_font)
 
-def draw_lines():
-    pygame.draw.line(screen, LINE_COLOR, (0, SQUARE_SIZE), (WIDTH, SQUARE_SIZE), LINE_WIDTH)
-    pygame.draw.line(screen, LINE_COLOR, (0, 2 * SQUARE_SIZE), (WIDTH, 2 * SQUARE_SIZE), LINE_WIDTH)
-    
-    pygame.draw.line(screen, LINE_COLOR, (SQUARE_SIZE, 0), (SQUARE_SIZE, HEIGHT), LINE_WIDTH)
-    pygame.draw.line(screen, LINE_COLOR, (2 * SQUARE_SIZE, 0), (2 * SQUARE_SIZE, HEIGHT), LINE_WIDTH)
+def ai_status():
+    if instant_ai:
+        return AILoader.READY
+    return ai_loader.status
 
-def draw_figures():
-    for row in range(BOARD_ROWS):
-        for col in range(BOARD_COLS):
-            if board[row][col] == 'X':
-                is_oldest_x = len(x_positions) >= 3 and (row, col) == x_positions[0]
-                
-                color = FADED_CROSS_COLOR if is_oldest_x else CROSS_COLOR
-                pygame.draw.line(
-                    screen, color,
-                    (col * SQUARE_SIZE + SPACE, row * SQUARE_SIZE + SPACE),
-                    ((col + 1) * SQUARE_SIZE - SPACE, (row + 1) * SQUARE_SIZE - SPACE),
-                    CROSS_WIDTH
-                )
-                pygame.draw.line(
-                    screen, color,
-                    ((col + 1) * SQUARE_SIZE - SPACE, row * SQUARE_SIZE + SPACE),
-                    (col * SQUARE_SIZE + SPACE, (row + 1) * SQUARE_SIZE - SPACE),
-                    CROSS_WIDTH
-                )
-            elif board[row][col] == 'O':
-                is_oldest_o = len(o_positions) >= 3 and (row, col) == o_positions[0]
-                
-                color = FADED_CIRCLE_COLOR if is_oldest_o else CIRCLE_COLOR
-                pygame.draw.circle(
-                    screen, color,
-                    (col * SQUARE_SIZE + SQUARE_SIZE // 2, row * SQUARE_SIZE + SQUARE_SIZE // 2),
-                    CIRCLE_RADIUS, CIRCLE_WIDTH
-                )
+def record_move():
+    if recorder:
+        recorder.move(session.last_cell)
+        if session.game_over:
+            recorder.end_game(session.result)
 
-def check_winner():
-    for row in range(BOARD_ROWS):
-        if board[row][0] == board[row][1] == board[row][2] and board[row][0]:
-            return board[row][0]
-    
-    for col in range(BOARD_COLS):
-        if board[0][col] == board[1][col] == board[2][col] and board[0][col]:
-            return board[0][col]
-    
-    if board[0][0] == board[1][1] == board[2][2] and board[0][0]:
-        return board[0][0]
-    if board[0][2] == board[1][1] == board[2][0] and board[0][2]:
-        return board[0][2]
-    
-    return None
-
-def draw_winning_line(winner):
-    for row in range(BOARD_ROWS):
-        if board[row][0] == board[row][1] == board[row][2] == winner:
-            y = row * SQUARE_SIZE + SQUARE_SIZE // 2
-            pygame.draw.line(
-                screen, (255, 0, 0), 
-                (15, y), (WIDTH - 15, y), 15
-            )
-            return
-    
-    for col in range(BOARD_COLS):
-        if board[0][col] == board[1][col] == board[2][col] == winner:
-            x = col * SQUARE_SIZE + SQUARE_SIZE // 2
-            pygame.draw.line(
-                screen, (255, 0, 0), 
-                (x, 15), (x, HEIGHT - 15), 15
-            )
-            return
+def reset_game():
+    global ai_turn, end_screen_at
+    if recorder:
+        recorder.abandon()
+    session.reset()
+    ai_turn = None
+    end_screen_at = None
+    if speculator:
+        speculator.discard()
+        if ai_mode:
+            start_speculation()
+
+def take_back():
+    move = session.undo()
+    if move and recorder:
+        recorder.undo()
+    return move
+
+def undo_move():
+    global ai_turn
     
-    if board[0][0] == board[1][1] == board[2][2] == winner:
-        pygame.draw.line(
-            screen, (255, 0, 0), 
-            (15, 15), (WIDTH - 15, HEIGHT - 15), 15
-        )
+    # Against the AI, its reply goes too so it is the human's turn again; a
+    # reply still being computed is dropped.
+    ai_turn = None
+    if take_back() and ai_mode and session.player == 'O':
+        take_back()
+    if ai_mode:
+        start_speculation()
+
+def start_speculation():
+    # Guesses only go to providers that are local or can be cancelled. The
+    # CrewAI session runs one kickoff() at a time and cannot be interrupted,
+    # so guesses would queue paid calls behind each other; it is never asked
+    # speculatively. Streamed LLM guesses are capped at one per worker.
+    if not speculator:
         return
+    if ai_status() != AILoader.READY:
+        speculator.start(session)
+    elif LLM_STREAM_URL:
+        speculator.start(session, SPECULATION_WORKERS)
+
+def ai_move_fn():
+    if ai_status() != AILoader.READY:
+        return get_fallback_ai_move
+    return move_race or get_ai_move
+
+def get_ai_move(game, cancelled=None):
+    if instant_ai:
+        return instant_ai.best_move(game)
+    
+    with metrics.span("ai.cache_lookup"):
+        cached_move = move_cache.get(game)
+    if cached_move:
+        if AI_VERBOSE:
+            print("[AI CACHE HIT]:", cached_move, move_cache.stats())
+        return cached_move
     
-    if board[0][2] == board[1][1] == board[2][0] == winner:
-        pygame.draw.line(
-            screen, (255, 0, 0), 
-            (WIDTH - 15, 15), (15, HEIGHT - 15), 15
-        )
-        return
-
-def reset_game():
-    global board, player, game_over, winner, x_positions, o_positions
-    board = [[None for _ in range(BOARD_COLS)] for _ in range(BOARD_ROWS)]
-    x_positions = deque()
-    o_positions = deque()
-    player = 'X'
-    game_over = False
-    winner = None
-    screen.fill(BG_COLOR)
-    draw_lines()
-
-def get_ai_move():
-    board_string = "\n".join([" ".join(["_" if not c else c for c in row]) for row in board])
-    print("Current board state sent to AI:")
-    print(board_string)
-    instructions = f"""
-Here is the current Tic Tac Toe board (X, O, or _ for empty):
-{board_string}
-
-You are 'O'. It's your turn.
-
-Important rules:
-1. This is a special Tic Tac Toe variant where each player can only have 3 pieces on the board at once.
-2. When a player places a 4th piece, their oldest piece is removed.
-3. You MUST choose an EMPTY space (marked with _).
-4. Do NOT choose spaces that already contain X or O.
-
-Your task:
-- Return the best move as JSON: {{ "row": <0-2>, "col": <0-2> }}
-- Only return the JSON. No extra explanation.
-- If you see a winning move, take it.
-- If you can't win immediately, block the opponent's winning move.
-- If neither is possible, prefer the center, then corners, then edges.
-- Always check that your chosen space is empty before returning.
-
-Remember: Only select positions marked with _ in the board representation.
-"""
-
-    task = Task(
-        description=instructions,
-        expected_output="The best move as JSON: { \"row\": 0, \"col\": 2 }",
-        agent=ai_agent
-    )
-
-    crew = Crew(
-        agents=[ai_agent],
-        tasks=[task],
-        verbose=False
-    )
-
     try:
-        crew_result = crew.kickoff()
-        result = str(crew_result)
-        print("[AI OUTPUT]:", result)
-
-        match = re.search(r'\{.*?\}', result)
-        if match:
-            move = json.loads(match.group())
-            return move["row"], move["col"]
+        move = ai_loader.session.get_move(game, cancelled)
+        if move:
+            move_cache.put(game, move)
+        return move
     except Exception as e:
         print("Failed to parse AI move:", e)
-        return get_fallback_ai_move()
+        return get_fallback_ai_move(game)
 
-def get_fallback_ai_move():
-    for row in range(BOARD_ROWS):
-        for col in range(BOARD_COLS):
-            if board[row][col] is None:
-                board[row][col] = 'O'
-                if check_winner() == 'O':
-                    board[row][col] = None
-                    return row, col
-                board[row][col] = None
-    
-    for row in range(BOARD_ROWS):
-        for col in range(BOARD_COLS):
-            if board[row][col] is None:
-                board[row][col] = 'X'
-                if check_winner() == 'X':
-                    board[row][col] = None
-                    return row, col
-                board[row][col] = None
-    
-    if board[1][1] is None:
-        return 1, 1
-    
-    corners = [(0, 0), (0, 2), (2, 0), (2, 2)]
-    for row, col in corners:
-        if board[row][col] is None:
-            return row, col
-    
-    for row in range(BOARD_ROWS):
-        for col in range(BOARD_COLS):
-            if board[row][col] is None:
-                return row, col
+def get_fallback_ai_move(game, cancelled=None):
+    if perfect_play:
+        return perfect_play.best_move(game)
     
-    return None
+    return search_engine.best_move(game) or fallback_move(game)
 
 def make_move(row, col):
-    global player, board, game_state, game_over, winner
+    global ai_turn, end_screen_at
     
-    if board[row][col] is None and not game_over:
-        if player == 'X':
-            if len(x_positions) >= 3:
-                old_row, old_col = x_positions.popleft()
-                board[old_row][old_col] = None
-            x_positions.append((row, col))
-        else:  
-            if len(o_positions) >= 3:
-                old_row, old_col = o_positions.popleft()
-                board[old_row][old_col] = None
-            o_positions.append((row, col))
-        
-        board[row][col] = player
-        
-        result = check_winner()
-        if result:
-            game_over = True
-            winner = result
-            draw_board()
-            pygame.display.update()
-            pygame.time.delay(1000) 
-            game_state = "end_screen"
+    if session.make_move(row, col):
+        record_move()
+        if session.game_over:
+            end_screen_at = pygame.time.get_ticks() + END_SCREEN_DELAY
+            if speculator:
+                speculator.discard()
             return
         
-        player = 'O' if player == 'X' else 'X'
-        
-        draw_board()
-        
-        if ai_mode and player == 'O' and not game_over:
-            pygame.display.update()
-            pygame.time.delay(500)
-            
-            if ai_available:
-                ai_row, ai_col = get_ai_move()
-                if ai_row is not None and ai_col is not None:
-                    make_move(ai_row, ai_col)
-            else:
-                ai_row, ai_col = get_fallback_ai_move()
-                if ai_row is not None and ai_col is not None:
-                    make_move(ai_row, ai_col)
+        if ai_mode and session.player == 'O':
+            future = speculator.take(session) if speculator else None
+            # A reply that was already computed is played without the think delay.
+            min_delay = 0 if future and future.done() else AI_MIN_THINK_TIME
+            ai_turn = AITurn(ai_move_fn(), get_fallback_ai_move, session, AI_MOVE_DEADLINE, min_delay, future)
+        elif ai_mode:
+            start_speculation()
+
+def update_ai_turn():
+    global ai_turn
+    
+    if ai_turn:
+        move = ai_turn.poll()
+        if move:
+            ai_turn = None
+            make_move(*move)
 
 
 def draw_board():
-    screen.fill(BG_COLOR)
-    draw_lines()
-    draw_figures()
+    sprites = board_sprites(session)
     
-    if not game_over:
-        if ai_mode and player == 'O':
-            turn_text = mode_font.render("AI is thinking...", True, TEXT_COLOR)
+    if not session.game_over:
+        if ai_mode and session.player == 'O':
+            dots = "." * (pygame.time.get_ticks() // 400 % 4)
+            turn_text = f"AI is thinking{dots}"
         else:
-            turn_text = mode_font.render(f"Player {1 if player == 'X' else 2}'s Turn", True, TEXT_COLOR)
+            turn_text = f"Player {1 if session.player == 'X' else 2}'s Turn"
         
-        turn_rect = turn_text.get_rect(center=(WIDTH//2, 30))
-        screen.blit(turn_text, turn_rect)
+        sprites["turn"] = centered(render_text(mode_font, turn_text), (WIDTH//2, 30))
     
-    if game_over and winner:
-        draw_winning_line(winner)
+    renderer.present(board_background(VARIANT), sprites)
 
 def draw_menu():
-    screen.fill(MENU_BG_COLOR)
+    status = ai_status()
+    play_ai_button.enabled = status == AILoader.READY
+    sprites = {
+        "pvp": play_pvp_button.sprite(),
+        "ai": play_ai_button.sprite(),
+        "exit": exit_button.sprite(),
+    }
     
-    title_text = title_font.render("Advanced Tic Tac Toe", True, TEXT_COLOR)
-    title_rect = title_text.get_rect(center=(WIDTH//2, HEIGHT//4))
-    screen.blit(title_text, title_rect)
+    if status == AILoader.LOADING:
+        ai_text = render_text(mode_font, "Loading AI...", (255, 255, 200))
+        sprites["ai_status"] = centered(ai_text, (WIDTH//2, HEIGHT//2 + 120))
+    elif status == AILoader.UNAVAILABLE:
+        ai_text = render_text(mode_font, "AI mode not available - Ollama not found", (255, 200, 200))
+        sprites["ai_status"] = centered(ai_text, (WIDTH//2, HEIGHT//2 + 120))
     
-    play_pvp_button.draw()
+    if RECORD_PATH:
+        sprites["replay_hint"] = centered(render_text(hint_font, "Press R to replay recorded games"), (WIDTH//2, HEIGHT - 20))
     
-    if ai_available:
-        play_ai_button.draw()
-    else:
-        pygame.draw.rect(screen, (150, 150, 150), play_ai_button.rect, border_radius=10)
-        text_surface = button_font.render(play_ai_button.text, True, (200, 200, 200))
-        text_rect = text_surface.get_rect(center=play_ai_button.rect.center)
-        screen.blit(text_surface, text_rect)
-        
-        ai_text = mode_font.render("AI mode not available - Ollama not found", True, (255, 200, 200))
-        ai_rect = ai_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 120))
-        screen.blit(ai_text, ai_rect)
-    
-    exit_button.draw()
+    renderer.present(titled_background(title_font, "Advanced Tic Tac Toe"), sprites)
+
+def draw_replay():
+    sprites = board_sprites(replay.session)
+    sprites["caption"] = centered(render_text(hint_font, replay.caption()), (WIDTH//2, 20))
+    sprites["keys"] = centered(
+        render_text(hint_font, "Left/Right: step   Up/Down: game   Esc: menu"), (WIDTH//2, HEIGHT - 20)
+    )
+    renderer.present(board_background(replay.session.variant), sprites)
 
 def draw_end_screen():
-    screen.fill(MENU_BG_COLOR)
-    
-    if ai_mode and winner == 'O':
-        winner_text = winner_font.render("AI Won!", True, TEXT_COLOR)
-    elif winner == 'X':
-        winner_text = winner_font.render("Player 1 Won!", True, TEXT_COLOR)
+    if session.draw_reason:
+        winner_text = f"Draw by {session.draw_reason}!"
+    elif ai_mode and session.winner == 'O':
+        winner_text = "AI Won!"
+    elif session.winner == 'X':
+        winner_text = "Player 1 Won!"
     else:
-        winner_text = winner_font.render("Player 2 Won!", True, TEXT_COLOR)
-    
-    winner_rect = winner_text.get_rect(center=(WIDTH//2, HEIGHT//4))
-    screen.blit(winner_text, winner_rect)
+        winner_text = "Player 2 Won!"
     
-    play_again_button.draw()
-    menu_button.draw()
+    renderer.present(titled_background(winner_font, winner_text), {
+        "play_again": play_again_button.sprite(),
+        "menu": menu_button.sprite(),
+    })
 
-clock = pygame.time.Clock()
+event_loop = EventLoop(event_driven=EVENT_DRIVEN)
+
+draw_menu()
+print(f"[startup] menu shown after {(time.perf_counter() - STARTED_AT) * 1000:.0f} ms")
+if instant_ai:
+    source = "policy network" if policy_network else "perfect-play table"
+    print(f"[startup] AI ready after {(time.perf_counter() - STARTED_AT) * 1000:.0f} ms ({source})")
+else:
+    ai_loader.start()
 
 while True:
-    mouse_pos = pygame.mouse.get_pos()
+    animating = ai_turn is not None or end_screen_at is not None or renderer.hud.visible
+    events = event_loop.events(animating)
+    update_started = time.perf_counter()
     
-    for event in pygame.event.get():
+    for event in events:
         if event.type == pygame.QUIT:
             pygame.quit()
             sys.exit()
         
+        if event.type == AI_LOADED_EVENT:
+            print(f"[startup] AI {ai_loader.status} after {(time.perf_counter() - STARTED_AT) * 1000:.0f} ms")
+        
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            renderer.hud.toggle()
+        
+        if event.type == pygame.KEYDOWN:
+            if game_state == "menu" and event.key == pygame.K_r and RECORD_PATH:
+                replay = load_replay(RECORD_PATH)
+                if replay:
+                    game_state = "replay"
+            elif game_state == "game" and event.key in (pygame.K_u, pygame.K_BACKSPACE):
+                if not session.game_over:
+                    undo_move()
+            elif game_state == "replay":
+                if event.key == pygame.K_ESCAPE:
+                    replay.close()
+                    replay = None
+                    game_state = "menu"
+                elif event.key == pygame.K_LEFT:
+                    replay.step(-1)
+                elif event.key == pygame.K_RIGHT:
+                    replay.step(1)
+                elif event.key == pygame.K_UP:
+                    replay.switch(-1)
+                elif event.key == pygame.K_DOWN:
+                    replay.switch(1)
+                elif event.key == pygame.K_HOME:
+                    replay.seek(0)
+                elif event.key == pygame.K_END:
+                    replay.seek(len(replay.game))
+        
         if event.type == pygame.MOUSEBUTTONDOWN:
             if game_state == "menu":
                 if play_pvp_button.is_clicked(event.pos):
                     game_state = "game"
                     ai_mode = False
                     reset_game()
-                elif play_ai_button.is_clicked(event.pos) and ai_available:
+                elif play_ai_button.is_clicked(event.pos):
                     game_state = "game"
                     ai_mode = True
                     reset_game()
@@ -398,15 +382,11 @@ while True:
                     sys.exit()
             
             elif game_state == "game":
-                if not game_over and (not ai_mode or player == 'X'):
-                    mouseX = event.pos[0]
-                    mouseY = event.pos[1]
+                if not session.game_over and (not ai_mode or session.player == 'X'):
+                    clicked = layout.cell_at(event.pos)
                     
-                    clicked_row = mouseY // SQUARE_SIZE
-                    clicked_col = mouseX // SQUARE_SIZE
-                    
-                    if 0 <= clicked_row < 3 and 0 <= clicked_col < 3:
-                        make_move(clicked_row, clicked_col)
+                    if clicked:
+                        make_move(*clicked)
             
             elif game_state == "end_screen":
                 if play_again_button.is_clicked(event.pos):
@@ -415,21 +395,30 @@ while True:
                 elif menu_button.is_clicked(event.pos):
                     game_state = "menu"
     
+    if game_state == "game":
+        update_ai_turn()
+        if end_screen_at is not None and pygame.time.get_ticks() >= end_screen_at:
+            end_screen_at = None
+            game_state = "end_screen"
+    
+    mouse_pos = pygame.mouse.get_pos()
+    
     if game_state == "menu":
         play_pvp_button.check_hover(mouse_pos)
-        if ai_available:
-            play_ai_button.check_hover(mouse_pos)
+        play_ai_button.check_hover(mouse_pos)
         exit_button.check_hover(mouse_pos)
     elif game_state == "end_screen":
         play_again_button.check_hover(mouse_pos)
         menu_button.check_hover(mouse_pos)
     
-    if game_state == "menu":
-        draw_menu()
-    elif game_state == "game":
-        draw_board()
-    elif game_state == "end_screen":
-        draw_end_screen()
+    metrics.record("frame.update", time.perf_counter() - update_started)
     
-    pygame.display.update()
-    clock.tick(60)
\ No newline at end of file
+    with metrics.span("frame.render"):
+        if game_state == "menu":
+            draw_menu()
+        elif game_state == "game":
+            draw_board()
+        elif game_state == "end_screen":
+            draw_end_screen()
+        elif game_state == "replay":
+            draw_replay()
\ No newline at end of file
@@ -0,0 +1,180 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from bitboard import DEFAULT_VARIANT, parse_variant
+from game_engine import GameSession
+from game_record import RecordWriter
+from strategies import STRATEGIES, make_strategy
+
+DEFAULT_MAX_MOVES = 200
+DEFAULT_BATCH_SIZE = 50
+INITIAL_ELO = 1500.0
+ELO_K = 16.0
+
+
+def play_game(x_strategy, o_strategy, max_moves=DEFAULT_MAX_MOVES, variant=DEFAULT_VARIANT):
+    # The session ends the game on a win, threefold repetition or max_moves.
+    game = GameSession(variant=variant, max_moves=max_moves)
+    latencies = {'X': [], 'O': []}
+    cells = []
+    forfeit = False
+    while not game.game_over:
+        player = game.player
+        strategy = x_strategy if player == 'X' else o_strategy
+        started = time.perf_counter()
+        move = strategy(game)
+        latencies[player].append(time.perf_counter() - started)
+        if move is None or not game.make_move(*move):
+            forfeit = True
+            game.winner = 'O' if player == 'X' else 'X'
+            break
+        cells.append(game.last_cell)
+    return game.winner, len(latencies['X']) + len(latencies['O']), forfeit, latencies, cells
+
+
+def play_batch(jobs, max_moves, seed, variant=DEFAULT_VARIANT):
+    strategies = {}
+    results = []
+    for game_id, x_name, o_name in jobs:
+        for name in (x_name, o_name):
+            if name not in strategies:
+                strategies[name] = make_strategy(name, seed + game_id, variant)
+        winner, moves, forfeit, latencies, cells = play_game(strategies[x_name], strategies[o_name], max_moves, variant)
+        results.append({
+            "game": game_id,
+            "x": x_name,
+            "o": o_name,
+            "result": winner or "draw",
+            "moves": moves,
+            "forfeit": forfeit,
+            "latencies": latencies,
+            "cells": cells,
+        })
+    return results
+
+
+def schedule(players, games):
+    pairings = list(itertools.permutations(players, 2)) or [(players[0], players[0])]
+    return [(game_id, *pairings[game_id % len(pairings)]) for game_id in range(games)]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def update_elo(ratings, x_name, o_name, result):
+    expected = 1 / (1 + 10 ** ((ratings[o_name] - ratings[x_name]) / 400))
+    score = {'X': 1.0, 'O': 0.0, 'draw': 0.5}[result]
+    ratings[x_name] += ELO_K * (score - expected)
+    ratings[o_name] -= ELO_K * (score - expected)
+
+
+def summarize(players, results, elapsed):
+    results = sorted(results, key=lambda r: r["game"])
+    ratings = {name: INITIAL_ELO for name in players}
+    records = {name: {"games": 0, "wins": 0, "draws": 0, "losses": 0} for name in players}
+    latencies = {name: [] for name in players}
+    total_moves = 0
+    for r in results:
+        total_moves += r["moves"]
+        if r["x"] != r["o"]:
+            update_elo(ratings, r["x"], r["o"], r["result"])
+        for player, name in (('X', r["x"]), ('O', r["o"])):
+            record = records[name]
+            record["games"] += 1
+            if r["result"] == "draw":
+                record["draws"] += 1
+            elif r["result"] == player:
+                record["wins"] += 1
+            else:
+                record["losses"] += 1
+            latencies[name].extend(r["latencies"][player])
+
+    print(f"\n{len(results)} games, {total_moves} moves in {elapsed:.2f}s "
+          f"({len(results) / elapsed:.1f} games/s, {total_moves / elapsed:.0f} moves/s)")
+    print(f"{'strategy':<12} {'elo':>7} {'games':>7} {'win%':>6} {'draw%':>6} {'loss%':>6} "
+          f"{'p50 us':>9} {'p90 us':>9} {'p99 us':>9}")
+    for name in sorted(players, key=lambda n: -ratings[n]):
+        record = records[name]
+        games = record["games"] or 1
+        values = sorted(latencies[name])
+        print(f"{name:<12} {ratings[name]:7.1f} {record['games']:7d} "
+              f"{record['wins'] / games * 100:6.1f} {record['draws'] / games * 100:6.1f} "
+              f"{record['losses'] / games * 100:6.1f} "
+              f"{percentile(values, 0.5) * 1e6:9.1f} {percentile(values, 0.9) * 1e6:9.1f} "
+              f"{percentile(values, 0.99) * 1e6:9.1f}")
+
+
+def run(players, games, workers, batch_size, max_moves, seed, stream, variant=DEFAULT_VARIANT, recorder=None):
+    jobs = schedule(players, games)
+    batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+    results = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_batch, batch, max_moves, seed, variant) for batch in batches]
+        for future in as_completed(futures):
+            for result in future.result():
+                results.append(result)
+                if recorder:
+                    recorder.write_game(result["cells"], "abandoned" if result["forfeit"] else result["result"])
+                if stream:
+                    record = {key: value for key, value in result.items() if key not in ("latencies", "cells")}
+                    stream.write(json.dumps(record) + "\n")
+            if stream:
+                stream.flush()
+    return results, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless self-play tournament between AI strategies.")
+    parser.add_argument("players", nargs="+", choices=sorted(STRATEGIES), help="strategies to pit against each other")
+    parser.add_argument("-n", "--games", type=int, default=1000, help="total number of games")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="games per worker task")
+    parser.add_argument("--max-moves", type=int, default=DEFAULT_MAX_MOVES, help="moves before a game is a draw")
+    parser.add_argument("--seed", type=int, default=0, help="base seed for randomized strategies")
+    parser.add_argument("--variant", type=parse_variant, default=DEFAULT_VARIANT,
+                        help="board as ROWSxCOLS[:K[:PIECES]], e.g. 7x7:4:5 (default 3x3:3:3)")
+    parser.add_argument("-r", "--record", help="append every game to this binary game record")
+    parser.add_argument("-o", "--output", help="stream per-game JSON lines to this file ('-' for stdout)")
+    args = parser.parse_args(argv)
+    for name in set(args.players):
+        try:
+            make_strategy(name, args.seed, args.variant)
+        except ValueError as e:
+            parser.error(str(e))
+
+    recorder = None
+    if args.record:
+        try:
+            recorder = RecordWriter(args.record, args.variant)
+        except ValueError as e:
+            parser.error(str(e))
+    stream = None
+    if args.output == "-":
+        stream = sys.stdout
+    elif args.output:
+        stream = open(args.output, "w")
+    try:
+        results, elapsed = run(
+            args.players, args.games, args.workers, args.batch_size, args.max_moves, args.seed, stream,
+            args.variant, recorder,
+        )
+    finally:
+        if recorder:
+            recorder.close()
+        if stream and stream is not sys.stdout:
+            stream.close()
+    summarize(args.players, results, elapsed)
+
+
+if __name__ == "__main__":
+    main()